@@ -0,0 +1,66 @@
+# Задержка рассылки одного события по столу: последовательный цикл
+# send_message против broadcast().
+#
+#   python bench/bench_broadcast.py --seats 10 --latency 0.05
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from broadcast import broadcast, FanoutStats
+
+
+class FakeBot:
+    def __init__(self, latency, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("Forbidden: bot was blocked by the user")
+
+
+async def run(seats, events, latency, fail_every):
+    bot = FakeBot(latency, fail_every)
+    chat_ids = list(range(seats))
+
+    started = time.perf_counter()
+    sequential_failures = 0
+    for _ in range(events):
+        for chat_id in chat_ids:
+            try:
+                await bot.send_message(chat_id, "Игрок стреляет в себя... Холостой патрон!")
+            except RuntimeError:
+                sequential_failures += 1
+    sequential = (time.perf_counter() - started) / events
+
+    stats = FanoutStats()
+    for _ in range(events):
+        await broadcast(bot, [(chat_id, "Игрок стреляет в себя... Холостой патрон!", {}) for chat_id in chat_ids], stats=stats)
+    snap = stats.snapshot()
+
+    print(f"последовательно: {sequential * 1000:.1f} мс на событие (ошибок {sequential_failures})")
+    print(
+        f"broadcast:       {snap['avg_ms']:.1f} мс на событие, p50 {snap['p50_ms']:.1f} мс, "
+        f"p99 {snap['p99_ms']:.1f} мс (ошибок {snap['failures']} из {snap['messages']})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-every", type=int, default=0, help="каждый N-й вызов падает")
+    args = parser.parse_args()
+    asyncio.run(run(args.seats, args.events, args.latency, args.fail_every))
+
+
+if __name__ == "__main__":
+    main()
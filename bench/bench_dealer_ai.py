@@ -0,0 +1,60 @@
+# Сложный дилер (dealer_ai.py): сколько решений в секунду, как часто
+# срабатывает таблица транспозиций и сколько занимает самое долгое решение.
+# Игрок играет осторожно (как в simulate.py), дилер — поиском.
+#
+#   python bench/bench_dealer_ai.py --games 500 --budget 20
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import dealer_ai
+import engine
+from engine import new_single_game, player_action, dealer_step
+from model import PLAYER, DEALER
+from simulate import policy_cautious
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--budget", type=float, default=dealer_ai.SEARCH_BUDGET_MS, help="мс на решение")
+    parser.add_argument("--table", type=int, default=dealer_ai.TABLE_SIZE, help="размер таблицы транспозиций")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    engine.DEALER_AI = "hard"
+    dealer_ai.hard_dealer = dealer_ai.Expectimax(args.budget, table_size=args.table)
+    search = dealer_ai.hard_dealer
+    rng = random.Random(args.seed)
+    wins = 0
+    spent = 0.0
+    worst = 0.0
+    for _ in range(args.games):
+        game_state = new_single_game(1, "Игрок", "Игрок", rng)
+        while game_state.game_active:
+            if game_state.current_turn == PLAYER:
+                player_action(game_state, policy_cautious(game_state, None, rng), rng)
+            else:
+                started = time.perf_counter()
+                dealer_step(game_state, rng)
+                took = time.perf_counter() - started
+                spent += took
+                worst = max(worst, took)
+        wins += game_state.players[DEALER].lives > 0
+
+    stats = search.stats
+    decisions = stats["decisions"]
+    lookups = stats["hits"] + stats["misses"]
+    print(f"Игр: {args.games}, бюджет {args.budget:g} мс, таблица {args.table}")
+    print(f"Решений: {decisions}, {decisions / spent:,.0f} в секунду, в среднем {spent / decisions * 1000:.2f} мс, худшее {worst * 1000:.1f} мс")
+    print(f"Глубина в среднем {stats['depth_sum'] / decisions:.1f}, упёрлись в бюджет: {stats['timeouts']}")
+    print(f"Таблица: попаданий {100 * stats['hits'] / lookups:.1f}%, узлов {stats['nodes']}, записей {len(search.table)}")
+    print(f"Дилер побеждает в {100 * wins / args.games:.1f}% игр")
+
+
+if __name__ == "__main__":
+    main()
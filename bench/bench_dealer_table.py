@@ -0,0 +1,65 @@
+# Решение дилера: dealer_decision (цепочка условий) против одного обращения
+# к таблице dealer_table.py. Состояния берутся из настоящих игр; заодно
+# проверяется, что таблица отвечает так же, как правила.
+#
+#   python bench/bench_dealer_table.py --games 2000
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import dealer_table
+from engine import new_single_game, player_action, dealer_step, dealer_decision
+from model import PLAYER, DEALER
+
+
+def collect_states(games, rng):
+    states = []
+    for _ in range(games):
+        game_state = new_single_game(1, "Игрок", "Игрок", rng)
+        while game_state.game_active:
+            if game_state.current_turn == PLAYER:
+                items = game_state.players[PLAYER].item_list()
+                player_action(game_state, rng.choice(["dealer", "self"] + items), rng)
+            else:
+                if game_state.magazine and not game_state.players[DEALER].handcuffed:
+                    states.append(copy.deepcopy(game_state))
+                dealer_step(game_state, rng)
+    return states
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    dealer_table.table = dealer_table.build()
+    states = collect_states(args.games, random.Random(args.seed))
+
+    def by_rules(game_state):
+        dealer = game_state.players[DEALER]
+        return dealer_decision(game_state.magazine, dealer.item_list(), game_state.players[PLAYER].handcuffed, dealer.lives)
+
+    def by_table(game_state):
+        return dealer_table.table_decision(game_state)
+
+    mismatches = sum(by_rules(state) != by_table(state) for state in states)
+    print(f"Состояний: {len(states)}, расхождений с правилами: {mismatches}")
+    for name, decide in (("dealer_decision", by_rules), ("таблица", by_table)):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for state in states:
+                decide(state)
+        elapsed = time.perf_counter() - started
+        count = args.repeat * len(states)
+        print(f"{name:>16}: {elapsed / count * 1e9:.0f} нс на решение, {count / elapsed:,.0f} в секунду")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Скорость самих правил: одиночные игры целиком на engine.py, без Telegram.
+# Игрок жмёт случайную доступную кнопку, дилер — как в боте.
+#
+#   python bench/bench_engine.py --games 100000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from engine import new_single_game, player_action, dealer_step
+from model import PLAYER
+
+
+def play(rng):
+    game_state = new_single_game(1, "Игрок", "Игрок", rng)
+    steps = 0
+    while game_state.game_active:
+        if game_state.current_turn == PLAYER:
+            items = game_state.players[PLAYER].item_list()
+            player_action(game_state, rng.choice(["dealer", "self", "dealer", "self"] + items), rng)
+        else:
+            dealer_step(game_state, rng)
+        steps += 1
+    return game_state.players[PLAYER].lives > 0, steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    wins = steps = 0
+    started = time.perf_counter()
+    for _ in range(args.games):
+        won, game_steps = play(rng)
+        wins += won
+        steps += game_steps
+    elapsed = time.perf_counter() - started
+
+    print(f"Игр: {args.games} за {elapsed:.2f} с — {args.games / elapsed * 60:,.0f} игр в минуту на одно ядро")
+    print(f"Ходов: {steps / args.games:.1f} на игру, {steps / elapsed:,.0f} в секунду")
+    print(f"Случайный игрок побеждает в {100 * wins / args.games:.1f}% игр")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Стоимость клавиатуры хода за столом на 10 мест: старая сборка (разбор
+# Markdown-упоминаний через type('obj', ...) на каждое сообщение) против
+# build_game_keyboard с кэшем.
+#
+#   python bench/bench_keyboards.py --seats 10 --builds 20000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from telegram import ReplyKeyboardMarkup
+
+import roulet
+from model import ITEMS, ITEM_IDS, GameState, PlayerState
+
+
+def old_build_game_keyboard(items, game_state, current_player):
+    actions = []
+    for seat in [seat for seat in game_state.alive_seats() if seat != current_player]:
+        player = game_state.players[seat]
+        user = type('obj', (object,), {'id': player.id, 'username': player.mention.split('[')[1].split(']')[0] if '[' in player.mention else None, 'first_name': player.mention.split('[')[1].split(']')[0] if '[' in player.mention else player.mention, 'last_name': None})
+        actions.append([roulet.get_user_mention(user, for_button=True)])
+    actions.append(["В Себя"])
+    for item in items:
+        actions.append([f"{ITEMS[item]['emoji']} {ITEMS[item]['name']}"])
+    return ReplyKeyboardMarkup(actions, resize_keyboard=True, one_time_keyboard=False)
+
+
+def make_table(table_id, seats, rng):
+    players = []
+    for seat in range(seats):
+        chat_id = table_id * 100 + seat
+        player = PlayerState(chat_id, f"[player{chat_id}](tg://user?id={chat_id})", f"player{chat_id}")
+        for item in rng.sample(ITEM_IDS, 2):
+            player.give_item(item)
+        players.append(player)
+    return GameState(f"T{table_id}", "multiplayer", players)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--builds", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tables = [make_table(t, args.seats, rng) for t in range(args.tables)]
+    turns = [(rng.choice(tables), rng.randrange(args.seats)) for _ in range(args.builds)]
+
+    started = time.perf_counter()
+    for game_state, seat in turns:
+        old_build_game_keyboard(game_state.players[seat].item_list(), game_state, seat)
+    old = (time.perf_counter() - started) / args.builds
+
+    roulet.cached_keyboard.cache_clear()
+    started = time.perf_counter()
+    for game_state, seat in turns:
+        roulet.build_game_keyboard(game_state.players[seat].item_list(), mode="multiplayer", game_state=game_state, current_player=seat)
+    new = (time.perf_counter() - started) / args.builds
+    info = roulet.cached_keyboard.cache_info()
+
+    print(f"Столов: {args.tables} по {args.seats} мест, клавиатур: {args.builds}")
+    print(f"старая сборка: {old * 1e6:.1f} мкс на клавиатуру")
+    print(
+        f"с кэшем:       {new * 1e6:.1f} мкс на клавиатуру "
+        f"(попаданий {info.hits}, промахов {info.misses}, в кэше {info.currsize}/{info.maxsize})"
+    )
+
+
+if __name__ == "__main__":
+    main()
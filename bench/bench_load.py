@@ -0,0 +1,282 @@
+# Нагрузочный прогон одного процесса бота целиком: бот работает в режиме
+# polling и забирает апдейты через getUpdates у заглушки Bot API
+# (bench/fake_bot_api.py). Скриптовые игроки проходят лобби и играют до
+# конца: одиночные — /start и "Начать игру", комнаты — "Мультиплеер",
+# "Создать комнату", остальные заходят по коду, создатель начинает игру.
+# Каждый игрок жмёт следующую кнопку только после ответа бота. На ответ
+# с ошибкой игрок повторяет ход по последней клавиатуре (выстрел в себя),
+# чтобы игра не вставала. Ошибки бота и недоигранные игры — код выхода 1.
+#
+# Задержка хода — от нажатия кнопки в игре до следующего сообщения с
+# обычной клавиатурой (или её удалением) в тот же чат: в одиночной игре это
+# конец хода дилера, в мультиплеере — передача хода дальше.
+#
+#   python bench/bench_load.py --singles 1000 --rooms 250 --seats 4
+#   python bench/bench_load.py --singles 500 --api-latency 0.05 --tracemalloc
+#   python bench/bench_load.py --event-log /tmp/events.log   # цена журнала событий
+#
+# Нужен python-telegram-bot.
+import argparse
+import asyncio
+import gc
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import roulet
+from bench_webhook import percentile
+from fake_bot_api import FakeBotAPI, callback_update, message_update
+
+ROOM_CREATED = re.compile(r"Код: \*\*([A-Z0-9]{6})\*\*")
+ROOM_STATUS = re.compile(r"^Комната [A-Z0-9]{6}\nИгроки: (\d+)/")
+# Ответы бота на неправильное нажатие: после них игрок жмёт ещё раз
+ERROR_REPLIES = (
+    "Неверн", "У вас нет", "Только создатель", "Нужно минимум", "Комната не найдена",
+    "Вы не в ", "Игра не начата", "Начните с /start"
+)
+# Телефон дважды за ход: второй перезаписывает патрон, и кнопка под первым
+# сообщением уже устарела. Это не ошибка и не ход — повторять нечего
+STALE_REPLIES = ("Данные о патроне отсутствуют",)
+# Не ошибка игрока, но значит, что бот и игрок по-разному видят, чей ход
+WAIT_REPLIES = ("Сейчас ход дилера", "Сейчас не ваш ход")
+MAX_RETRIES = 3
+
+
+def keyboard_buttons(markup):
+    # Кнопки обычной клавиатуры приходят строками или {"text": ...}
+    return [button if isinstance(button, str) else button["text"] for row in markup.get("keyboard", []) for button in row]
+
+
+def rss_bytes():
+    # Резидентная память процесса (Linux); где /proc нет — 0
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class Room:
+    def __init__(self, creator, guests):
+        self.creator = creator
+        self.guests = guests
+        self.code = None
+        self.waiting = []  # гости, которые уже ждут код
+        self.started = False
+
+
+class Players:
+    def __init__(self, api, rng):
+        self.api = api
+        self.rng = rng
+        self.update_ids = itertools.count(1)
+        self.rooms = {}  # чат -> Room
+        self.playing = set()  # чаты, чья игра ещё не кончилась
+        self.pressed = {}  # чат -> когда нажата кнопка в игре
+        self.latencies = []
+        self.updates = 0
+        self.games = 0
+        self.errors = {}  # начало ответа -> сколько раз
+        self.prompts = {}  # чат -> последнее сообщение с клавиатурой (text, markup)
+        self.retries = {}  # чат -> повторов подряд после ошибок
+        self.last_text = {}  # чат -> последнее сообщение бота
+        self.done = asyncio.Event()
+        api.on_send(self.on_send)
+
+    def send(self, chat_id, text):
+        self.updates += 1
+        self.api.push_update(message_update(next(self.update_ids), chat_id, text))
+
+    def press(self, chat_id, data):
+        self.updates += 1
+        self.api.push_update(callback_update(next(self.update_ids), chat_id, data))
+
+    def add_single(self, chat_id):
+        self.playing.add(chat_id)
+        self.send(chat_id, "/start")
+
+    def add_room(self, chat_ids):
+        room = Room(chat_ids[0], chat_ids[1:])
+        for chat_id in chat_ids:
+            self.rooms[chat_id] = room
+            self.playing.add(chat_id)
+            self.send(chat_id, "/start")
+
+    def on_send(self, chat_id, text, params):
+        if chat_id not in self.playing:
+            return
+        self.last_text[chat_id] = text
+        markup = params.get("reply_markup")
+        if not isinstance(markup, dict):
+            markup = {}
+        if text.startswith(STALE_REPLIES):
+            return
+        if text.startswith(ERROR_REPLIES + WAIT_REPLIES):
+            kind = text.split("!")[0].split(".")[0]
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            if text.startswith(ERROR_REPLIES):
+                self.retry(chat_id)
+            return
+        if "inline_keyboard" in markup:
+            # Телефон в одиночной игре: смотрим патрон (answerCallbackQuery)
+            if "view_cartridge" in str(markup):
+                self.press(chat_id, "view_cartridge")
+            return
+        if "keyboard" not in markup and "remove_keyboard" not in markup:
+            return
+        started = self.pressed.pop(chat_id, None)
+        if started is not None:
+            self.latencies.append(time.perf_counter() - started)
+        if "Игра окончена" in text:
+            self.finish(chat_id)
+            return
+        self.prompts[chat_id] = (text, markup)
+        self.retries.pop(chat_id, None)
+        self.respond(chat_id, text, markup)
+
+    def retry(self, chat_id):
+        # Отвечаем на последнюю клавиатуру ещё раз, иначе игрок ждал бы до --timeout
+        self.retries[chat_id] = self.retries.get(chat_id, 0) + 1
+        prompt = self.prompts.get(chat_id)
+        if prompt is not None and self.retries[chat_id] <= MAX_RETRIES:
+            self.respond(chat_id, *prompt, safe=True)
+
+    def respond(self, chat_id, text, markup, safe=False):
+        # safe — после ошибки: в игре жмём "В Себя", она доступна всегда
+        buttons = keyboard_buttons(markup)
+        room = self.rooms.get(chat_id)
+        if "Мультиплеер" in buttons:
+            self.send(chat_id, "Мультиплеер" if room else "Начать игру")
+        elif "Создать комнату" in buttons:
+            self.send(chat_id, "Создать комнату" if room.creator == chat_id else "Присоединиться")
+        elif text.startswith("Введите код комнаты"):
+            if room.code:
+                self.send(chat_id, room.code)
+            else:
+                room.waiting.append(chat_id)
+        elif text.startswith("Комната создана"):
+            room.code = ROOM_CREATED.search(text).group(1)
+            for guest in room.waiting:
+                self.send(guest, room.code)
+            room.waiting = []
+        elif ROOM_STATUS.match(text):
+            joined = int(ROOM_STATUS.match(text).group(1))
+            if chat_id == room.creator and joined == len(room.guests) + 1 and (safe or not room.started):
+                room.started = True
+                self.send(chat_id, "Начать игру")
+        elif "В Себя" in buttons:
+            # Ход игрока: любая кнопка клавиатуры (цель, выстрел в себя, предмет)
+            self.pressed[chat_id] = time.perf_counter()
+            self.send(chat_id, "В Себя" if safe else self.rng.choice(buttons))
+
+    def finish(self, chat_id):
+        self.playing.discard(chat_id)
+        room = self.rooms.get(chat_id)
+        if room is None or chat_id == room.creator:
+            self.games += 1
+        if not self.playing:
+            self.done.set()
+
+
+async def sample_memory(samples, interval, use_tracemalloc):
+    while True:
+        games = sum(roulet.count_games().values())
+        used = tracemalloc.get_traced_memory()[0] if use_tracemalloc else rss_bytes()
+        samples.append((games, used))
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    roulet.METRICS_PORT = None
+    roulet.GAME_LOG_PATH = None
+    roulet.EVENT_LOG_PATH = args.event_log
+    api = await FakeBotAPI(args.api_latency).start()
+    application = roulet.build_application(token="123456:BENCH", base_url=api.base_url)
+    if not args.with_outbox:
+        # Без лимитов Telegram меряем саму обработку апдейтов
+        application.bot_data.pop("outbox")
+
+    players = Players(api, random.Random(args.seed))
+    chat_ids = itertools.count(1000)
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+
+        gc.collect()
+        if args.tracemalloc:
+            tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0] if args.tracemalloc else rss_bytes()
+        samples = []
+        sampler = asyncio.create_task(sample_memory(samples, 0.1, args.tracemalloc))
+
+        started = time.perf_counter()
+        for _ in range(args.singles):
+            players.add_single(next(chat_ids))
+        for _ in range(args.rooms):
+            players.add_room([next(chat_ids) for _ in range(args.seats)])
+        try:
+            await asyncio.wait_for(players.done.wait(), args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        sampler.cancel()
+        if args.tracemalloc:
+            tracemalloc.stop()
+        await application.updater.stop()
+        await application.stop()
+    await api.close()
+
+    latencies = players.latencies
+    print(
+        f"Одиночных игр: {args.singles}, комнат: {args.rooms} по {args.seats} — доиграно {players.games} игр "
+        f"за {elapsed:.2f} с"
+    )
+    print(f"Апдейтов: {players.updates}, {players.updates / elapsed:,.0f} в секунду")
+    print(
+        f"Задержка хода ({len(latencies)} ходов): p50 {percentile(latencies, 50) * 1000:.1f} мс, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} мс, max {max(latencies, default=0) * 1000:.1f} мс"
+    )
+    games, used = max(samples, default=(0, baseline))
+    if games:
+        kind = "tracemalloc" if args.tracemalloc else "прирост RSS"
+        print(f"Память: {games} игр одновременно, {(used - baseline) / games / 1024:.1f} КиБ на игру ({kind})")
+    print(f"Вызовы Bot API: {api.calls}")
+
+    ok = True
+    if players.errors:
+        ok = False
+        print(f"ОШИБКА: бот ответил ошибкой {sum(players.errors.values())} раз: {players.errors}")
+    if players.playing:
+        ok = False
+        print(f"ОШИБКА: не доиграли {len(players.playing)} игроков за {args.timeout:.0f} с, последние ответы бота:")
+        for chat_id in sorted(players.playing)[:10]:
+            print(f"  {chat_id}: {players.last_text.get(chat_id, '(ничего)')!r}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--singles", type=int, default=500, help="игроков против дилера")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--seats", type=int, default=4, help="игроков в комнате (2-10)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки Bot API, с")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--tracemalloc", action="store_true", help="память по tracemalloc (точнее, но медленнее)")
+    parser.add_argument("--event-log", help="писать журнал игровых событий в этот файл")
+    parser.add_argument("--with-outbox", action="store_true", help="слать через OutboundQueue с лимитами Telegram")
+    parser.add_argument("--seed", type=int, default=1)
+    if not asyncio.run(run(parser.parse_args())):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
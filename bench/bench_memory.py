@@ -0,0 +1,165 @@
+# Память на простаивающие игры: старое состояние (словарь словарей со
+# строковыми ключами "player1", списки предметов) против GameState/PlayerState
+# с теми же полями. Своего генератора и журнала у словарей не было, поэтому
+# GameState меряется с общим генератором и без журнала, а генератор и журнал
+# игры, которые добавляет бот, — отдельной строкой.
+#
+#   python bench/bench_memory.py --games 100000 --seats 4
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from engine import create_cartridges, create_player, new_rng, new_single_game
+from model import ITEM_IDS, GameState
+
+
+def old_single(game_id, rng):
+    return {
+        "player_lives": 5,
+        "dealer_lives": 5,
+        "player_items": rng.sample(ITEM_IDS, 2),
+        "dealer_items": rng.sample(ITEM_IDS, 2),
+        "cartridges": [rng.random() < 0.5 for _ in range(6)],
+        "live": 3,
+        "blank": 3,
+        "current_turn": "player",
+        "extra_turn": False,
+        "player_handcuffed": False,
+        "dealer_handcuffed": False,
+        "round_number": 1,
+        "game_active": True,
+        "mode": "single",
+        "game_id": game_id,
+        "player_mention": f"[player{game_id}](tg://user?id={game_id})",
+    }
+
+
+def old_multi(game_id, seats, rng):
+    return {
+        "players": {
+            f"player{i}": {
+                "id": game_id * 10 + i,
+                "mention": f"[player{game_id * 10 + i}](tg://user?id={game_id * 10 + i})",
+                "lives": 5,
+                "items": rng.sample(ITEM_IDS, 2),
+                "handcuffed": False,
+            }
+            for i in range(1, seats + 1)
+        },
+        "cartridges": [rng.random() < 0.5 for _ in range(6)],
+        "live": 3,
+        "blank": 3,
+        "current_turn": "player1",
+        "extra_turn": False,
+        "round_number": 1,
+        "game_active": True,
+        "mode": "multiplayer",
+        "game_id": f"{game_id:06d}",
+    }
+
+
+def new_single(game_id, rng):
+    # Как start_singleplayer, но с общим генератором и без журнала
+    state = new_single_game(game_id, f"[player{game_id}](tg://user?id={game_id})", f"player{game_id}", rng=rng)
+    state.log = None
+    return state
+
+
+def new_multi(game_id, seats, rng):
+    # Как start_multiplayer_game, но с общим генератором и без журнала
+    players = [
+        create_player(game_id * 10 + i, f"[player{game_id * 10 + i}](tg://user?id={game_id * 10 + i})", f"player{game_id * 10 + i}", rng)
+        for i in range(1, seats + 1)
+    ]
+    state = GameState(f"{game_id:06d}", "multiplayer", players, rng=rng, log=None)
+    state.magazine = create_cartridges(rng)
+    return state
+
+
+def game_rng(rng):
+    # Генератор, который бот заводит каждой игре (new_rng)
+    return new_rng(rng.getrandbits(32))[1]
+
+
+def measure(build, games):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    states = [build(game_id) for game_id in range(games)]
+    elapsed = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del states
+    return used, elapsed
+
+
+def old_lookups(states, rounds):
+    # Типичный доступ в обработчике хода: строковый ключ места и список предметов
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for state in states:
+            for i in range(1, len(state["players"]) + 1):
+                player = state["players"][f"player{i}"]
+                if player["lives"] > 0 and "beer" in player["items"]:
+                    state["extra_turn"] = not state["extra_turn"]
+    return time.perf_counter() - started
+
+
+def new_lookups(states, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for state in states:
+            for player in state.players:
+                if player.lives > 0 and player.has_item("beer"):
+                    state.extra_turn = not state.extra_turn
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seats", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    cases = [
+        ("одиночные", lambda rng: lambda i: old_single(i, rng), lambda rng: lambda i: new_single(i, rng)),
+        (f"мультиплеер x{args.seats}", lambda rng: lambda i: old_multi(i, args.seats, rng), lambda rng: lambda i: new_multi(i, args.seats, rng)),
+    ]
+    print(f"Игр: {args.games}")
+    for name, old_factory, new_factory in cases:
+        old_bytes, old_time = measure(old_factory(random.Random(args.seed)), args.games)
+        new_bytes, new_time = measure(new_factory(random.Random(args.seed)), args.games)
+        print(
+            f"{name:>16}: словари {old_bytes / 2**20:7.1f} МБ ({old_bytes / args.games:5.0f} Б/игра, {old_time:.2f} с) | "
+            f"GameState {new_bytes / 2**20:7.1f} МБ ({new_bytes / args.games:5.0f} Б/игра, {new_time:.2f} с) | "
+            f"экономия {100 * (1 - new_bytes / old_bytes):.0f}%"
+        )
+
+    # Чего у словарей не было: свой генератор и журнал действий у каждой игры
+    rng = random.Random(args.seed)
+    rng_bytes, _ = measure(lambda i: game_rng(rng), args.games)
+    log_bytes, _ = measure(lambda i: bytearray(), args.games)
+    print(
+        f"{'+ у бота':>16}: генератор {rng_bytes / args.games:.0f} Б/игра, "
+        f"пустой журнал {log_bytes / args.games:.0f} Б/игра (+1 Б за действие)"
+    )
+
+    rng = random.Random(args.seed)
+    old_states = [old_multi(i, args.seats, rng) for i in range(min(args.games, 20000))]
+    new_states = [new_multi(i, args.seats, rng) for i in range(min(args.games, 20000))]
+    old_time = old_lookups(old_states, args.rounds)
+    new_time = new_lookups(new_states, args.rounds)
+    print(f"Обход мест и проверка предметов: словари {old_time:.2f} с, GameState {new_time:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Проверка OutboundQueue на локальном fake Bot, который, как Telegram,
+# отвечает RetryAfter при превышении лимитов на чат и на бота.
+#
+#   python bench/bench_outbound.py --tables 20 --seats 10 --events 5
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from broadcast import broadcast
+from outbound import OutboundQueue
+
+
+class RetryAfter(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class FloodLimitedBot:
+    def __init__(self, latency, chat_limit=3, global_limit=30):
+        self.latency = latency
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self.chat_history = defaultdict(deque)
+        self.global_history = deque()
+        self.sent = 0
+        self.rejected = 0
+        self.first_keyboard = {}
+        self.first_flavor = {}
+
+    def _over(self, history, limit, now):
+        while history and now - history[0] > 1.0:
+            history.popleft()
+        return len(history) >= limit
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        if self._over(self.chat_history[chat_id], self.chat_limit, now) or self._over(self.global_history, self.global_limit, now):
+            self.rejected += 1
+            raise RetryAfter(1)
+        self.chat_history[chat_id].append(now)
+        self.global_history.append(now)
+        self.sent += 1
+        return text
+
+
+async def run(tables, seats, events, latency, direct):
+    bot = FloodLimitedBot(latency)
+    target = bot if direct else OutboundQueue(bot)
+    started = time.perf_counter()
+    errors = 0
+
+    async def table(t):
+        nonlocal errors
+        chat_ids = [t * 100 + s for s in range(seats)]
+        for _ in range(events):
+            result = await broadcast(target, [(c, "Игрок стреляет в себя... Холостой патрон!", {}) for c in chat_ids], stats=None)
+            errors += len(result.failed)
+            result = await broadcast(target, [(c, "Ваш ход!", {"reply_markup": "keyboard"}) for c in chat_ids], stats=None)
+            errors += len(result.failed)
+
+    await asyncio.gather(*(table(t) for t in range(tables)))
+    elapsed = time.perf_counter() - started
+    label = "напрямую" if direct else "очередь"
+    print(f"{label:>8}: доставлено {bot.sent}, ошибок у обработчиков {errors}, 429 от fake API {bot.rejected}, {elapsed:.2f} с")
+    if not direct:
+        print(f"          счётчики очереди: {target.stats()}")
+        await target.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--events", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args.tables, args.seats, args.events, args.latency, direct=True))
+    asyncio.run(run(args.tables, args.seats, args.events, args.latency, direct=False))
+
+
+if __name__ == "__main__":
+    main()
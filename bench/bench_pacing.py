@@ -0,0 +1,90 @@
+# Нагрузочный бенчмарк паузы между сообщениями: старый вариант с time.sleep
+# против TurnPacer. Апдейты всех игр обрабатываются по очереди, как в
+# python-telegram-bot без concurrent_updates.
+#
+#   python bench/bench_pacing.py --games 200 --scale 0.05
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pacing import TurnPacer, SHORT_PAUSE, LONG_PAUSE
+
+
+class FakeBot:
+    def __init__(self, latency):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+async def blocking_turn(bot, game_id, scale):
+    time.sleep(SHORT_PAUSE * scale)
+    await bot.send_message(game_id, "Игрок стреляет в дилера... Боевой патрон!")
+    time.sleep(LONG_PAUSE * scale)
+    await bot.send_message(game_id, "Дилер теряет 1 жизнь ⚡️!")
+
+
+async def paced_turn(bot, pacer, game_id, scale):
+    pacer.pause(game_id, SHORT_PAUSE * scale)
+    pacer.schedule(game_id, lambda: bot.send_message(game_id, "Игрок стреляет в дилера... Боевой патрон!"))
+    pacer.pause(game_id, LONG_PAUSE * scale)
+    pacer.schedule(game_id, lambda: bot.send_message(game_id, "Дилер теряет 1 жизнь ⚡️!"))
+
+
+async def run(mode, games, turns, scale, latency):
+    bot = FakeBot(latency)
+    pacer = TurnPacer()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(turns):
+        for game_id in range(games):
+            t0 = time.perf_counter()
+            if mode == "blocking":
+                await blocking_turn(bot, game_id, scale)
+            else:
+                await paced_turn(bot, pacer, game_id, scale)
+            latencies.append(time.perf_counter() - t0)
+    handled = time.perf_counter() - started
+    for game_id in range(games):
+        await pacer.join(game_id)
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "handled_s": handled,
+        "delivered_s": total,
+        "sent": bot.sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=0.05, help="множитель пауз, 1.0 = реальные паузы")
+    parser.add_argument("--latency", type=float, default=0.002, help="задержка fake send_message, с")
+    parser.add_argument("--skip-blocking", action="store_true")
+    args = parser.parse_args()
+
+    modes = ["paced"] if args.skip_blocking else ["blocking", "paced"]
+    for mode in modes:
+        r = asyncio.run(run(mode, args.games, args.turns, args.scale, args.latency))
+        print(
+            f"{r['mode']:>8}: {r['updates']} апдейтов, p50 {r['p50_ms']:.2f} мс, p99 {r['p99_ms']:.2f} мс, "
+            f"обработаны за {r['handled_s']:.2f} с, доставлены за {r['delivered_s']:.2f} с ({r['sent']} сообщений)"
+        )
+
+
+if __name__ == "__main__":
+    main()
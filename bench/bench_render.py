@@ -0,0 +1,91 @@
+# Стоимость сборки строки статуса для стола на 10 мест: вложенные f-строки
+# (как было в обработчиках) против render_status с кэшем сегментов.
+# На каждом ходу меняется состояние одного-двух игроков, остальные — нет.
+#
+#   python bench/bench_render.py --seats 10 --turns 50000
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model import ITEMS, ITEM_IDS, GameState, Magazine, PlayerState
+from render import render_status, render_stats
+
+
+def old_format_items(items):
+    if not items:
+        return "Нет"
+    return ", ".join(f"{ITEMS[item]['emoji']} {ITEMS[item]['name']}" for item in items)
+
+
+def old_status(game_state):
+    return (
+        "Жизни: " + " | ".join(
+            f"{p.mention} "
+            f"({p.lives if p.lives > 2 else '???'} ⚡️)"
+            for p in game_state.players
+        ) + "\n"
+        "Предметы: " + ", ".join(
+            f"{p.mention}: "
+            f"{old_format_items(p.item_list())}"
+            for p in game_state.players
+        ) + "\n"
+        f"Ход: {game_state.players[game_state.current_turn].mention}\n"
+    )
+
+
+def make_table(seats, rng):
+    players = []
+    for seat in range(seats):
+        player = PlayerState(seat + 1, f"[player{seat + 1}](tg://user?id={seat + 1})", f"player{seat + 1}")
+        for item in rng.sample(ITEM_IDS, 3):
+            player.give_item(item)
+        players.append(player)
+    state = GameState("BENCH1", "multiplayer", players)
+    state.magazine = Magazine.from_list([True, False, True, True, False, True])
+    return state
+
+
+def play_turn(game_state, rng):
+    # Ход: текущий игрок тратит/получает предмет, иногда кто-то теряет жизнь
+    player = game_state.players[game_state.current_turn]
+    item = rng.choice(ITEM_IDS)
+    if not player.take_item(item):
+        player.give_item(item)
+    if rng.random() < 0.3:
+        victim = rng.choice(game_state.players)
+        victim.lives = victim.lives - 1 if victim.lives > 1 else 5
+    game_state.current_turn = (game_state.current_turn + 1) % len(game_state.players)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {}
+    for name, render in (("f-строки", old_status), ("render_status", render_status)):
+        rng = random.Random(args.seed)
+        game_state = make_table(args.seats, rng)
+        spent = 0.0
+        for _ in range(args.turns):
+            play_turn(game_state, rng)
+            started = time.perf_counter()
+            text = render(game_state)
+            spent += time.perf_counter() - started
+        results[name] = (spent / args.turns, text)
+
+    assert results["f-строки"][1] == results["render_status"][1], "статусы различаются"
+    print(f"Стол на {args.seats} мест, ходов: {args.turns}")
+    for name, (per_turn, _) in results.items():
+        print(f"{name:>14}: {per_turn * 1e6:.1f} мкс на статус")
+    print(f"Кэш сегментов: попаданий {render_stats['hits']}, промахов {render_stats['misses']}")
+
+
+if __name__ == "__main__":
+    main()
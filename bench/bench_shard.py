@@ -0,0 +1,179 @@
+# Масштабирование по процессам (shard.py): один и тот же поток апдейтов
+# раздаётся 1, 2, 4... воркерам. Ответы бота принимает заглушка Bot API
+# (bench/fake_bot_api.py), игроки жмут кнопки сразу после ответа.
+# Часть игроков заходит парами в комнаты по коду: гость всегда живёт на
+# другом воркере, чем создатель, так что его лобби переезжает на воркер
+# комнаты. Потом оба выходят из комнаты, и гость должен вернуться домой
+# (закрепление снимается).
+#
+#   python bench/bench_shard.py --workers 1 2 4 --users 200 --presses 30
+#
+# Нужен python-telegram-bot. Заглушка работает в процессе бенчмарка, так что
+# на многих воркерах упор может оказаться в неё, а не в бота.
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_bot_api import FakeBotAPI, message_update
+from shard import Dispatcher, shard_of
+
+ROOM_CREATED = re.compile(r"Код: \*\*([A-Z0-9]{6})\*\*")
+
+
+class Players:
+    def __init__(self, dispatcher, api, presses, rng):
+        self.dispatcher = dispatcher
+        self.presses = presses
+        self.rng = rng
+        self.update_ids = itertools.count(1)
+        self.left = {}  # чат -> сколько нажатий осталось
+        self.updates = 0
+        self.answered = 0
+        self.rooms = {}  # создатель -> кто должен зайти по коду
+        self.guests = {}  # создатель -> гость, который уже ввёл код
+        self.joined = 0
+        self.done = asyncio.Event()
+        self.outbox = asyncio.Queue()  # апдейты по одному, чтобы диспетчер видел их в порядке отправки
+        api.on_send(self.on_send)
+
+    def send(self, chat_id, text):
+        self.updates += 1
+        self.outbox.put_nowait(message_update(next(self.update_ids), chat_id, text))
+
+    async def pump(self):
+        while True:
+            await self.dispatcher.dispatch(await self.outbox.get())
+
+    def start_single(self, chat_id):
+        self.left[chat_id] = self.presses
+        self.send(chat_id, "/start")
+        self.send(chat_id, "Начать игру")
+
+    def start_room(self, creator, guest):
+        self.rooms[creator] = guest
+        for chat_id in (creator, guest):
+            self.send(chat_id, "/start")
+            self.send(chat_id, "Мультиплеер")
+        self.send(guest, "Присоединиться")
+        self.send(creator, "Создать комнату")
+
+    def on_send(self, chat_id, text, params):
+        created = ROOM_CREATED.search(text)
+        if created and chat_id in self.rooms:
+            guest = self.guests[chat_id] = self.rooms.pop(chat_id)
+            self.send(guest, created.group(1))
+            return
+        if "присоединился к комнате" in text and chat_id in self.guests:
+            self.joined += 1
+            self.send(self.guests.pop(chat_id), "Покинуть комнату")
+            self.send(chat_id, "Покинуть комнату")
+            self.check_done()
+            return
+        # Ход одиночной игры заканчивается сообщением с клавиатурой
+        if chat_id not in self.left or "reply_markup" not in params:
+            return
+        self.answered += 1
+        if "Игра окончена" in text:
+            self.send(chat_id, "/start")
+            self.send(chat_id, "Начать игру")
+            return
+        if self.left[chat_id] <= 0:
+            del self.left[chat_id]
+            self.check_done()
+            return
+        self.left[chat_id] -= 1
+        self.send(chat_id, self.rng.choice(["В Дилера", "В Себя"]))
+
+    def check_done(self):
+        if not self.left and not self.rooms and not self.guests:
+            self.done.set()
+
+
+def room_pairs(count, workers, first=100000):
+    # Пары (создатель, гость) на разных воркерах, иначе переезда не будет
+    ids = itertools.count(first)
+    pairs = []
+    while len(pairs) < count:
+        creator = next(ids)
+        guest = next(ids)
+        while workers > 1 and shard_of(guest, workers) == shard_of(creator, workers):
+            guest = next(ids)
+        pairs.append((creator, guest))
+    return pairs
+
+
+async def run_once(workers, args):
+    api = await FakeBotAPI().start()
+    dispatcher = Dispatcher(
+        workers, "123456:BENCH", api.base_url, rate_limits=False,
+        release_interval=args.release_interval, log_level=logging.WARNING
+    ).start()
+    players = Players(dispatcher, api, args.presses, random.Random(args.seed))
+    pump = asyncio.create_task(players.pump())
+    # Даём воркерам подняться (getMe у заглушки)
+    while api.calls.get("getMe", 0) < workers:
+        await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    for i in range(args.users):
+        players.start_single(1000 + i)
+    for creator, guest in room_pairs(args.rooms, workers):
+        players.start_room(creator, guest)
+    try:
+        await asyncio.wait_for(players.done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"  не дождались: {len(players.left)} игроков, {len(players.rooms) + len(players.guests)} комнат")
+    elapsed = time.perf_counter() - started
+
+    # Гости вышли из комнат — ждём, пока воркеры отпустят их закрепления
+    deadline = time.monotonic() + args.release_interval * 3
+    while dispatcher.pins and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        dispatcher.collect_released()
+
+    pump.cancel()
+    await dispatcher.stop()
+    await api.close()
+    return players, dispatcher, elapsed
+
+
+async def run(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = None
+    for workers in args.workers:
+        players, dispatcher, elapsed = await run_once(workers, args)
+        rate = players.updates / elapsed
+        baseline = baseline or rate
+        print(
+            f"Воркеров: {workers:>2} — {players.updates} апдейтов за {elapsed:.2f} с, {rate:,.0f} в секунду "
+            f"(x{rate / baseline:.2f}), по воркерам {dispatcher.stats['updates']}"
+        )
+        print(
+            f"  комнат собрано: {players.joined}/{args.rooms}, переездов: {dispatcher.stats['migrations']}, "
+            f"отказов: {dispatcher.stats['handovers_refused']}, закреплений снято: {dispatcher.stats['pins_released']}, "
+            f"осталось: {len(dispatcher.pins)}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=20, help="пар игроков, заходящих в комнату по коду")
+    parser.add_argument("--presses", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--release-interval", type=float, default=0.5, help="как часто воркеры отпускают гостей, с")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
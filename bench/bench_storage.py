@@ -0,0 +1,69 @@
+# Пропускная способность хранилища состояния: сколько "нажатий кнопок"
+# (чтение и изменение состояния игры) в секунду выдерживает каждый бэкенд.
+#
+#   python bench/bench_storage.py --games 1000 --updates 100000
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storage import open_store
+
+
+def new_game(game_id):
+    return {
+        "game_id": game_id,
+        "player_lives": 5,
+        "dealer_lives": 5,
+        "player_items": ["magnifier", "beer"],
+        "dealer_items": ["knife", "phone"],
+        "cartridges": [True, False, True, True, False, True],
+        "live": 4,
+        "blank": 2,
+        "current_turn": "player",
+        "round_number": 1,
+        "game_active": True,
+        "mode": "single",
+    }
+
+
+async def run(backend, games, updates, flush_ms, sync_every_update):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    store = open_store(backend, path, flush_ms)
+    game_states = store.map("game_states", shared_key=lambda state: state["game_id"])
+    for chat_id in range(games):
+        game_states[chat_id] = new_game(chat_id)
+
+    started = time.perf_counter()
+    for i in range(updates):
+        state = game_states[random.randrange(games)]
+        state["round_number"] += 1
+        state["player_lives"] = 5 - state["round_number"] % 5
+        if sync_every_update:
+            store.flush()
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # даём отработать фоновому сбросу
+    elapsed = time.perf_counter() - started
+    store.close()
+    label = backend + (" (запись на каждый апдейт)" if sync_every_update else "")
+    print(f"{label:>36}: {updates / elapsed:>10.0f} апдейтов/с, сбросов {store.flushes}, строк записано {store.rows_written}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=100000)
+    parser.add_argument("--flush-ms", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run("memory", args.games, args.updates, args.flush_ms, False))
+    asyncio.run(run("sqlite", args.games, args.updates, args.flush_ms, False))
+    asyncio.run(run("sqlite", args.games, min(args.updates, 5000), args.flush_ms, True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Сквозная задержка обработки апдейта в режиме webhook: скрипт поднимает
+# заглушку Bot API (bench/fake_bot_api.py), запускает бота с webhook-сервером
+# на localhost и шлёт ему POST-ами апдейты. Задержка — от POST до сообщения
+# бота с клавиатурой в тот же чат. В Telegram ничего не уходит.
+#
+#   python bench/bench_webhook.py --users 50 --presses 30
+#   python bench/bench_webhook.py --updates recorded.jsonl   # по апдейту JSON в строке
+#
+# Нужны python-telegram-bot[webhooks] и httpx (ставится вместе с ним).
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+
+import roulet
+from fake_bot_api import FakeBotAPI, message_update
+
+SECRET = "bench-secret"
+
+
+def load_updates(path):
+    # Записанные апдейты группируются по чатам: чаты идут параллельно,
+    # апдейты одного чата — по порядку, как их слал бы пользователь
+    chats = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                update = json.loads(line)
+                message = update.get("message") or update.get("callback_query", {}).get("message", {})
+                chats.setdefault(message.get("chat", {}).get("id"), []).append(update)
+    return chats
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Harness:
+    def __init__(self, api, client, url, timeout):
+        self.api = api
+        self.client = client
+        self.url = url
+        self.timeout = timeout
+        self.latencies = []
+        self.timeouts = 0
+        self._waiters = {}
+        api.on_send(self._on_send)
+
+    def _on_send(self, chat_id, text, params):
+        # Ход заканчивается сообщением с клавиатурой (или её удалением)
+        if "reply_markup" not in params:
+            return
+        waiter = self._waiters.pop(chat_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(text)
+
+    async def post(self, chat_id, update):
+        waiter = self._waiters[chat_id] = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        response = await self.client.post(self.url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        response.raise_for_status()
+        try:
+            text = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(chat_id, None)
+            self.timeouts += 1
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        return text
+
+
+async def play(harness, user_id, presses, update_ids, rng):
+    # Одиночная игра: /start, "Начать игру" и выстрелы наугад; после конца игры — заново
+    text = await harness.post(user_id, message_update(next(update_ids), user_id, "/start"))
+    text = await harness.post(user_id, message_update(next(update_ids), user_id, "Начать игру"))
+    for _ in range(presses):
+        if text and "Игра окончена" in text:
+            await harness.post(user_id, message_update(next(update_ids), user_id, "/start"))
+            text = await harness.post(user_id, message_update(next(update_ids), user_id, "Начать игру"))
+            continue
+        text = await harness.post(user_id, message_update(next(update_ids), user_id, rng.choice(["В Дилера", "В Себя"])))
+
+
+async def replay(harness, chat_id, updates):
+    for update in updates:
+        await harness.post(chat_id, update)
+
+
+async def run(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    api = await FakeBotAPI(args.api_latency).start()
+    application = roulet.build_application(token="123456:BENCH", base_url=api.base_url)
+    if not args.with_outbox:
+        # Без лимитов Telegram меряем саму обработку апдейта
+        application.bot_data.pop("outbox")
+
+    url = f"http://127.0.0.1:{args.port}/{roulet.WEBHOOK_PATH}"
+    async with application:
+        await application.start()
+        await application.updater.start_webhook(
+            listen="127.0.0.1",
+            port=args.port,
+            url_path=roulet.WEBHOOK_PATH,
+            webhook_url=url,
+            secret_token=SECRET
+        )
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=args.connections)) as client:
+            harness = Harness(api, client, url, args.timeout)
+            started = time.perf_counter()
+            if args.updates:
+                chats = load_updates(args.updates)
+                await asyncio.gather(*(replay(harness, chat_id, updates) for chat_id, updates in chats.items()))
+            else:
+                update_ids = itertools.count(1)
+                rng = random.Random(args.seed)
+                await asyncio.gather(*(play(harness, 1000 + i, args.presses, update_ids, rng) for i in range(args.users)))
+            elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+    await api.close()
+
+    latencies = harness.latencies
+    print(f"Апдейтов: {len(latencies) + harness.timeouts} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} в секунду), без ответа: {harness.timeouts}")
+    print(
+        f"Задержка: p50 {percentile(latencies, 50) * 1000:.1f} мс, p90 {percentile(latencies, 90) * 1000:.1f} мс, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} мс, max {max(latencies, default=0) * 1000:.1f} мс"
+    )
+    print(f"Вызовы Bot API: {api.calls}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--presses", type=int, default=20)
+    parser.add_argument("--updates", help="файл с записанными апдейтами (JSON lines)")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа заглушки Bot API, с")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--with-outbox", action="store_true", help="слать через OutboundQueue с лимитами Telegram")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
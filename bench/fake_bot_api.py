@@ -0,0 +1,177 @@
+# Локальная заглушка Bot API для бенчмарков: отвечает на запросы бота как
+# api.telegram.org, но никуда не ходит. Бот подключается к ней через
+# base_url="http://127.0.0.1:<port>/bot". message_update() и callback_update()
+# собирают апдейты, как их прислал бы Telegram; push_update() кладёт апдейт
+# в очередь, которую бот забирает через getUpdates (long polling).
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from urllib.parse import parse_qs
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Buckshot", "username": "buckshot_bench_bot"}
+
+
+def parse_params(headers, body):
+    content_type = headers.get("content-type", "")
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    # python-telegram-bot шлёт form-urlencoded, сложные значения — строками JSON
+    params = {}
+    for key, values in parse_qs(body.decode(), keep_blank_values=True).items():
+        value = values[-1]
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+
+def message_update(update_id, user_id, text):
+    user = {"id": user_id, "is_bot": False, "first_name": f"Bench{user_id}", "username": f"bench{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"], "username": user["username"]},
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id, user_id, data):
+    # Нажатие inline-кнопки под сообщением бота в личном чате
+    user = {"id": user_id, "is_bot": False, "first_name": f"Bench{user_id}", "username": f"bench{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"], "username": user["username"]},
+        "from": BOT_USER,
+        "text": "",
+    }
+    return {
+        "update_id": update_id,
+        "callback_query": {"id": str(update_id), "from": user, "message": message, "chat_instance": str(user_id), "data": data},
+    }
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.calls = {}
+        self.sent = []  # (monotonic, chat_id, text)
+        self.listeners = []
+        self.updates = deque()  # ещё не подтверждённые ботом (offset) апдейты
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1)
+        self._server = None
+        self._connections = {}  # задача соединения -> writer
+        self._closing = False
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        # Соединения закрываем сами и ждём их обработчики: отменённый
+        # обработчик asyncio.start_server выводит трассировку CancelledError
+        if self._server is not None:
+            self._closing = True
+            self._server.close()
+            self._new_updates.set()  # будим long polling
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def on_send(self, callback):
+        # callback(chat_id, text, params) вызывается на каждое отправленное ботом сообщение
+        self.listeners.append(callback)
+
+    def push_update(self, update):
+        # update_id должны расти, как у Telegram
+        self.updates.append(update)
+        self._new_updates.set()
+
+    async def get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        timeout = float(params.get("timeout") or 0)
+        if not self.updates and timeout and not self._closing:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self.updates, int(params.get("limit") or 100)))
+
+    def _message(self, chat_id, text):
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def respond(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            text = str(params.get("text", ""))
+            self.sent.append((time.monotonic(), chat_id, text))
+            for callback in self.listeners:
+                callback(chat_id, text, params)
+            return self._message(chat_id, text)
+        return True
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while not self._closing:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                method = path.rstrip("/").rsplit("/", 1)[-1]
+                self.calls[method] = self.calls.get(method, 0) + 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                params = parse_params(headers, body)
+                result = await self.get_updates(params) if method == "getUpdates" else self.respond(method, params)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
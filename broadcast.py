@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from profiling import telegram_wait
+
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений одной рассылки отправляется одновременно
+BROADCAST_CONCURRENCY = 10
+
+
+class FanoutStats:
+    # Метрики рассылок: количество, ошибки и задержка всей рассылки
+    def __init__(self, window=1000):
+        self.broadcasts = 0
+        self.messages = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, recipients, failures, elapsed):
+        self.broadcasts += 1
+        self.messages += recipients
+        self.failures += failures
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        self._recent.append(elapsed)
+
+    def percentile(self, q):
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def snapshot(self):
+        return {
+            "broadcasts": self.broadcasts,
+            "messages": self.messages,
+            "failures": self.failures,
+            "avg_ms": self.total_seconds / self.broadcasts * 1000 if self.broadcasts else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+fanout_stats = FanoutStats()
+
+
+class BroadcastResult:
+    def __init__(self, sent, failed, elapsed):
+        self.sent = sent
+        self.failed = failed  # chat_id -> исключение
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return not self.failed
+
+
+async def broadcast(bot, messages, concurrency=BROADCAST_CONCURRENCY, stats=fanout_stats):
+    # messages — список (chat_id, text, kwargs). Ошибка одного получателя не
+    # прерывает рассылку остальным, она попадает в result.failed.
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def send_one(chat_id, text, kwargs):
+        async with semaphore:
+            await bot.send_message(chat_id, text, **kwargs)
+
+    with telegram_wait():
+        results = await asyncio.gather(
+            *(send_one(chat_id, text, kwargs) for chat_id, text, kwargs in messages),
+            return_exceptions=True
+        )
+    failed = {}
+    for (chat_id, _, _), result in zip(messages, results):
+        if isinstance(result, BaseException):
+            failed[chat_id] = result
+            logger.warning(f"Broadcast to {chat_id} failed: {result!r}")
+    elapsed = time.perf_counter() - started
+    if stats is not None:
+        stats.record(len(messages), len(failed), elapsed)
+    return BroadcastResult(len(messages) - len(failed), failed, elapsed)
+
@@ -0,0 +1,266 @@
+import time
+from collections import OrderedDict
+
+from model import ITEM_IDS, ITEM_INDEX, PLAYER, DEALER, MAX_LIVES
+
+# Сложный дилер: expectimax по состоянию магазина (дилер максимизирует свой
+# шанс на победу, игрок — минимизирует, патроны — случайность). Глубина
+# растёт, пока не кончится бюджет времени на решение.
+SEARCH_BUDGET_MS = 20
+MAX_DEPTH = 10
+TABLE_SIZE = 200000
+
+MAGNIFIER = ITEM_INDEX["magnifier"]
+KNIFE = ITEM_INDEX["knife"]
+CIGARETTES = ITEM_INDEX["cigarettes"]
+BEER = ITEM_INDEX["beer"]
+HANDCUFFS = ITEM_INDEX["handcuffs"]
+ADRENALINE = ITEM_INDEX["adrenaline"]
+REVERSE = ITEM_INDEX["reverse"]
+# Телефон в поиске не участвует: знание о дальних патронах не отслеживается
+SEARCH_ITEMS = (MAGNIFIER, KNIFE, CIGARETTES, BEER, HANDCUFFS, ADRENALINE, REVERSE)
+
+# Поля состояния (кортеж): патроны, что известно о следующем, жизни, предметы,
+# наручники, урон следующего выстрела, чей ход
+LIVE, BLANK, KNOWN, D_LIVES, P_LIVES, D_ITEMS, P_ITEMS, D_CUFFED, P_CUFFED, DAMAGE, TURN = range(11)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def take(items, index):
+    return items[:index] + bytes((items[index] - 1,)) + items[index + 1:]
+
+
+def give(items, index):
+    return items[:index] + bytes((min(255, items[index] + 1),)) + items[index + 1:]
+
+
+def heuristic(state):
+    # Магазин кончился или глубина исчерпана: доля жизней дилера
+    return state[D_LIVES] / (state[D_LIVES] + state[P_LIVES])
+
+
+def pass_turn(state):
+    # Ход переходит к сопернику; если он в наручниках — он пропускает ход
+    s = list(state)
+    if s[TURN] == DEALER:
+        if s[P_CUFFED]:
+            s[P_CUFFED] = False
+        else:
+            s[TURN] = PLAYER
+    else:
+        if s[D_CUFFED]:
+            s[D_CUFFED] = False
+        else:
+            s[TURN] = DEALER
+    return s
+
+
+class Expectimax:
+    def __init__(self, budget_ms=SEARCH_BUDGET_MS, max_depth=MAX_DEPTH, table_size=TABLE_SIZE):
+        self.budget = budget_ms / 1000
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.table = OrderedDict()  # состояние -> (глубина, оценка)
+        self.stats = {"decisions": 0, "nodes": 0, "hits": 0, "misses": 0, "timeouts": 0, "depth_sum": 0}
+        self._deadline = None
+
+    def live_chance(self, state):
+        if state[KNOWN] is not None:
+            return 1.0 if state[KNOWN] else 0.0
+        return state[LIVE] / (state[LIVE] + state[BLANK])
+
+    def value(self, state, depth):
+        if state[P_LIVES] <= 0:
+            return 1.0
+        if state[D_LIVES] <= 0:
+            return 0.0
+        if not state[LIVE] + state[BLANK] or depth == 0:
+            return heuristic(state)
+        cached = self.table.get(state)
+        if cached is not None and cached[0] >= depth:
+            self.table.move_to_end(state)
+            self.stats["hits"] += 1
+            return cached[1]
+        self.stats["misses"] += 1
+        self.stats["nodes"] += 1
+        if not self.stats["nodes"] & 255 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        values = [q for _, q in self.moves(state, depth)]
+        result = max(values) if state[TURN] == DEALER else min(values)
+        self.table[state] = (depth, result)
+        if len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+        return result
+
+    def shoot(self, state, target, depth):
+        # Оценка выстрела: среднее по боевому и холостому
+        p_live = self.live_chance(state)
+        result = 0.0
+        if p_live > 0:
+            s = list(state)
+            s[LIVE] -= 1
+            s[KNOWN] = None
+            lives = D_LIVES if target == DEALER else P_LIVES
+            s[lives] -= s[DAMAGE]
+            s[DAMAGE] = 1
+            result += p_live * self.value(tuple(pass_turn(s)), depth - 1)
+        if p_live < 1:
+            s = list(state)
+            s[BLANK] -= 1
+            s[KNOWN] = None
+            s[DAMAGE] = 1
+            if target != s[TURN]:
+                s = pass_turn(s)
+            result += (1 - p_live) * self.value(tuple(s), depth - 1)
+        return result
+
+    def reveal(self, state):
+        # Лупа: (вероятность, состояние с известным следующим патроном)
+        p_live = self.live_chance(state)
+        outcomes = []
+        for known, p in ((True, p_live), (False, 1 - p_live)):
+            if p > 0:
+                s = list(state)
+                s[KNOWN] = known
+                outcomes.append((p, s))
+        return outcomes
+
+    def moves(self, state, depth):
+        # (ход, оценка) для того, чей сейчас ход. Ход дилера повторяет
+        # engine.dealer_step: лупа и нож сразу заканчиваются выстрелом
+        dealer_turn = state[TURN] == DEALER
+        me, opp = (DEALER, PLAYER) if dealer_turn else (PLAYER, DEALER)
+        my_items, opp_items = (D_ITEMS, P_ITEMS) if dealer_turn else (P_ITEMS, D_ITEMS)
+        my_lives = D_LIVES if dealer_turn else P_LIVES
+        opp_cuffed = P_CUFFED if dealer_turn else D_CUFFED
+        items = state[my_items]
+
+        result = [(("shoot", opp), self.shoot(state, opp, depth)), (("shoot", me), self.shoot(state, me, depth))]
+        for index in SEARCH_ITEMS:
+            if not items[index]:
+                continue
+            s = list(state)
+            s[my_items] = take(items, index)
+            if index == MAGNIFIER:
+                if state[KNOWN] is not None:
+                    continue
+                q = 0.0
+                for p, child in self.reveal(s):
+                    child = tuple(child)
+                    if dealer_turn:
+                        q += p * max(self.shoot(child, PLAYER, depth), self.shoot(child, DEALER, depth))
+                    else:
+                        q += p * self.value(child, depth - 1)
+            elif index == KNIFE:
+                if state[DAMAGE] > 1:
+                    continue
+                s[DAMAGE] = 2
+                if dealer_turn:
+                    q = self.shoot(tuple(s), PLAYER, depth)
+                else:
+                    q = self.value(tuple(s), depth - 1)
+            elif index == CIGARETTES:
+                if state[my_lives] >= MAX_LIVES:
+                    continue
+                s[my_lives] += 1
+                q = self.value(tuple(s), depth - 1)
+            elif index == BEER:
+                p_live = self.live_chance(state)
+                q = 0.0
+                for counter, p in ((LIVE, p_live), (BLANK, 1 - p_live)):
+                    if p > 0:
+                        child = list(s)
+                        child[counter] -= 1
+                        child[KNOWN] = None
+                        q += p * self.value(tuple(child), depth - 1)
+            elif index == HANDCUFFS:
+                if state[opp_cuffed]:
+                    continue
+                s[opp_cuffed] = True
+                q = self.value(tuple(s), depth - 1)
+            elif index == ADRENALINE:
+                total = sum(state[opp_items])
+                if not total:
+                    continue
+                q = 0.0
+                for stolen, count in enumerate(state[opp_items]):
+                    if count:
+                        child = list(s)
+                        child[opp_items] = take(state[opp_items], stolen)
+                        child[my_items] = give(s[my_items], stolen)
+                        q += count / total * self.value(tuple(child), depth - 1)
+            elif index == REVERSE:
+                # Без лупы результат реверса неизвестен — используем только вместе с ней
+                if state[KNOWN] is None:
+                    continue
+                if state[KNOWN]:
+                    s[LIVE] -= 1
+                    s[BLANK] += 1
+                else:
+                    s[LIVE] += 1
+                    s[BLANK] -= 1
+                s[KNOWN] = not state[KNOWN]
+                q = self.value(tuple(s), depth - 1)
+            result.append((("item", index), q))
+        return result
+
+    def root_state(self, game_state):
+        player = game_state.players[PLAYER]
+        dealer = game_state.players[DEALER]
+        magazine = game_state.magazine
+        return (
+            magazine.live, magazine.blank, None,
+            dealer.lives, player.lives, bytes(dealer.items), bytes(player.items),
+            dealer.handcuffed, player.handcuffed, 1, DEALER
+        )
+
+    def decide(self, game_state):
+        # Ответ в формате engine.dealer_decision: (в кого стрелять, предмет)
+        state = self.root_state(game_state)
+        self.stats["decisions"] += 1
+        if not state[LIVE] + state[BLANK]:
+            return "player", None
+        started = time.perf_counter()
+        best = None
+        reached = 0
+        for depth in range(1, self.max_depth + 1):
+            # Первую глубину считаем всегда, дальше — пока есть время
+            self._deadline = float("inf") if depth == 1 else started + self.budget
+            try:
+                moves = self.moves(state, depth)
+            except SearchTimeout:
+                self.stats["timeouts"] += 1
+                break
+            best = max(moves, key=lambda move: move[1])[0]
+            reached = depth
+            if time.perf_counter() - started > self.budget / 2:
+                break
+        self.stats["depth_sum"] += reached
+
+        kind, value = best
+        if kind == "shoot":
+            return ("player" if value == PLAYER else "self"), None
+        item = ITEM_IDS[value]
+        if item == "magnifier":
+            # Лупа показывает патрон — стреляем по лучшему ответу на него
+            s = list(state)
+            s[D_ITEMS] = take(state[D_ITEMS], value)
+            s[KNOWN] = game_state.magazine.peek()
+            s = tuple(s)
+            self._deadline = float("inf")
+            at_player = self.shoot(s, PLAYER, max(reached, 1))
+            at_self = self.shoot(s, DEALER, max(reached, 1))
+            return ("player" if at_player >= at_self else "self"), item
+        if item == "knife":
+            return "player", item
+        return None, item
+
+
+hard_dealer = Expectimax()
+
+
+def hard_decision(game_state):
+    return hard_dealer.decide(game_state)
@@ -0,0 +1,103 @@
+# Таблица решений дилера: dealer_decision зависит только от небольшого
+# состояния (боевые, холостые, какие предметы есть у дилера, следующий патрон,
+# наручники на игроке, жизни дилера), поэтому все ответы можно посчитать
+# заранее и во время игры брать один байт по индексу.
+#
+#   python dealer_table.py dealer_table.bin
+import sys
+from array import array
+
+from model import ITEM_IDS, ITEM_INDEX, PLAYER, DEALER, MAX_LIVES, Magazine
+
+TABLE_PATH = "dealer_table.bin"
+MAGIC = b"BRDT\x01"
+MAX_SHELLS = 8
+TABLE_SIZE = MAX_LIVES * (MAX_SHELLS + 1) * (MAX_SHELLS + 1) * 256 * 4
+
+# Код в таблице: (номер предмета + 1) * 4 + действие
+ACTIONS = (None, "player", "self", "odds")  # "odds" — наугад, монетку бросает dealer_step
+DECISIONS = [(action, item) for item in (None,) + tuple(ITEM_IDS) for action in ACTIONS]
+
+table = None
+
+
+def state_index(live, blank, items_mask, next_live, player_handcuffed, dealer_lives):
+    return ((((dealer_lives - 1) * (MAX_SHELLS + 1) + live) * (MAX_SHELLS + 1) + blank) * 256 + items_mask) * 4 + next_live * 2 + player_handcuffed
+
+
+def items_mask(items):
+    mask = 0
+    for index, count in enumerate(items):
+        if count:
+            mask |= 1 << index
+    return mask
+
+
+def encode(action, item):
+    return (ITEM_INDEX[item] + 1 if item else 0) * 4 + ACTIONS.index(action)
+
+
+def build(decide=None):
+    if decide is None:
+        from engine import dealer_decision as decide
+    codes = array("B", bytes(TABLE_SIZE))
+    for dealer_lives in range(1, MAX_LIVES + 1):
+        for live in range(MAX_SHELLS + 1):
+            for blank in range(MAX_SHELLS + 1 - live):
+                for next_live in (False, True):
+                    if (next_live and not live) or (not next_live and not blank):
+                        continue  # недостижимо: такого патрона нет
+                    rest = [True] * (live - next_live) + [False] * (blank - (not next_live))
+                    magazine = Magazine.from_list([next_live] + rest)
+                    for mask in range(256):
+                        dealer_items = [item for item in ITEM_IDS if mask & (1 << ITEM_INDEX[item])]
+                        for player_handcuffed in (False, True):
+                            action, item = decide(magazine, dealer_items, player_handcuffed, dealer_lives)
+                            index = state_index(live, blank, mask, next_live, player_handcuffed, dealer_lives)
+                            codes[index] = encode(action, item)
+    return codes
+
+
+def save_table(codes, path=TABLE_PATH):
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        codes.tofile(f)
+
+
+def load_table(path=TABLE_PATH):
+    global table
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a dealer table, rebuild it with: python dealer_table.py {path}")
+        codes = array("B")
+        codes.frombytes(f.read())
+    if len(codes) != TABLE_SIZE:
+        raise ValueError(f"{path} has {len(codes)} entries instead of {TABLE_SIZE}, rebuild it")
+    table = codes
+    return codes
+
+
+def table_decision(game_state):
+    # Ответ в формате engine.dealer_decision, одним обращением к таблице
+    if table is None:
+        load_table()
+    magazine = game_state.magazine
+    if not magazine:
+        return "player", None
+    dealer = game_state.players[DEALER]
+    index = state_index(
+        magazine.live, magazine.size - magazine.live, items_mask(dealer.items),
+        magazine.bits & 1, game_state.players[PLAYER].handcuffed, dealer.lives
+    )
+    return DECISIONS[table[index]]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TABLE_PATH
+    codes = build()
+    save_table(codes, path)
+    print(f"Таблица дилера: {len(codes)} состояний, {len(MAGIC) + len(codes)} байт -> {path}")
+
+
+if __name__ == "__main__":
+    main()
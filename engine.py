@@ -0,0 +1,390 @@
+import random
+
+from model import ITEM_IDS, ITEM_INDEX, PLAYER, DEALER, MAX_LIVES, Magazine, PlayerState, GameState
+from dealer_ai import hard_decision
+from dealer_table import table_decision
+
+# Правила игры без Telegram: функции меняют GameState и возвращают список
+# событий, по которым бот пишет сообщения (а симулятор — просто считает).
+# Событие — кортеж, первый элемент — вид:
+#   ("handcuffed", seat)                   — игрок в наручниках пропускает ход
+#   ("item", seat, item, result)           — использован предмет, result см. use_item()
+#   ("choice", seat, target)               — дилер объявляет, в кого стреляет
+#   ("shot", seat, target, live, damage)   — выстрел; damage — снятые жизни (0 для холостого)
+#   ("extra_turn", seat)                   — холостой в себя, ход остаётся у стрелявшего
+#   ("pass", seat)                         — дилер ничего не делает и отдаёт ход
+#   ("new_round", round_number)
+#   ("game_over", winner)
+#   ("invalid", reason)                    — действие отклонено, состояние не изменилось
+#
+# Каждое действие одиночной игры дописывается в game_state.log одним байтом
+# (см. log_player/log_dealer), так что по seed и журналу игру можно
+# повторить один в один (replay.py).
+
+# Шанс, что патрон будет боевым (66%)
+LIVE_CHANCE = 0.66
+# Дилер: "basic" — правила из dealer_decision, "hard" — поиск из dealer_ai.py,
+# "table" — те же правила, что "basic", но из готовой таблицы (dealer_table.py)
+DEALER_AI = "basic"
+
+
+# Коды журнала: 0 — в дилера, 1 — в себя, 2..9 — предмет, 10 — нет такой
+# кнопки; у хода дилера старший бит 1, дальше бросок монетки, предмет и действие.
+# Действие 3 — ход дилера прерван ограничителем и отдан игроку (force_pass)
+LOG_ACTIONS = ("dealer", "self") + tuple(ITEM_IDS) + (None,)
+LOG_CODES = {action: code for code, action in enumerate(LOG_ACTIONS)}
+DEALER_ACTIONS = (None, "player", "self")
+FORCED_PASS = 0x80 | len(DEALER_ACTIONS)
+
+
+def log_dealer(action, used_item, coin):
+    item_code = ITEM_INDEX[used_item] + 1 if used_item else 0
+    return 0x80 | coin << 6 | item_code << 2 | DEALER_ACTIONS.index(action)
+
+
+def read_dealer(code):
+    # (action, used_item, coin) из байта журнала
+    item_code = code >> 2 & 0xF
+    return DEALER_ACTIONS[code & 3], ITEM_IDS[item_code - 1] if item_code else None, bool(code & 0x40)
+
+
+MASK64 = (1 << 64) - 1
+
+
+class GameRng:
+    # Генератор игры (splitmix64): всё состояние — одно 64-битное число,
+    # а не ~2.5 КБ у random.Random. Умеет то, что нужно движку и боту
+    __slots__ = ("state",)
+
+    def __init__(self, seed):
+        self.state = seed & MASK64
+
+    def next64(self):
+        self.state = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def below(self, n):
+        # Равномерно из [0, n): значения из неполного последнего отрезка отбрасываются
+        limit = (1 << 64) - (1 << 64) % n
+        while True:
+            value = self.next64()
+            if value < limit:
+                return value % n
+
+    def randint(self, a, b):
+        return a + self.below(b - a + 1)
+
+    def choice(self, seq):
+        if not seq:
+            raise IndexError("cannot choose from an empty sequence")
+        return seq[self.below(len(seq))]
+
+    def shuffle(self, x):
+        for i in range(len(x) - 1, 0, -1):
+            j = self.below(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+    def sample(self, population, k):
+        pool = list(population)
+        for i in range(k):
+            j = i + self.below(len(pool) - i)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+
+def new_rng(seed=None):
+    # Свой генератор у каждой игры: seed пишется в журнал
+    if seed is None:
+        seed = random.getrandbits(32)
+    return seed, GameRng(seed)
+
+
+def create_cartridges(rng=random, live_chance=None):
+    if live_chance is None:
+        live_chance = LIVE_CHANCE
+    total = rng.randint(4, 8)
+    cartridges = []
+    live = 0
+    blank = 0
+
+    for _ in range(total):
+        is_live = rng.random() < live_chance
+        cartridges.append(is_live)
+        if is_live:
+            live += 1
+        else:
+            blank += 1
+
+    # Гарантируем хотя бы один холостой патрон
+    if blank == 0:
+        idx = rng.randint(0, total - 1)
+        cartridges[idx] = False
+        live -= 1
+        blank += 1
+
+    rng.shuffle(cartridges)
+    return Magazine.from_list(cartridges)
+
+
+def create_initial_items(rng=random):
+    return rng.sample(ITEM_IDS, 2)
+
+
+def create_player(chat_id, mention, name, rng=random):
+    player = PlayerState(chat_id, mention, name)
+    for item in create_initial_items(rng):
+        player.give_item(item)
+    return player
+
+
+def add_item(player, rng=random):
+    player.give_item(rng.choice(ITEM_IDS))
+
+
+def new_single_game(chat_id, mention, name, rng=None, seed=None):
+    # Без rng игра получает свой генератор из seed (или случайного seed)
+    if rng is None:
+        seed, rng = new_rng(seed)
+    player = create_player(chat_id, mention, name, rng)
+    dealer = create_player(0, "Дилер", "Дилер", rng)
+    game_state = GameState(game_id=chat_id, mode="single", players=[player, dealer], current_turn=PLAYER, seed=seed, rng=rng)
+    game_state.magazine = create_cartridges(rng)
+    return game_state
+
+
+def new_round(game_state, rng=None):
+    rng = rng or game_state.rng or random
+    game_state.round_number += 1
+    game_state.magazine = create_cartridges(rng)
+    for player in game_state.players:
+        add_item(player, rng)
+    game_state.current_turn = game_state.alive_seats()[0]
+    game_state.extra_turn = False
+    game_state.damage = 1
+    return [("new_round", game_state.round_number)]
+
+
+def get_next_player(game_state, current_player):
+    alive = game_state.alive_seats()
+    for seat in alive:
+        if seat > current_player:
+            return seat
+    return alive[0]
+
+
+def use_item(game_state, seat, item, rng, events, use_stolen=True):
+    # Предмет уже снят с игрока. result в событии:
+    #   magnifier — следующий патрон; cigarettes — вылечился ли;
+    #   beer — выброшенный патрон или None; handcuffs — на кого надеты;
+    #   adrenaline — украденный предмет или None; phone — (номер, боевой) или None;
+    #   reverse — новый следующий патрон или None; knife — None
+    magazine = game_state.magazine
+    user = game_state.players[seat]
+    opponent_seat = DEALER if seat == PLAYER else PLAYER
+    opponent = game_state.players[opponent_seat]
+    result = None
+    if item == "magnifier":
+        result = magazine.peek()
+    elif item == "knife":
+        game_state.damage = 2
+    elif item == "cigarettes":
+        result = user.lives < MAX_LIVES
+        if result:
+            user.lives += 1
+    elif item == "beer":
+        if magazine:
+            result = magazine.eject()
+    elif item == "handcuffs":
+        opponent.handcuffed = True
+        result = opponent_seat
+    elif item == "adrenaline":
+        if opponent.item_count():
+            result = rng.choice(opponent.item_list())
+            opponent.take_item(result)
+            if not use_stolen:
+                user.give_item(result)
+    elif item == "phone":
+        if len(magazine) > 1:
+            index = rng.randint(1, len(magazine) - 1)
+            result = (index + 1, magazine.peek_at(index))
+    elif item == "reverse":
+        if magazine:
+            result = magazine.invert_next()
+    events.append(("item", seat, item, result))
+    if item == "adrenaline" and result is not None and use_stolen:
+        # Украденный предмет используется сразу
+        use_item(game_state, seat, result, rng, events)
+
+
+def shoot(game_state, seat, target, damage, events):
+    live = game_state.magazine.draw()
+    lost = damage if live else 0
+    game_state.players[target].lives -= lost
+    events.append(("shot", seat, target, live, lost))
+    if target == seat and not live:
+        game_state.extra_turn = True
+        events.append(("extra_turn", seat))
+
+
+def finish_turn(game_state, events, rng):
+    # После действия: конец игры, новый раунд или передача хода
+    player = game_state.players[PLAYER]
+    dealer = game_state.players[DEALER]
+    if player.lives <= 0 or dealer.lives <= 0:
+        game_state.game_active = False
+        events.append(("game_over", PLAYER if player.lives > 0 else DEALER))
+    elif not game_state.magazine:
+        events.extend(new_round(game_state, rng))
+    elif not game_state.extra_turn:
+        game_state.current_turn = DEALER if game_state.current_turn == PLAYER else PLAYER
+    return events
+
+
+def player_action(game_state, action, rng=None):
+    # action: "dealer", "self", id предмета или None (нет такой кнопки)
+    rng = rng or game_state.rng or random
+    game_state.log.append(LOG_CODES.get(action, LOG_CODES[None]))
+    if game_state.current_turn != PLAYER:
+        return [("invalid", "not_your_turn")]
+    player = game_state.players[PLAYER]
+    events = []
+    if player.handcuffed:
+        player.handcuffed = False
+        game_state.current_turn = DEALER
+        events.append(("handcuffed", PLAYER))
+        return events
+
+    if action in ("dealer", "self"):
+        game_state.extra_turn = False
+        if not game_state.magazine:
+            return new_round(game_state, rng)
+        shoot(game_state, PLAYER, DEALER if action == "dealer" else PLAYER, game_state.damage, events)
+        game_state.damage = 1
+        return finish_turn(game_state, events, rng)
+
+    if action not in ITEM_INDEX:
+        return [("invalid", "unknown_action")]
+    if not player.take_item(action):
+        return [("invalid", "no_item")]
+    game_state.extra_turn = True
+    use_item(game_state, PLAYER, action, rng, events)
+    if events[-1][2] == "knife":
+        # Ждём, в кого стрелять
+        return events
+    return finish_turn(game_state, events, rng)
+
+
+def dealer_step(game_state, rng=None, decision=None):
+    # Одно действие дилера; если ход остаётся у дилера, current_turn == DEALER.
+    # decision — (action, used_item, coin) из журнала при повторе игры
+    rng = rng or game_state.rng or random
+    player = game_state.players[PLAYER]
+    dealer = game_state.players[DEALER]
+    if not game_state.magazine:
+        game_state.log.append(log_dealer(None, None, False))
+        return new_round(game_state, rng)
+    events = []
+    if dealer.handcuffed:
+        game_state.log.append(log_dealer(None, None, False))
+        dealer.handcuffed = False
+        game_state.current_turn = PLAYER
+        events.append(("handcuffed", DEALER))
+        return events
+
+    game_state.extra_turn = False
+    if decision is not None:
+        action, used_item, coin = decision
+        if coin:
+            rng.random()  # тот же бросок, что и в записанной игре
+    else:
+        if DEALER_AI == "hard":
+            action, used_item = hard_decision(game_state)
+        elif DEALER_AI == "table":
+            action, used_item = table_decision(game_state)
+        else:
+            action, used_item = dealer_decision(game_state.magazine, dealer.item_list(), player.handcuffed, dealer.lives)
+        coin = action == "odds"
+        if coin:
+            magazine = game_state.magazine
+            action = "player" if rng.random() < magazine.live / len(magazine) else "self"
+    game_state.log.append(log_dealer(action, used_item, coin))
+    damage = 1
+    if used_item:
+        dealer.take_item(used_item)
+        use_item(game_state, DEALER, used_item, rng, events, use_stolen=False)
+        if used_item == "magnifier":
+            events.append(("choice", DEALER, PLAYER if action == "player" else DEALER))
+        elif used_item == "knife":
+            action = "player"
+            damage = 2
+            events.append(("choice", DEALER, PLAYER))
+        else:
+            game_state.extra_turn = True
+        game_state.damage = 1
+
+    if action in ("player", "self") and game_state.magazine:
+        shoot(game_state, DEALER, PLAYER if action == "player" else DEALER, damage, events)
+    elif not used_item:
+        events.append(("pass", DEALER))
+    return finish_turn(game_state, events, rng)
+
+
+def force_pass(game_state):
+    # Бот прервал затянувшийся ход дилера (DEALER_MAX_STEPS в roulet.py):
+    # ход переходит к игроку, и это тоже пишется в журнал для повтора
+    game_state.log.append(FORCED_PASS)
+    game_state.current_turn = PLAYER
+    game_state.extra_turn = False
+    return [("pass", DEALER)]
+
+
+def dealer_decision(magazine, dealer_items, player_handcuffed, dealer_lives):
+    # "odds" — стрелять наугад по доле боевых, монетку бросает dealer_step
+    live = magazine.live
+    blank = magazine.blank
+    total = len(magazine)
+    if total == 0:
+        return "player", None
+    live_prob = live / total if total > 0 else 0
+
+    used_item = None
+    if player_handcuffed:
+        return None, None
+    if "handcuffs" in dealer_items and live_prob > 0.5 and total > 2:
+        used_item = "handcuffs"
+        return None, used_item
+    if "beer" in dealer_items and total > 1 and live_prob > 0.5:
+        used_item = "beer"
+        return None, used_item
+    if "magnifier" in dealer_items and 0.3 < live_prob < 0.7 and total > 1:
+        used_item = "magnifier"
+        if magazine.peek():
+            return "player", used_item
+        return "self", used_item
+    if "knife" in dealer_items and live_prob > 0.3:
+        used_item = "knife"
+        return "player", used_item
+    if "cigarettes" in dealer_items and dealer_lives <= 2 and dealer_lives < MAX_LIVES:
+        used_item = "cigarettes"
+        return None, used_item
+    if "adrenaline" in dealer_items and live_prob > 0.5:
+        used_item = "adrenaline"
+        return None, used_item
+    if "phone" in dealer_items and total > 2:
+        used_item = "phone"
+        return None, used_item
+    if "reverse" in dealer_items and total > 1 and live_prob > 0.5:
+        used_item = "reverse"
+        return None, used_item
+
+    if live == 0:
+        return "self", None
+    if blank == 0:
+        return "player", None
+    return "odds", None
@@ -0,0 +1,146 @@
+# Журнал игровых событий в формате JSON lines: начало игры, раунды,
+# предметы, выстрелы и конец игры, у каждого — id игры и место игрока.
+# Обработчик апдейта только кладёт запись в очередь (QueueHandler), в файл
+# её пишет фоновый поток QueueListener: пачками, со сбросом на диск, когда
+# очередь опустела, и с ротацией по размеру. Туда же, за ту же очередь,
+# переезжает консольный лог (обработчики logging.basicConfig).
+#
+#   {"ts": 1760000000.123, "event": "shot", "game": "123", "mode": "single", "round": 1, "seat": 0, "target": 1, ...}
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger("buckshot.events")
+logger.propagate = False
+
+listener = None
+console_handlers = []
+
+
+def is_event(record):
+    return hasattr(record, "event")
+
+
+def is_not_event(record):
+    return not hasattr(record, "event")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.event, ensure_ascii=False, separators=(",", ":"))
+
+
+class BatchFileHandler(RotatingFileHandler):
+    # Пишет без сброса на каждую запись: сбрасывает BatchListener, когда
+    # очередь пуста, или сам обработчик раз в batch_size записей
+    def __init__(self, path, max_bytes, backups, batch_size):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self.stream.tell() and self.stream.tell() + len(line) >= self.maxBytes:
+                self.doRollover()
+                self.stream = self._open()
+            self.stream.write(line)
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self.pending = 0
+
+
+class EventQueueHandler(QueueHandler):
+    # Записи событий никто, кроме журнала, не видит: копировать и
+    # форматировать их в потоке обработчика незачем
+    def prepare(self, record):
+        return record
+
+
+class BatchListener(QueueListener):
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+def start(path, max_bytes, backups, batch_size):
+    # path=None — только консольный лог через очередь, без журнала событий
+    global listener, console_handlers
+    stop()
+    root = logging.getLogger()
+    console_handlers = root.handlers[:]
+    records = queue.SimpleQueue()
+    handlers = []
+    for handler in console_handlers:
+        handler.addFilter(is_not_event)
+        handlers.append(handler)
+    if path:
+        file_handler = BatchFileHandler(path, max_bytes, backups, batch_size)
+        file_handler.setFormatter(JsonLinesFormatter())
+        file_handler.addFilter(is_event)
+        handlers.append(file_handler)
+        logger.addHandler(EventQueueHandler(records))
+        logger.setLevel(logging.INFO)
+    root.handlers = [QueueHandler(records)]
+    listener = BatchListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    if path:
+        logging.getLogger(__name__).info(f"Game events go to {path}")
+
+
+def stop():
+    # Дописывает всё, что осталось в очереди, и возвращает консольный лог
+    global listener, console_handlers
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        if handler not in console_handlers:
+            handler.close()
+    for handler in console_handlers:
+        handler.removeFilter(is_not_event)
+    logging.getLogger().handlers = console_handlers
+    logger.handlers = []
+    listener = None
+    console_handlers = []
+
+
+def log_event(game_state, kind, seat=None, **fields):
+    if not logger.handlers:
+        return
+    event = {
+        "ts": round(time.time(), 3),
+        "event": kind,
+        "game": str(game_state.game_id),
+        "mode": game_state.mode,
+        "round": game_state.round_number,
+    }
+    if seat is not None:
+        event["seat"] = seat
+    event.update(fields)
+    # Без logger.info: поиск места вызова по стеку здесь не нужен
+    logger.handle(logger.makeRecord(logger.name, logging.INFO, "", 0, kind, None, None, extra={"event": event}))
+
+
+def log_engine_events(game_state, events):
+    # События движка одиночной игры (engine.py); конец игры пишет end_game
+    for event in events:
+        kind = event[0]
+        if kind == "shot":
+            log_event(game_state, "shot", event[1], target=event[2], live=event[3], damage=event[4])
+        elif kind == "item":
+            log_event(game_state, "item", event[1], item=event[2])
+        elif kind == "new_round":
+            log_event(game_state, "round_started")
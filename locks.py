@@ -0,0 +1,33 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class KeyedLocks:
+    # По одному asyncio.Lock на ключ (игру, комнату, чат). Апдейты разных игр
+    # обрабатываются параллельно, апдейты одной игры — строго по очереди.
+    # Замок удаляется, когда его больше никто не держит и не ждёт.
+    def __init__(self):
+        self._locks = {}
+        self._users = {}
+
+    @asynccontextmanager
+    async def __call__(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+    def locked(self, key):
+        lock = self._locks.get(key)
+        return lock is not None and lock.locked()
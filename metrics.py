@@ -0,0 +1,192 @@
+# Метрики бота в текстовом формате Prometheus: счётчики, гистограммы и
+# показатели, которые считаются в момент запроса. Отдаются встроенным
+# HTTP-сервером на asyncio (GET /metrics), без сторонних библиотек.
+import asyncio
+import bisect
+import logging
+import time
+from functools import wraps
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин по умолчанию (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry = []
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+        registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name + format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}  # метки -> [счётчики по корзинам и сверх них, сумма, всего]
+        registry.append(self)
+
+    def observe(self, value, *label_values):
+        counts = self.values.get(label_values)
+        if counts is None:
+            counts = self.values[label_values] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self):
+        for label_values, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket" + format_labels(self.labels, label_values, ("le", format_value(float(bound)))), cumulative
+            yield self.name + "_sum" + format_labels(self.labels, label_values), counts[-2]
+            yield self.name + "_count" + format_labels(self.labels, label_values), counts[-1]
+
+
+class Gauge:
+    # collect() -> {кортеж меток: значение}, вызывается при каждом запросе
+    kind = "gauge"
+
+    def __init__(self, name, help_text, collect, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.collect = collect
+        registry.append(self)
+
+    def samples(self):
+        for label_values, value in self.collect().items():
+            yield self.name + format_labels(self.labels, label_values), value
+
+
+updates_total = Counter("buckshot_updates_total", "Updates handled, by handler", ("handler",))
+handler_errors_total = Counter("buckshot_handler_errors_total", "Handler calls that raised, by handler", ("handler",))
+handler_seconds = Histogram("buckshot_handler_seconds", "Handler latency, by handler", ("handler",))
+api_requests_total = Counter("buckshot_api_requests_total", "Bot API requests, by method", ("method",))
+api_errors_total = Counter("buckshot_api_errors_total", "Failed Bot API requests, by method", ("method",))
+api_seconds = Histogram("buckshot_api_seconds", "Bot API request latency, by method", ("method",))
+
+
+def track(handler):
+    # Декоратор для обработчиков апдейтов: число вызовов, ошибки и время
+    name = handler.__name__
+
+    @wraps(handler)
+    async def wrapper(*args, **kwargs):
+        updates_total.inc(name)
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            handler_errors_total.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+def metered_request(**kwargs):
+    # HTTPXRequest, который замеряет каждый вызов Bot API
+    from telegram.request import HTTPXRequest
+
+    class MeteredRequest(HTTPXRequest):
+        async def do_request(self, url, method, *args, **kwargs):
+            api_method = url.rsplit("/", 1)[-1]
+            api_requests_total.inc(api_method)
+            started = time.perf_counter()
+            try:
+                with profiling.telegram_wait():
+                    code, payload = await super().do_request(url, method, *args, **kwargs)
+            except Exception:
+                api_errors_total.inc(api_method)
+                raise
+            finally:
+                api_seconds.observe(time.perf_counter() - started, api_method)
+            if code >= 400:
+                api_errors_total.inc(api_method)
+            return code, payload
+
+    return MeteredRequest(**kwargs)
+
+
+def render():
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {format_value(value)}")
+        except Exception as e:
+            logger.error(f"Failed to collect metric {metric.name}: {e}", exc_info=True)
+    return "\n".join(lines) + "\n"
+
+
+async def handle_request(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode(errors="replace").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_request, host, port)
+    logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,181 @@
+from dataclasses import dataclass, field
+
+# Предметы и их эмодзи
+ITEMS = {
+    "magnifier": {"emoji": "🔍", "name": "Лупа"},
+    "knife": {"emoji": "🔪", "name": "Нож"},
+    "cigarettes": {"emoji": "🚬", "name": "Сигареты"},
+    "beer": {"emoji": "🍺", "name": "Пиво"},
+    "handcuffs": {"emoji": "⛓", "name": "Наручники"},
+    "adrenaline": {"emoji": "⚡️💉", "name": "Адреналин"},
+    "phone": {"emoji": "📱", "name": "Телефон"},
+    "reverse": {"emoji": "🖲", "name": "Реверс"}
+}
+ITEM_IDS = list(ITEMS)
+ITEM_INDEX = {item: i for i, item in enumerate(ITEM_IDS)}
+# Подписи кнопок предметов
+ITEM_LABELS = {item: f"{info['emoji']} {info['name']}" for item, info in ITEMS.items()}
+
+# Обратный индекс: подпись кнопки -> (вид действия, предмет или место)
+BASE_ACTIONS = {label: ("item", item) for item, label in ITEM_LABELS.items()}
+BASE_ACTIONS["В Себя"] = ("self", None)
+SINGLE_ACTIONS = dict(BASE_ACTIONS, **{"В Дилера": ("dealer", None)})
+
+
+def action_index(mode, players):
+    # В одиночной игре индекс общий для всех игр, в мультиплеере к нему
+    # добавляются имена игроков за столом
+    if mode == "single":
+        return SINGLE_ACTIONS
+    # Имена могут повторяться: по имени храним все места с ним
+    seats = {}
+    for seat, player in enumerate(players):
+        seats.setdefault(player.name, []).append(seat)
+    index = dict(BASE_ACTIONS)
+    for name, named in seats.items():
+        index.setdefault(name, ("target", tuple(named)))
+    return index
+
+# Места за столом в одиночной игре
+PLAYER = 0
+DEALER = 1
+
+MAX_LIVES = 5
+
+
+def empty_items():
+    # Счётчик предметов: i-й байт — сколько у игрока предметов ITEM_IDS[i]
+    return bytearray(len(ITEM_IDS))
+
+
+@dataclass(slots=True)
+class Magazine:
+    # Патроны в виде битовой маски: бит 0 — следующий патрон, 1 — боевой.
+    # Счётчик боевых ведёт сам магазин, холостые — всё остальное.
+    bits: int = 0
+    size: int = 0
+    live: int = 0
+
+    @classmethod
+    def from_list(cls, cartridges):
+        bits = 0
+        for i, is_live in enumerate(cartridges):
+            if is_live:
+                bits |= 1 << i
+        return cls(bits, len(cartridges), sum(1 for is_live in cartridges if is_live))
+
+    @property
+    def blank(self):
+        return self.size - self.live
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def peek(self):
+        if not self.size:
+            return None
+        return bool(self.bits & 1)
+
+    def peek_at(self, index):
+        # index считается от следующего патрона (0 — тот же, что peek)
+        if not 0 <= index < self.size:
+            raise IndexError("magazine index out of range")
+        return bool(self.bits >> index & 1)
+
+    def draw(self):
+        if not self.size:
+            raise IndexError("draw from empty magazine")
+        shot = self.bits & 1
+        self.bits >>= 1
+        self.size -= 1
+        self.live -= shot
+        return bool(shot)
+
+    def eject(self):
+        # Пиво: патрон выбрасывается без выстрела
+        return self.draw()
+
+    def invert_next(self):
+        # Реверс: следующий патрон меняется на противоположный
+        if not self.size:
+            raise IndexError("invert on empty magazine")
+        self.bits ^= 1
+        self.live += 1 if self.bits & 1 else -1
+        return bool(self.bits & 1)
+
+    def to_list(self):
+        return [bool(self.bits >> i & 1) for i in range(self.size)]
+
+
+@dataclass(slots=True)
+class PlayerState:
+    id: int
+    mention: str
+    name: str = ""  # имя без Markdown, для кнопок
+    lives: int = MAX_LIVES
+    items: bytearray = field(default_factory=empty_items)
+    handcuffed: bool = False
+
+    def has_item(self, item):
+        return self.items[ITEM_INDEX[item]] > 0
+
+    def take_item(self, item):
+        i = ITEM_INDEX[item]
+        if not self.items[i]:
+            return False
+        self.items[i] -= 1
+        return True
+
+    def give_item(self, item):
+        i = ITEM_INDEX[item]
+        if self.items[i] < 255:
+            self.items[i] += 1
+
+    def item_list(self):
+        return [item for item, count in zip(ITEM_IDS, self.items) for _ in range(count)]
+
+    def item_count(self):
+        return sum(self.items)
+
+
+@dataclass(slots=True)
+class GameState:
+    game_id: object
+    mode: str
+    players: list
+    magazine: Magazine = field(default_factory=Magazine)
+    current_turn: int = 0
+    extra_turn: bool = False
+    damage: int = 1  # урон следующего боевого (нож — 2)
+    round_number: int = 1
+    game_active: bool = True
+    actions: dict = None
+    seed: int = None  # seed генератора игры, для повтора
+    rng: object = None  # random.Random этой игры
+    log: bytearray = field(default_factory=bytearray)  # журнал действий, см. engine.py
+
+    def parse_action(self, text, seat=None):
+        # (вид, значение) для подписи кнопки или None, если такой кнопки нет.
+        # Из одноимённых целей берём живого игрока, который не жмёт сам (seat)
+        if self.actions is None:
+            self.actions = action_index(self.mode, self.players)
+        action = self.actions.get(text)
+        if action is None or action[0] != "target":
+            return action
+        named = action[1]
+        for target in named:
+            if target != seat and self.players[target].lives > 0:
+                return ("target", target)
+        return ("target", named[0])
+
+    def seat_of(self, chat_id):
+        for seat, player in enumerate(self.players):
+            if player.id == chat_id:
+                return seat
+        return None
+
+    def alive_seats(self):
+        return [seat for seat, player in enumerate(self.players) if player.lives > 0]
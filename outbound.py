@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from profiling import telegram_wait
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+# (короткие всплески допускаются)
+GLOBAL_RATE = 30
+GLOBAL_BURST = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+
+# Приоритеты: меньше — важнее
+PRIORITY_TURN = 0    # сообщения с клавиатурой ("Ваш ход!", статус)
+PRIORITY_NORMAL = 1  # обычный текст, при перегрузке выбрасывается первым
+
+MAX_PENDING = 5000
+MAX_ATTEMPTS = 3  # всего попыток отправки, включая первую
+MAX_CONCURRENT_SENDS = 16
+
+
+class MessageDropped(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        # Сколько секунд ждать до следующего токена
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class OutboundItem:
+    __slots__ = ("chat_id", "text", "kwargs", "priority", "future", "attempts")
+
+    def __init__(self, chat_id, text, kwargs, priority, future):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.attempts = 0
+
+
+def retry_after_seconds(error):
+    # telegram.error.RetryAfter: retry_after — int или timedelta в зависимости от версии
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        return None
+    if hasattr(value, "total_seconds"):
+        return value.total_seconds()
+    return float(value)
+
+
+class OutboundQueue:
+    # Общая очередь исходящих сообщений с лимитами на бота и на чат.
+    # send_message() повторяет сигнатуру Bot.send_message, поэтому очередь
+    # можно передавать туда же, куда и бота (например, в broadcast()).
+    def __init__(self, bot, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 chat_rate=CHAT_RATE, chat_burst=CHAT_BURST, max_pending=MAX_PENDING,
+                 max_attempts=MAX_ATTEMPTS, max_concurrent=MAX_CONCURRENT_SENDS):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.max_concurrent = max_concurrent
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_buckets = {}
+        self.counters = {"queued": 0, "sent": 0, "dropped": 0, "retried": 0, "failed": 0}
+        self._seq = itertools.count()
+        self._ready = []    # (priority, seq, item)
+        self._waiting = []  # (ready_at, seq, item) — ждут лимита чата или RetryAfter
+        self._wakeup = None
+        self._dispatcher = None
+        self._slots = None
+        self._inflight = set()
+
+    def pending(self):
+        return len(self._ready) + len(self._waiting)
+
+    def stats(self):
+        return dict(self.counters, pending=self.pending(), inflight=len(self._inflight))
+
+    async def send_message(self, chat_id, text, priority=None, **kwargs):
+        if priority is None:
+            priority = PRIORITY_TURN if kwargs.get("reply_markup") is not None else PRIORITY_NORMAL
+        future = asyncio.get_running_loop().create_future()
+        item = OutboundItem(chat_id, text, kwargs, priority, future)
+        if self.pending() >= self.max_pending and not self._make_room(item):
+            self.counters["dropped"] += 1
+            raise MessageDropped(f"Outbound queue is full, message to {chat_id} dropped")
+        self.counters["queued"] += 1
+        heapq.heappush(self._ready, (priority, next(self._seq), item))
+        self._ensure_started()
+        self._wakeup.set()
+        with telegram_wait():
+            return await future
+
+    def _make_room(self, item):
+        # Выбрасываем самое новое сообщение с наименьшим приоритетом, если
+        # новое важнее его; сообщения с клавиатурой не выбрасываются никогда
+        candidates = [entry for entry in self._ready if entry[0] > item.priority and entry[0] != PRIORITY_TURN]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        self._ready.remove(victim)
+        heapq.heapify(self._ready)
+        self.counters["dropped"] += 1
+        if not victim[2].future.done():
+            victim[2].future.set_exception(MessageDropped(f"Message to {victim[2].chat_id} dropped"))
+        return True
+
+    def _ensure_started(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                now = time.monotonic()
+                self.chat_buckets = {k: b for k, b in self.chat_buckets.items() if not b.idle(now)}
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _dispatch(self):
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, seq, item = heapq.heappop(self._waiting)
+                heapq.heappush(self._ready, (item.priority, seq, item))
+            if not self._ready:
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            priority, seq, item = heapq.heappop(self._ready)
+            if item.future.done():
+                # Отправитель уже не ждёт (например, игру отменили)
+                continue
+            chat_wait = self._chat_bucket(item.chat_id).delay(now)
+            if chat_wait > 0:
+                heapq.heappush(self._waiting, (now + chat_wait, seq, item))
+                continue
+            global_wait = self.global_bucket.delay(now)
+            if global_wait > 0:
+                heapq.heappush(self._ready, (priority, seq, item))
+                await asyncio.sleep(global_wait)
+                continue
+
+            await self._slots.acquire()
+            now = time.monotonic()
+            self.global_bucket.consume(now)
+            self._chat_bucket(item.chat_id).consume(now)
+            task = asyncio.get_running_loop().create_task(self._send(item, seq))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, item, seq):
+        try:
+            item.attempts += 1
+            result = await self.bot.send_message(item.chat_id, item.text, **item.kwargs)
+        except Exception as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is not None and item.attempts < self.max_attempts:
+                self.counters["retried"] += 1
+                now = time.monotonic()
+                self._chat_bucket(item.chat_id).block(now, retry_after)
+                logger.warning(f"Flood limit for chat {item.chat_id}, retrying in {retry_after:.1f}s")
+                heapq.heappush(self._waiting, (now + retry_after, seq, item))
+                self._wakeup.set()
+            else:
+                self.counters["failed"] += 1
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            self.counters["sent"] += 1
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        for entry in self._ready + self._waiting:
+            if not entry[2].future.done():
+                entry[2].future.set_exception(MessageDropped("Outbound queue closed"))
+                self.counters["dropped"] += 1
+        self._ready.clear()
+        self._waiting.clear()
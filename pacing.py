@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Паузы для "драматичных" сообщений (секунды)
+SHORT_PAUSE = 0.3
+LONG_PAUSE = 0.8
+
+
+class TurnPacer:
+    # Очередь сообщений для каждой игры. Сообщения одной игры уходят строго по
+    # порядку, паузы между ними выдерживаются таймерами asyncio, поэтому
+    # обработчик апдейта возвращается сразу и не тормозит остальные столы.
+    def __init__(self):
+        self._queues = {}
+        self._workers = {}
+
+    def schedule(self, game_key, send=None, delay=0.0):
+        # send — корутинная функция без аргументов; None означает просто паузу
+        queue = self._queues.get(game_key)
+        if queue is None:
+            queue = self._queues[game_key] = deque()
+        queue.append((delay, send))
+        if game_key not in self._workers:
+            self._workers[game_key] = asyncio.get_running_loop().create_task(self._drain(game_key, queue))
+
+    def pause(self, game_key, delay):
+        self.schedule(game_key, None, delay)
+
+    def pending(self, game_key):
+        queue = self._queues.get(game_key)
+        return len(queue) if queue else 0
+
+    def active_games(self):
+        return len(self._workers)
+
+    def cancel(self, game_key):
+        queue = self._queues.pop(game_key, None)
+        if queue:
+            queue.clear()
+        worker = self._workers.pop(game_key, None)
+        if worker:
+            worker.cancel()
+
+    async def join(self, game_key):
+        # Дождаться, пока очередь игры будет полностью отправлена
+        while game_key in self._workers:
+            try:
+                await asyncio.shield(self._workers[game_key])
+            except asyncio.CancelledError:
+                if game_key in self._workers:
+                    raise
+
+    async def join_all(self):
+        # Дождаться очередей всех игр (при остановке бота)
+        while self._workers:
+            await self.join(next(iter(self._workers)))
+
+    async def _drain(self, game_key, queue):
+        try:
+            while queue:
+                delay, send = queue.popleft()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if send is None:
+                    continue
+                try:
+                    await send()
+                except Exception as e:
+                    logger.error(f"Paced message for game {game_key} failed: {e}", exc_info=True)
+        finally:
+            if self._workers.get(game_key) is asyncio.current_task():
+                del self._workers[game_key]
+                if self._queues.get(game_key) is queue and not queue:
+                    del self._queues[game_key]
+
+
+# Максимальная длина сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TurnBuffer:
+    # Копит сообщения одного хода и склеивает их по чатам: текст без
+    # клавиатуры присоединяется к следующему сообщению в тот же чат, так что
+    # ход обычно превращается в одно сообщение со статусом и клавиатурой.
+    def __init__(self):
+        self._lines = {}    # chat_id -> [text], ещё не закрытые клавиатурой
+        self._kwargs = {}   # chat_id -> kwargs для незакрытого текста
+        self._ready = {}    # chat_id -> [(text, kwargs)]
+
+    def __bool__(self):
+        return bool(self._lines or self._ready)
+
+    def add(self, chat_id, text, kwargs):
+        lines = self._lines.setdefault(chat_id, [])
+        lines.append(text)
+        if kwargs.get("reply_markup") is not None:
+            self._close(chat_id, kwargs)
+        else:
+            self._kwargs[chat_id] = kwargs
+
+    def _close(self, chat_id, kwargs):
+        lines = self._lines.pop(chat_id)
+        self._kwargs.pop(chat_id, None)
+        ready = self._ready.setdefault(chat_id, [])
+        plain = {k: v for k, v in kwargs.items() if k != "reply_markup"}
+        chunk = ""
+        for line in lines:
+            if chunk and len(chunk) + 1 + len(line) > MAX_MESSAGE_LENGTH:
+                ready.append((chunk, plain))
+                chunk = line
+            else:
+                chunk = f"{chunk}\n{line}" if chunk else line
+        ready.append((chunk, kwargs))
+
+    def drain(self):
+        # Возвращает "волны" сообщений: в i-й волне i-е сообщение каждого чата.
+        # Волны отправляются по очереди, внутри волны — параллельно.
+        for chat_id in list(self._lines):
+            self._close(chat_id, self._kwargs.get(chat_id, {}))
+        waves = []
+        for chat_id, messages in self._ready.items():
+            for i, (text, kwargs) in enumerate(messages):
+                if i == len(waves):
+                    waves.append([])
+                waves[i].append((chat_id, text, kwargs))
+        self._ready = {}
+        return waves
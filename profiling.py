@@ -0,0 +1,181 @@
+# Профилирование апдейтов (включается PROFILE_UPDATES в roulet.py): каждый
+# обработчик оборачивается, время апдейта делится на вычисления, ожидание
+# Telegram и остальное ожидание (замки, сон, другие апдейты). Вычисления —
+# шаги корутины самого апдейта (и хода дилера, который он запустил), так что
+# параллельные апдейты в них не попадают. Ожидание Telegram — вызовы, которые
+# апдейт ждал сам: очередь сообщений, рассылка, прямой вызов Bot API.
+# Сообщения, которые паузы (pacing.py) шлют уже после обработчика, сюда не
+# входят — их видно в метриках buckshot_api_*. Медленные апдейты логируются,
+# а если для них шёл cProfile — его статистика сохраняется в каталог (старые
+# файлы удаляются).
+#
+#   python -m pstats profiles/<файл>.prof
+import asyncio
+import contextvars
+import cProfile
+import logging
+import os
+import time
+import types
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Сводка по обработчикам: вызовы, медленные, суммы времени (секунды)
+profile_stats = {}
+
+_account = contextvars.ContextVar("profile_account", default=None)
+_profiler_busy = False
+
+
+class Account:
+    # Куда ушло время одного апдейта
+    __slots__ = ("task", "compute", "telegram", "telegram_calls", "waiting")
+
+    def __init__(self, task):
+        self.task = task
+        self.compute = 0.0
+        self.telegram = 0.0
+        self.telegram_calls = 0
+        self.waiting = False  # уже внутри замеряемого вызова
+
+
+@contextmanager
+def telegram_wait():
+    # Вокруг вызовов Telegram: outbound.OutboundQueue.send_message,
+    # broadcast.broadcast и metrics.metered_request. Вложенные вызовы
+    # считаются один раз, другие задачи (паузы, отправители очереди, рассылка
+    # по получателям) апдейту не засчитываются
+    account = _account.get()
+    if account is None or account.waiting or account.task is not asyncio.current_task():
+        yield
+        return
+    account.waiting = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        account.waiting = False
+        account.telegram += time.perf_counter() - started
+        account.telegram_calls += 1
+
+
+@types.coroutine
+def _steps(coro, account):
+    # Ведёт корутину по шагам и засчитывает каждый шаг в вычисления апдейта
+    value, error = None, None
+    while True:
+        started = time.perf_counter()
+        try:
+            awaited = coro.send(value) if error is None else coro.throw(error)
+        except StopIteration as e:
+            return e.value
+        finally:
+            account.compute += time.perf_counter() - started
+        try:
+            value, error = (yield awaited), None
+        except BaseException as e:
+            value, error = None, e
+
+
+async def _charged(coro, account):
+    return await _steps(coro, account)
+
+
+def charged(coro):
+    # Корутина, которую апдейт запускает отдельной задачей (ход дилера):
+    # её шаги тоже считаются вычислениями этого апдейта
+    account = _account.get()
+    return coro if account is None else _charged(coro, account)
+
+
+def start_profiler():
+    # cProfile в потоке может быть только один: параллельные апдейты идут без него
+    global _profiler_busy
+    if _profiler_busy:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None  # уже работает другой профилировщик
+    _profiler_busy = True
+    return profiler
+
+
+def stop_profiler(profiler):
+    global _profiler_busy
+    profiler.disable()
+    _profiler_busy = False
+
+
+def dump_profile(profiler, directory, keep, name, wall):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}-{wall * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+    files = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".prof")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in files[:max(0, len(files) - keep)]:
+        os.remove(entry.path)
+    return path
+
+
+def record(name, wall, account, slow):
+    stats = profile_stats.get(name)
+    if stats is None:
+        stats = profile_stats[name] = {
+            "updates": 0, "slow": 0, "wall": 0.0, "compute": 0.0, "telegram": 0.0, "telegram_calls": 0
+        }
+    stats["updates"] += 1
+    stats["slow"] += slow
+    stats["wall"] += wall
+    stats["compute"] += account.compute
+    stats["telegram"] += account.telegram
+    stats["telegram_calls"] += account.telegram_calls
+
+
+def profiled(handler, slow_ms, directory, keep):
+    name = getattr(handler, "__name__", "handler")
+
+    @wraps(handler)
+    async def wrapper(*args, **kwargs):
+        account = Account(asyncio.current_task())
+        token = _account.set(account)
+        profiler = start_profiler()
+        started = time.perf_counter()
+        try:
+            return await _steps(handler(*args, **kwargs), account)
+        finally:
+            wall = time.perf_counter() - started
+            if profiler:
+                stop_profiler(profiler)
+            _account.reset(token)
+            slow = wall * 1000 >= slow_ms
+            record(name, wall, account, slow)
+            if slow:
+                path = None
+                if profiler:
+                    try:
+                        path = dump_profile(profiler, directory, keep, name, wall)
+                    except OSError as e:
+                        logger.error(f"Failed to save profile: {e}")
+                other = max(0.0, wall - account.compute - account.telegram)
+                logger.warning(
+                    f"Slow update in {name}: {wall * 1000:.0f} ms wall, {account.compute * 1000:.0f} ms compute, "
+                    f"{account.telegram * 1000:.0f} ms in {account.telegram_calls} Telegram calls, "
+                    f"{other * 1000:.0f} ms other waits"
+                    + (f", profile: {path}" if path else "")
+                )
+
+    return wrapper
+
+
+def profile_handlers(application, slow_ms, directory, keep):
+    # Оборачивает все зарегистрированные обработчики приложения
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = profiled(handler.callback, slow_ms, directory, keep)
+    logger.info(f"Update profiling is on: slower than {slow_ms} ms goes to {directory}/")
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+
+from model import ITEM_LABELS, PLAYER, DEALER
+
+# Сколько сегментов игроков держать в кэше
+SEGMENT_CACHE_SIZE = 20000
+
+# (game_id, seat) -> ((mention, lives, items), жизни, предметы)
+_segments = OrderedDict()
+render_stats = {"hits": 0, "misses": 0}
+
+
+def format_items(items):
+    if not items:
+        return "Нет"
+    return ", ".join(ITEM_LABELS[item] for item in items)
+
+
+def lives_label(lives):
+    # Когда жизней мало, игрокам их не показываем
+    return lives if lives > 2 else "???"
+
+
+def player_segments(game_id, seat, player):
+    # Сегменты статуса игрока пересобираются, только если изменились его
+    # жизни или предметы; иначе берутся из кэша
+    key = (game_id, seat)
+    state = (player.mention, player.lives, bytes(player.items))
+    cached = _segments.get(key)
+    if cached is not None and cached[0] == state:
+        _segments.move_to_end(key)
+        render_stats["hits"] += 1
+        return cached[1], cached[2]
+    render_stats["misses"] += 1
+    lives = f"{player.mention} ({lives_label(player.lives)} ⚡️)"
+    items = format_items(player.item_list())
+    _segments[key] = (state, lives, items)
+    _segments.move_to_end(key)
+    if len(_segments) > SEGMENT_CACHE_SIZE:
+        _segments.popitem(last=False)
+    return lives, items
+
+
+def forget_game(game_id, seats):
+    # Игра закончилась — её сегменты больше не понадобятся
+    for seat in range(seats):
+        _segments.pop((game_id, seat), None)
+
+
+def render_status(game_state, header=False):
+    # Блок "Жизни / Патроны / Предметы / Ход"; header добавляет номер раунда
+    # и патроны (в начале раунда)
+    segments = [player_segments(game_state.game_id, seat, p) for seat, p in enumerate(game_state.players)]
+    lines = []
+    if header:
+        lines.append(f"=== Раунд {game_state.round_number} ===")
+    if game_state.mode == "single":
+        player = game_state.players[PLAYER]
+        lines.append(f"Жизни: {segments[PLAYER][0]} | {segments[DEALER][0]}")
+        if header:
+            lines.append(f"Патроны: Боевых: {game_state.magazine.live}, Холостых: {game_state.magazine.blank}")
+        lines.append(f"Предметы {player.mention}: {segments[PLAYER][1]}")
+        lines.append(f"Предметы дилера: {segments[DEALER][1]}")
+        lines.append(f"Ход: {player.mention}")
+    else:
+        lines.append("Жизни: " + " | ".join(lives for lives, _ in segments))
+        if header:
+            lines.append(f"Патроны: Боевых: {game_state.magazine.live}, Холостых: {game_state.magazine.blank}")
+        lines.append("Предметы: " + ", ".join(
+            f"{p.mention}: {items}" for p, (_, items) in zip(game_state.players, segments)
+        ))
+        lines.append(f"Ход: {game_state.players[game_state.current_turn].mention}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def lives_lost(damage):
+    return f"{damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!"
+
+
+def single_event_text(game_state, event):
+    # Текст события одиночной игры (см. engine.py); None — событие без сообщения
+    player = game_state.players[PLAYER]
+    kind = event[0]
+    if kind == "handcuffed":
+        if event[1] == PLAYER:
+            return f"{player.mention} в наручниках и пропускает ход!"
+        return "Дилер в наручниках и пропускает ход!"
+    if kind == "item":
+        _, seat, item, result = event
+        who = player.mention if seat == PLAYER else "Дилер"
+        used = f"{who} использует {ITEM_LABELS[item]}"
+        if item == "magnifier":
+            return f"{used}: Следующий патрон — {'боевой' if result else 'холостой'}."
+        if item == "knife":
+            return f"{used}: Следующий боевой патрон нанесёт 2 урона."
+        if item == "cigarettes":
+            return f"{used}: +1 жизнь ⚡️!" if result else f"{used}, но жизни максимум!"
+        if item == "beer":
+            if result is None:
+                return f"{used}, но патронов нет!"
+            return f"{used}: Выброшен {'боевой' if result else 'холостой'} патрон!"
+        if item == "handcuffs":
+            return f"{used}: {'Дилер' if result == DEALER else 'Игрок'} пропустит следующий ход!"
+        if item == "adrenaline":
+            victim = "дилера" if seat == PLAYER else player.mention
+            if result is None:
+                return f"{used}, но у {victim} нет предметов!"
+            return f"{used}: Украден предмет {ITEM_LABELS[result]} у {victim}!"
+        if item == "phone":
+            if result is None:
+                return f"{used}: Не повезло, патронов недостаточно!"
+            return f"{used}: Патрон..."
+        if item == "reverse":
+            if result is None:
+                return f"{used}, но патронов нет!"
+            return f"{used}: Следующий патрон изменён на противоположный!"
+    if kind == "choice":
+        return f"Дилер выбирает: {'стрелять в игрока' if event[2] == PLAYER else 'стрелять в себя'}"
+    if kind == "shot":
+        _, seat, target, live, _ = event
+        shot_type = "Боевой" if live else "Холостой"
+        if seat == PLAYER:
+            return f"{player.mention} стреляет в {'дилера' if target == DEALER else 'себя'}... {shot_type} патрон!"
+        return f"Дилер стреляет в {player.mention if target == PLAYER else 'себя'}... {shot_type} патрон!"
+    if kind == "extra_turn":
+        return f"{player.mention if event[1] == PLAYER else 'Дилер'} получает дополнительный ход!"
+    return None
+
+
+def single_damage_text(game_state, event):
+    # Вторая строка выстрела: кто сколько потерял
+    _, _, target, live, damage = event
+    if not live:
+        return None
+    who = game_state.players[PLAYER].mention if target == PLAYER else "Дилер"
+    return f"{who} теряет {lives_lost(damage)}"
@@ -0,0 +1,130 @@
+# Повтор одиночных игр по журналу. Если в roulet.py задан GAME_LOG_PATH, бот
+# дописывает туда каждую законченную игру одной строкой:
+#   seed шанс_боевого победитель раундов журнал_в_hex
+# По seed игра получает тот же генератор, а журнал (engine.py) — те же
+# нажатия и решения дилера, так что игра проходит заново один в один.
+#
+#   python replay.py games.log              — проверить все игры, замерить скорость
+#   python replay.py games.log --game 12    — показать ход игры №12
+#   python replay.py corpus.log --generate 5000 — дописать 5000 случайных игр
+import argparse
+import random
+import time
+
+import engine
+from engine import FORCED_PASS, LOG_ACTIONS, new_single_game, player_action, dealer_step, force_pass, read_dealer
+from model import PLAYER, DEALER
+
+
+def game_record(game_state):
+    winner = PLAYER if game_state.players[PLAYER].lives > 0 else DEALER
+    return f"{game_state.seed} {engine.LIVE_CHANCE} {winner} {game_state.round_number} {game_state.log.hex()}"
+
+
+def record_game(path, game_state):
+    # Дописывает строку; игры без своего seed (симулятор) повторить нельзя
+    if game_state.seed is None:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(game_record(game_state) + "\n")
+
+
+def parse_record(line):
+    seed, live_chance, winner, rounds, log = line.split()
+    return int(seed), float(live_chance), int(winner), int(rounds), bytes.fromhex(log)
+
+
+def replay_game(seed, live_chance, log, on_events=None):
+    engine.LIVE_CHANCE = live_chance
+    game_state = new_single_game(0, "Игрок", "Игрок", seed=seed)
+    for code in log:
+        if code == FORCED_PASS:
+            events = force_pass(game_state)
+        elif code & 0x80:
+            events = dealer_step(game_state, decision=read_dealer(code))
+        else:
+            events = player_action(game_state, LOG_ACTIONS[code])
+        if on_events:
+            on_events(code, events)
+    return game_state
+
+
+def check_game(line):
+    # Пусто, если игра повторилась; иначе — что не сошлось
+    seed, live_chance, winner, rounds, log = parse_record(line)
+    game_state = replay_game(seed, live_chance, log)
+    problems = []
+    if game_state.game_active:
+        problems.append("game did not finish")
+    elif (PLAYER if game_state.players[PLAYER].lives > 0 else DEALER) != winner:
+        problems.append("winner differs")
+    if game_state.round_number != rounds:
+        problems.append(f"rounds {game_state.round_number} != {rounds}")
+    if bytes(game_state.log) != log:
+        problems.append("log differs")
+    return problems
+
+
+def show_game(line):
+    seed, live_chance, winner, rounds, log = parse_record(line)
+    print(f"seed {seed}, шанс боевого {live_chance}, победил {'игрок' if winner == PLAYER else 'дилер'}, раундов {rounds}")
+
+    def on_events(code, events):
+        who = "дилер" if code & 0x80 else "игрок"
+        print(f"  {who:<6} {events}")
+
+    replay_game(seed, live_chance, log, on_events)
+
+
+def generate_games(path, count, seed):
+    # Корпус для регрессии: случайный игрок против текущего дилера
+    rng = random.Random(seed)
+    for _ in range(count):
+        game_state = new_single_game(0, "Игрок", "Игрок", seed=rng.getrandbits(32))
+        while game_state.game_active:
+            if game_state.current_turn == PLAYER:
+                items = game_state.players[PLAYER].item_list()
+                player_action(game_state, rng.choice(["dealer", "self"] + items))
+            else:
+                dealer_step(game_state)
+        record_game(path, game_state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повтор одиночных игр из журнала")
+    parser.add_argument("path")
+    parser.add_argument("--game", type=int, help="номер строки (с 1): показать ход игры")
+    parser.add_argument("--generate", type=int, help="сыграть и дописать столько случайных игр")
+    parser.add_argument("--dealer", choices=["basic", "hard", "table"], default=engine.DEALER_AI)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.generate:
+        engine.DEALER_AI = args.dealer
+        generate_games(args.path, args.generate, args.seed)
+        print(f"Дописано игр: {args.generate} -> {args.path}")
+        return
+
+    with open(args.path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    if args.game:
+        show_game(lines[args.game - 1])
+        return
+
+    failed = 0
+    actions = 0
+    started = time.perf_counter()
+    for number, line in enumerate(lines, 1):
+        problems = check_game(line)
+        actions += len(line.split()[-1]) // 2
+        if problems:
+            failed += 1
+            print(f"Игра {number}: {', '.join(problems)}")
+    elapsed = time.perf_counter() - started
+    print(f"Игр: {len(lines)}, не сошлось: {failed}, {len(lines) / elapsed:,.0f} игр и {actions / elapsed:,.0f} действий в секунду")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,151 @@
+import asyncio
 import random
-import time
 import string
 import logging
+import time
+from functools import lru_cache
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
+from pacing import TurnPacer, TurnBuffer, SHORT_PAUSE, LONG_PAUSE
+from broadcast import broadcast, fanout_stats
+from outbound import OutboundQueue, MessageDropped
+from locks import KeyedLocks
+from storage import open_store
+from model import ITEMS, ITEM_LABELS, PLAYER, DEALER, MAX_LIVES, GameState
+from render import render_status, forget_game, single_event_text, single_damage_text
+import engine
+import dealer_table
+from engine import create_cartridges, create_player, get_next_player, new_rng, new_single_game, new_round, player_action, dealer_step, force_pass
+from replay import record_game
+from shard import shard_of, shard_path
+import metrics
+from metrics import track
+from profiling import charged, profile_handlers, profile_stats
+import event_log
+from event_log import log_event, log_engine_events
 
-# Настройка логирования
+# Настройка логирования (build_application переводит вывод в фоновый поток, см. event_log.py)
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Токен бота от @BotFather
+BOT_TOKEN = "TokenTgBota"
+
+# Как получать апдейты: "polling" — опрос getUpdates, "webhook" — Telegram
+# сам присылает их на встроенный HTTP-сервер (нужен публичный HTTPS-адрес)
+RUN_MODE = "polling"
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "telegram"
+WEBHOOK_URL = "https://example.com/telegram"
+WEBHOOK_SECRET = None  # строка из A-Z, a-z, 0-9, _ и -; Telegram присылает её в заголовке
+
+# Хранилище состояния: "memory" — только в памяти, "sqlite" — переживает перезапуск
+STORAGE_BACKEND = "memory"
+STORAGE_PATH = "buckshot.db"
+
+# Через сколько секунд бездействия убирать игру, комнату и лобби
+GAME_IDLE_TTL = 30 * 60
+ROOM_IDLE_TTL = 30 * 60
+LOBBY_IDLE_TTL = 2 * 60 * 60
+SWEEP_INTERVAL = 60
+
+# Сколько действий дилер может сделать за один ход
+DEALER_MAX_STEPS = 20
+
 # Глобальные переменные
-game_states = {}
-multiplayer_games = {}
-lobby_states = {}
-
-# Предметы и их эмодзи
-ITEMS = {
-    "magnifier": {"emoji": "🔍", "name": "Лупа"},
-    "knife": {"emoji": "🔪", "name": "Нож"},
-    "cigarettes": {"emoji": "🚬", "name": "Сигареты"},
-    "beer": {"emoji": "🍺", "name": "Пиво"},
-    "handcuffs": {"emoji": "⛓", "name": "Наручники"},
-    "adrenaline": {"emoji": "⚡️💉", "name": "Адреналин"},
-    "phone": {"emoji": "📱", "name": "Телефон"},
-    "reverse": {"emoji": "🖲", "name": "Реверс"}
-}
+def open_state(path=STORAGE_PATH):
+    # Воркер шарда (shard.py) открывает своё хранилище со своим путём
+    global store, game_states, multiplayer_games, lobby_states
+    store = open_store(STORAGE_BACKEND, path)
+    game_states = store.map("game_states", shared_key=lambda state: state.game_id)
+    multiplayer_games = store.map("multiplayer_games")
+    lobby_states = store.map("lobby_states")
 
-def generate_game_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-
-def create_cartridges():
-    total = random.randint(4, 8)
-    cartridges = []
-    live = 0
-    blank = 0
-    live_chance = 0.66  # Шанс, что патрон будет боевым (66%)
-    
-    for _ in range(total):
-        is_live = random.random() < live_chance
-        cartridges.append(is_live)
-        if is_live:
-            live += 1
-        else:
-            blank += 1
-    
-    # Гарантируем хотя бы один холостой патрон
-    if blank == 0:
-        idx = random.randint(0, total - 1)
-        cartridges[idx] = False
-        live -= 1
-        blank += 1
-    
-    random.shuffle(cartridges)
-    return cartridges, live, blank
+open_state()
+pacer = TurnPacer()
+game_locks = KeyedLocks()
+turn_buffers = {}
+sweep_stats = {"sweeps": 0, "games_evicted": 0, "rooms_evicted": 0, "lobbies_evicted": 0}
+dealer_turns = {}  # game_id -> задача с ходом дилера
+dealer_stats = {"turns": 0, "steps": 0, "max_steps": 0, "guard_hits": 0, "cancelled": 0, "total_ms": 0.0, "max_ms": 0.0}
 
-def create_initial_items():
-    return random.sample(list(ITEMS.keys()), 2)
+def count_games():
+    counts = {("single",): 0, ("multiplayer",): 0}
+    seen = set()
+    for chat_id in game_states:
+        game_state = game_states.peek(chat_id)
+        if game_state is not None and id(game_state) not in seen:
+            seen.add(id(game_state))
+            counts[(game_state.mode,)] += 1
+    return counts
 
-def add_item(current_items):
-    current_items.append(random.choice(list(ITEMS.keys())))
-    return current_items
+active_games = metrics.Gauge("buckshot_active_games", "Games in progress, by mode", count_games, ("mode",))
+open_rooms = metrics.Gauge("buckshot_open_rooms", "Rooms waiting for players", lambda: {(): len(multiplayer_games)})
+room_players = metrics.Histogram("buckshot_room_players", "Players in a room when its game starts", buckets=range(2, 11))
+game_rounds = metrics.Histogram("buckshot_game_rounds", "Rounds played per finished game, by mode", ("mode",), buckets=(1, 2, 3, 4, 5, 7, 10, 15, 20))
+dealer_turn_steps = metrics.Histogram("buckshot_dealer_turn_steps", "Dealer actions per turn", buckets=(1, 2, 3, 4, 5, 7, 10, 20))
+dealer_turn_seconds = metrics.Histogram("buckshot_dealer_turn_seconds", "Dealer turn duration")
 
-def format_items(items):
-    if not items:
-        return "Нет"
-    return ", ".join(f"{ITEMS[item]['emoji']} {ITEMS[item]['name']}" for item in items)
+def fanout_snapshot(keys):
+    snapshot = fanout_stats.snapshot()
+    return {(key,): snapshot[key] for key in keys}
+
+broadcasts = metrics.Gauge(
+    "buckshot_broadcasts", "Broadcasts, messages and failed sends since start, by kind",
+    lambda: fanout_snapshot(("broadcasts", "messages", "failures")), ("kind",)
+)
+broadcast_latency_ms = metrics.Gauge(
+    "buckshot_broadcast_latency_ms", "Broadcast fan-out latency over recent broadcasts, by stat",
+    lambda: fanout_snapshot(("avg_ms", "p50_ms", "p99_ms", "max_ms")), ("stat",)
+)
+
+# "coalesce" — сообщения хода склеиваются в одно; "step" — по одному сообщению с паузами
+MESSAGE_MODE = "coalesce"
+
+# Сколько разных клавиатур держать в кэше
+KEYBOARD_CACHE_SIZE = 1024
+
+# Дилер: "basic" — правила, "hard" — поиск с ограничением по времени,
+# "table" — правила из таблицы (собрать: python dealer_table.py)
+DEALER_MODE = "basic"
+DEALER_TABLE_PATH = dealer_table.TABLE_PATH
+
+# Куда дописывать законченные одиночные игры для replay.py (None — не писать).
+# Файл не ротируется и растёт на строку за игру, поэтому включается вручную,
+# например GAME_LOG_PATH = "games.log", на время отладки
+GAME_LOG_PATH = None
+
+# Журнал игровых событий в JSON lines (event_log.py; None — не писать):
+# файл ротируется по EVENT_LOG_MAX_BYTES, хранится EVENT_LOG_BACKUPS старых
+EVENT_LOG_PATH = "events.log"
+EVENT_LOG_MAX_BYTES = 10 * 1024 * 1024
+EVENT_LOG_BACKUPS = 5
+EVENT_LOG_BATCH = 256
+
+# (номер воркера, всего воркеров), если бот запущен через shard.py
+SHARD = None
+
+# Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics
+# (None — не поднимать; у воркеров shard.py порт METRICS_PORT + номер)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9090
+
+# Профилирование апдейтов (profiling.py): медленнее PROFILE_SLOW_MS — в лог,
+# статистика cProfile — в PROFILE_DIR (хранится PROFILE_KEEP последних)
+PROFILE_UPDATES = False
+PROFILE_SLOW_MS = 250
+PROFILE_DIR = "profiles"
+PROFILE_KEEP = 50
+
+def generate_game_code():
+    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    if SHARD:
+        # Код комнаты указывает на воркер, где она живёт
+        index, count = SHARD
+        while shard_of(code, count) != index:
+            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    return code
 
 def get_user_mention(user, for_button=False):
     chat_id = user.id
@@ -78,120 +159,145 @@ def get_user_mention(user, for_button=False):
         return name  # Для кнопок возвращаем чистое имя без Markdown
     return f"[{name}](tg://user?id={chat_id})"
 
+def outbound(context):
+    # Очередь с учётом лимитов Telegram; без неё (например, в тестах) шлём напрямую
+    return context.bot_data.get("outbox") or context.bot
+
+async def reply(update, context, text, **kwargs):
+    # Ответ в чат апдейта, тоже через очередь с лимитами
+    chat_id = update.effective_chat.id
+    try:
+        return await outbound(context).send_message(chat_id, text, **kwargs)
+    except MessageDropped as e:
+        logger.warning(f"Reply to {chat_id} not sent: {e}")
+
+async def say(context, game_state, chat_id, text, **kwargs):
+    # Игровые сообщения идут через очередь игры, чтобы паузы не блокировали бота
+    if MESSAGE_MODE == "step":
+        pacer.schedule(game_state.game_id, lambda: outbound(context).send_message(chat_id, text, **kwargs))
+    else:
+        turn_buffers.setdefault(game_state.game_id, TurnBuffer()).add(chat_id, text, kwargs)
+
+async def say_each(context, game_state, messages):
+    # messages — список (chat_id, text, kwargs), рассылается параллельно
+    if MESSAGE_MODE == "step":
+        pacer.schedule(game_state.game_id, lambda: broadcast(outbound(context), messages))
+    else:
+        buffer = turn_buffers.setdefault(game_state.game_id, TurnBuffer())
+        for chat_id, text, kwargs in messages:
+            buffer.add(chat_id, text, kwargs)
+
+async def say_all(context, game_state, text, **kwargs):
+    await say_each(context, game_state, [(p.id, text, kwargs) for p in game_state.players])
+
+def pause(game_state, seconds):
+    if MESSAGE_MODE == "step":
+        pacer.pause(game_state.game_id, seconds)
+
+async def flush_turn(context, game_state):
+    # Отправляет накопленные за ход сообщения (в режиме "coalesce")
+    buffer = turn_buffers.pop(game_state.game_id, None)
+    if not buffer:
+        return
+    for wave in buffer.drain():
+        pacer.schedule(game_state.game_id, lambda wave=wave: broadcast(outbound(context), wave))
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def cached_keyboard(rows):
+    # rows — кортеж кортежей подписей. Клавиатуры неизменяемы, поэтому одну и
+    # ту же можно отправлять в разные игры
+    return ReplyKeyboardMarkup([list(row) for row in rows], resize_keyboard=True, one_time_keyboard=False)
+
 def build_lobby_keyboard(mode=None):
     if mode == "multiplayer":
-        return ReplyKeyboardMarkup([["Создать комнату", "Присоединиться"], ["Назад"]], resize_keyboard=True, one_time_keyboard=False)
-    return ReplyKeyboardMarkup([["Начать игру", "Мультиплеер"]], resize_keyboard=True, one_time_keyboard=False)
+        return cached_keyboard((("Создать комнату", "Присоединиться"), ("Назад",)))
+    return cached_keyboard((("Начать игру", "Мультиплеер"),))
 
 def build_game_keyboard(items, is_knife=False, mode="single", game_state=None, current_player=None):
-    actions = []
     if mode == "single":
-        actions.append(["В Дилера", "В Себя"] if not is_knife else ["В Дилера", "В Себя"])
+        rows = (("В Дилера", "В Себя"),)
     else:
         # В мультиплеере показываем живых игроков (кроме текущего) с чистыми именами
-        if not is_knife:
-            alive_players = [pid for pid in game_state["players"] if game_state["players"][pid]["lives"] > 0 and pid != current_player]
-            for pid in alive_players:
-                # Извлекаем чистое имя без Markdown
-                player = game_state["players"][pid]
-                user = type('obj', (object,), {'id': player['id'], 'username': player['mention'].split('[')[1].split(']')[0] if '[' in player['mention'] else None, 'first_name': player['mention'].split('[')[1].split(']')[0] if '[' in player['mention'] else player['mention'], 'last_name': None})
-                actions.append([get_user_mention(user, for_button=True)])
-            actions.append(["В Себя"])
-        else:
-            alive_players = [pid for pid in game_state["players"] if game_state["players"][pid]["lives"] > 0 and pid != current_player]
-            for pid in alive_players:
-                player = game_state["players"][pid]
-                user = type('obj', (object,), {'id': player['id'], 'username': player['mention'].split('[')[1].split(']')[0] if '[' in player['mention'] else None, 'first_name': player['mention'].split('[')[1].split(']')[0] if '[' in player['mention'] else player['mention'], 'last_name': None})
-                actions.append([get_user_mention(user, for_button=True)])
-            actions.append(["В Себя"])
-    for item in items:
-        actions.append([f"{ITEMS[item]['emoji']} {ITEMS[item]['name']}"])
-    return ReplyKeyboardMarkup(actions, resize_keyboard=True, one_time_keyboard=False)
+        rows = tuple(
+            (game_state.players[seat].name,)
+            for seat in game_state.alive_seats() if seat != current_player
+        ) + (("В Себя",),)
+    rows += tuple((ITEM_LABELS[item],) for item in items)
+    return cached_keyboard(rows)
 
 def build_multiplayer_room_keyboard(creator_id, chat_id, player_count):
-    buttons = []
     if chat_id == creator_id and player_count >= 2:
-        buttons.append(["Начать игру"])
-    buttons.append(["Покинуть комнату"])
-    return ReplyKeyboardMarkup(buttons, resize_keyboard=True, one_time_keyboard=False)
+        return cached_keyboard((("Начать игру",), ("Покинуть комнату",)))
+    return cached_keyboard((("Покинуть комнату",),))
 
+@track
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     lobby_states[chat_id] = {"mode": "main", "action": None, "game_code": None}
-    await update.message.reply_text(
+    await reply(
+        update, context,
         "Добро пожаловать в Buckshot Roulette!\nВыберите режим:",
         reply_markup=build_lobby_keyboard(),
         parse_mode="Markdown"
     )
 
+async def route_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Весь текст приходит сюда: игрок либо в лобби, либо в игре
+    if update.effective_chat.id in lobby_states:
+        await handle_lobby_action(update, context)
+    else:
+        await handle_game_action(update, context)
+
+@track
 async def handle_lobby_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     action = update.message.text
     
-    if chat_id not in lobby_states:
-        await update.message.reply_text("Начните с /start.", reply_markup=ReplyKeyboardRemove())
-        return
+    async with game_locks(("chat", chat_id)):
+        if chat_id not in lobby_states:
+            await reply(update, context, "Начните с /start.", reply_markup=ReplyKeyboardRemove())
+            return
     
-    lobby_state = lobby_states[chat_id]
+        lobby_state = lobby_states[chat_id]
     
-    if lobby_state["mode"] == "room":
-        await handle_room_action(update, context)
-        return
+        if lobby_state["mode"] == "room":
+            await handle_room_action(update, context)
+            return
     
-    if action == "Начать игру" and lobby_state["mode"] == "main":
-        await start_singleplayer(update, context, chat_id)
-        del lobby_states[chat_id]
-    elif action == "Мультиплеер" and lobby_state["mode"] == "main":
-        lobby_state["mode"] = "multiplayer"
-        await update.message.reply_text("Выберите действие:", reply_markup=build_lobby_keyboard("multiplayer"))
-    elif action == "Назад" and lobby_state["mode"] == "multiplayer":
-        lobby_state["mode"] = "main"
-        await update.message.reply_text("Выберите режим:", reply_markup=build_lobby_keyboard())
-    elif action == "Создать комнату" and lobby_state["mode"] == "multiplayer":
-        await create_multiplayer_room(update, context, chat_id)
-    elif action == "Присоединиться" and lobby_state["mode"] == "multiplayer":
-        await update.message.reply_text("Введите код комнаты:", reply_markup=ReplyKeyboardRemove())
-        lobby_state["action"] = "join"
-    elif lobby_state["action"] == "join":
-        await join_multiplayer_room(update, context, chat_id, action)
-    else:
-        await update.message.reply_text("Неверное действие! Выберите из меню.")
+        if action == "Начать игру" and lobby_state["mode"] == "main":
+            await start_singleplayer(update, context, chat_id)
+            del lobby_states[chat_id]
+        elif action == "Мультиплеер" and lobby_state["mode"] == "main":
+            lobby_state["mode"] = "multiplayer"
+            await reply(update, context, "Выберите действие:", reply_markup=build_lobby_keyboard("multiplayer"))
+        elif action == "Назад" and lobby_state["mode"] == "multiplayer":
+            lobby_state["mode"] = "main"
+            await reply(update, context, "Выберите режим:", reply_markup=build_lobby_keyboard())
+        elif action == "Создать комнату" and lobby_state["mode"] == "multiplayer":
+            await create_multiplayer_room(update, context, chat_id)
+        elif action == "Присоединиться" and lobby_state["mode"] == "multiplayer":
+            await reply(update, context, "Введите код комнаты:", reply_markup=ReplyKeyboardRemove())
+            lobby_state["action"] = "join"
+        elif lobby_state["action"] == "join":
+            await join_multiplayer_room(update, context, chat_id, action)
+        else:
+            await reply(update, context, "Неверное действие! Выберите из меню.")
 
 async def start_singleplayer(update, context, chat_id):
-    game_state = {
-        "player_lives": 5,
-        "dealer_lives": 5,
-        "player_items": create_initial_items(),
-        "dealer_items": create_initial_items(),
-        "cartridges": [],
-        "live": 0,
-        "blank": 0,
-        "current_turn": "player",
-        "extra_turn": False,
-        "player_handcuffed": False,
-        "dealer_handcuffed": False,
-        "round_number": 1,
-        "game_active": True,
-        "mode": "single",
-        "player_mention": get_user_mention(update.effective_user)
-    }
-    game_state["cartridges"], game_state["live"], game_state["blank"] = create_cartridges()
+    user = update.effective_user
+    game_state = new_single_game(chat_id, get_user_mention(user), get_user_mention(user, for_button=True))
+    player = game_state.players[PLAYER]
     game_states[chat_id] = game_state
+    log_event(game_state, "game_started", players=len(game_state.players), seed=game_state.seed)
     
-    status = (
-        f"=== Раунд {game_state['round_number']} ===\n"
-        f"Жизни: {game_state['player_mention']} ({game_state['player_lives'] if game_state['player_lives'] > 2 else '???'} ⚡️) | "
-        f"Дилер ({game_state['dealer_lives'] if game_state['dealer_lives'] > 2 else '???'} ⚡️)\n"
-        f"Патроны: Боевых: {game_state['live']}, Холостых: {game_state['blank']}\n"
-        f"Предметы {game_state['player_mention']}: {format_items(game_state['player_items'])}\n"
-        f"Предметы дилера: {format_items(game_state['dealer_items'])}\n"
-        f"Ход: {game_state['player_mention']}\n"
-    )
-    await update.message.reply_text(
+    status = render_status(game_state, header=True)
+    await say(
+        context, game_state, chat_id,
         status + "Выберите действие:",
-        reply_markup=build_game_keyboard(game_state["player_items"], mode="single"),
+        reply_markup=build_game_keyboard(player.item_list(), mode="single"),
         parse_mode="Markdown"
     )
+    await flush_turn(context, game_state)
 
 async def create_multiplayer_room(update, context, chat_id):
     game_code = generate_game_code()
@@ -199,14 +305,20 @@ async def create_multiplayer_room(update, context, chat_id):
         game_code = generate_game_code()
     
     multiplayer_games[game_code] = {
-        "players": [{"id": chat_id, "mention": get_user_mention(update.effective_user), "kicked": False}],
+        "players": [{
+            "id": chat_id,
+            "mention": get_user_mention(update.effective_user),
+            "name": get_user_mention(update.effective_user, for_button=True),
+            "kicked": False
+        }],
         "creator_id": chat_id,
         "state": None
     }
     lobby_states[chat_id]["mode"] = "room"
     lobby_states[chat_id]["game_code"] = game_code
     
-    await update.message.reply_text(
+    await reply(
+        update, context,
         f"Комната создана! Код: **{game_code}**\n"
         f"Игроки: 1/10\n"
         f"Поделитесь кодом с друзьями. Нажмите 'Начать игру' для старта (нужно ≥2 игрока).",
@@ -216,114 +328,129 @@ async def create_multiplayer_room(update, context, chat_id):
 
 async def join_multiplayer_room(update, context, chat_id, code):
     code = code.upper()
-    if code not in multiplayer_games:
-        await update.message.reply_text(
-            "Неверный код комнаты! Попробуйте снова.",
-            reply_markup=build_lobby_keyboard("multiplayer")
-        )
-        lobby_states[chat_id]["action"] = None
-        return
+    async with game_locks(("room", code)):
+        if code not in multiplayer_games:
+            await reply(
+                update, context,
+                "Неверный код комнаты! Попробуйте снова.",
+                reply_markup=build_lobby_keyboard("multiplayer")
+            )
+            lobby_states[chat_id]["action"] = None
+            return
     
-    room = multiplayer_games[code]
-    if len([p for p in room["players"] if not p["kicked"]]) >= 10:
-        await update.message.reply_text(
-            "Комната заполнена!",
-            reply_markup=build_lobby_keyboard("multiplayer")
-        )
-        lobby_states[chat_id]["action"] = None
-        return
+        room = multiplayer_games[code]
+        if len([p for p in room["players"] if not p["kicked"]]) >= 10:
+            await reply(
+                update, context,
+                "Комната заполнена!",
+                reply_markup=build_lobby_keyboard("multiplayer")
+            )
+            lobby_states[chat_id]["action"] = None
+            return
     
-    if any(p["id"] == chat_id for p in room["players"]):
-        await update.message.reply_text(
-            "Вы уже в этой комнате!",
-            reply_markup=build_lobby_keyboard("multiplayer")
-        )
-        lobby_states[chat_id]["action"] = None
-        return
+        if any(p["id"] == chat_id for p in room["players"]):
+            await reply(
+                update, context,
+                "Вы уже в этой комнате!",
+                reply_markup=build_lobby_keyboard("multiplayer")
+            )
+            lobby_states[chat_id]["action"] = None
+            return
     
-    mention = get_user_mention(update.effective_user)
-    room["players"].append({"id": chat_id, "mention": mention, "kicked": False})
-    player_count = len([p for p in room["players"] if not p["kicked"]])
+        mention = get_user_mention(update.effective_user)
+        room["players"].append({
+            "id": chat_id,
+            "mention": mention,
+            "name": get_user_mention(update.effective_user, for_button=True),
+            "kicked": False
+        })
+        player_count = len([p for p in room["players"] if not p["kicked"]])
     
-    kick_keyboard = InlineKeyboardMarkup([[
-        InlineKeyboardButton(f"Кикнуть {mention}", callback_data=f"kick_{chat_id}_{code}")
-    ]])
-    await context.bot.send_message(
-        room["creator_id"],
-        f"{mention} присоединился к комнате {code}!",
-        reply_markup=kick_keyboard,
-        parse_mode="Markdown"
-    )
+        kick_keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton(f"Кикнуть {mention}", callback_data=f"kick_{chat_id}_{code}")
+        ]])
+        await outbound(context).send_message(
+            room["creator_id"],
+            f"{mention} присоединился к комнате {code}!",
+            reply_markup=kick_keyboard,
+            parse_mode="Markdown"
+        )
     
-    for player in room["players"]:
-        if not player["kicked"]:
-            await context.bot.send_message(
-                player["id"],
-                f"Комната {code}\nИгроки: {player_count}/10",
+        await broadcast(outbound(context), [
+            (player["id"], f"Комната {code}\nИгроки: {player_count}/10", dict(
                 reply_markup=build_multiplayer_room_keyboard(room["creator_id"], player["id"], player_count),
                 parse_mode="Markdown"
-            )
+            ))
+            for player in room["players"] if not player["kicked"]
+        ])
     
-    lobby_states[chat_id]["mode"] = "room"
-    lobby_states[chat_id]["game_code"] = code
-    lobby_states[chat_id]["action"] = None
+        lobby_states[chat_id]["mode"] = "room"
+        lobby_states[chat_id]["game_code"] = code
+        lobby_states[chat_id]["action"] = None
 
 async def handle_room_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     action = update.message.text
     
     if chat_id not in lobby_states or lobby_states[chat_id]["mode"] != "room":
-        await update.message.reply_text("Вы не в комнате! Используйте /start.", reply_markup=ReplyKeyboardRemove())
+        await reply(update, context, "Вы не в комнате! Используйте /start.", reply_markup=ReplyKeyboardRemove())
         return
     
     game_code = lobby_states[chat_id]["game_code"]
-    if game_code not in multiplayer_games:
-        await update.message.reply_text(
-            "Комната не найдена! Создайте новую.",
-            reply_markup=build_lobby_keyboard("multiplayer")
-        )
-        del lobby_states[chat_id]
-        return
-    
-    room = multiplayer_games[game_code]
-    
-    if action == "Начать игру":
-        if chat_id != room["creator_id"]:
-            await update.message.reply_text("Только создатель может начать игру!")
+    async with game_locks(("room", game_code)):
+        # Пока ждали комнату, игрока могли исключить или закрыть комнату
+        lobby_state = lobby_states.peek(chat_id)
+        if lobby_state is None or lobby_state["mode"] != "room" or lobby_state["game_code"] != game_code:
             return
-        active_players = [p for p in room["players"] if not p["kicked"]]
-        if len(active_players) < 2:
-            await update.message.reply_text("Нужно минимум 2 игрока для старта!")
+        if game_code not in multiplayer_games:
+            await reply(
+                update, context,
+                "Комната не найдена! Создайте новую.",
+                reply_markup=build_lobby_keyboard("multiplayer")
+            )
+            del lobby_states[chat_id]
             return
-        await start_multiplayer_game(update, context, game_code, active_players)
-        for player in active_players:
-            del lobby_states[player["id"]]
-    elif action == "Покинуть комнату":
-        for player in room["players"]:
-            if player["id"] == chat_id:
-                player["kicked"] = True
-                break
-        player_count = len([p for p in room["players"] if not p["kicked"]])
-        if player_count == 0:
-            del multiplayer_games[game_code]
-        else:
+    
+        room = multiplayer_games[game_code]
+    
+        if action == "Начать игру":
+            if chat_id != room["creator_id"]:
+                await reply(update, context, "Только создатель может начать игру!")
+                return
+            active_players = [p for p in room["players"] if not p["kicked"]]
+            if len(active_players) < 2:
+                await reply(update, context, "Нужно минимум 2 игрока для старта!")
+                return
+            await start_multiplayer_game(update, context, game_code, active_players)
+            for player in active_players:
+                del lobby_states[player["id"]]
+        elif action == "Покинуть комнату":
             for player in room["players"]:
-                if not player["kicked"]:
-                    await context.bot.send_message(
-                        player["id"],
-                        f"Игрок покинул комнату {game_code}\nИгроки: {player_count}/10",
+                if player["id"] == chat_id:
+                    player["kicked"] = True
+                    break
+            player_count = len([p for p in room["players"] if not p["kicked"]])
+            if player_count == 0:
+                del multiplayer_games[game_code]
+            else:
+                await broadcast(outbound(context), [
+                    (player["id"], f"Игрок покинул комнату {game_code}\nИгроки: {player_count}/10", dict(
                         reply_markup=build_multiplayer_room_keyboard(room["creator_id"], player["id"], player_count),
                         parse_mode="Markdown"
-                    )
-        del lobby_states[chat_id]
-        await update.message.reply_text(
-            "Вы покинули комнату.",
-            reply_markup=build_lobby_keyboard(),
-            parse_mode="Markdown"
-        )
-    else:
-        await update.message.reply_text("Неверное действие! Выберите из меню.")
+                    ))
+                    for player in room["players"] if not player["kicked"]
+                ])
+            lobby_states.pop(chat_id, None)
+            await reply(
+                update, context,
+                "Вы покинули комнату.",
+                reply_markup=build_lobby_keyboard(),
+                parse_mode="Markdown"
+            )
+        else:
+            await reply(update, context, "Неверное действие! Выберите из меню.")
 
+@track
 async def kick_player(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -335,1084 +462,774 @@ async def kick_player(update: Update, context: ContextTypes.DEFAULT_TYPE):
     player_id = int(data[1])
     game_code = data[2]
     
-    if game_code not in multiplayer_games:
-        await query.message.reply_text("Комната не найдена!")
-        return
-    
-    room = multiplayer_games[game_code]
-    if query.from_user.id != room["creator_id"]:
-        await query.message.reply_text("Только создатель может кикать игроков!")
-        return
+    # Лобби исключённого меняем под его замком чата — в том же порядке
+    # (чат, затем комната), что и handle_lobby_action
+    async with game_locks(("chat", player_id)), game_locks(("room", game_code)):
+        if game_code not in multiplayer_games:
+            await reply(update, context, "Комната не найдена!")
+            return
     
-    for player in room["players"]:
-        if player["id"] == player_id:
-            player["kicked"] = True
-            break
+        room = multiplayer_games[game_code]
+        if query.from_user.id != room["creator_id"]:
+            await reply(update, context, "Только создатель может кикать игроков!")
+            return
     
-    player_count = len([p for p in room["players"] if not p["kicked"]])
-    if player_count == 0:
-        del multiplayer_games[game_code]
         for player in room["players"]:
-            if player["id"] in lobby_states:
-                del lobby_states[player["id"]]
-                await context.bot.send_message(
-                    player["id"],
-                    "Комната закрыта.",
-                    reply_markup=build_lobby_keyboard(),
-                    parse_mode="Markdown"
-                )
-        return
+            if player["id"] == player_id:
+                player["kicked"] = True
+                break
     
-    for player in room["players"]:
-        if not player["kicked"]:
-            await context.bot.send_message(
-                player["id"],
-                f"Игрок был исключён из комнаты {game_code}\nИгроки: {player_count}/10",
+        player_count = len([p for p in room["players"] if not p["kicked"]])
+        if player_count == 0:
+            del multiplayer_games[game_code]
+            for player in room["players"]:
+                lobby_state = lobby_states.peek(player["id"])
+                if lobby_state is not None and lobby_state["game_code"] == game_code:
+                    lobby_states.pop(player["id"], None)
+                    await outbound(context).send_message(
+                        player["id"],
+                        "Комната закрыта.",
+                        reply_markup=build_lobby_keyboard(),
+                        parse_mode="Markdown"
+                    )
+            return
+    
+        await broadcast(outbound(context), [
+            (player["id"], f"Игрок был исключён из комнаты {game_code}\nИгроки: {player_count}/10", dict(
                 reply_markup=build_multiplayer_room_keyboard(room["creator_id"], player["id"], player_count),
                 parse_mode="Markdown"
+            ))
+            for player in room["players"] if not player["kicked"]
+        ])
+    
+        lobby_state = lobby_states.peek(player_id)
+        if lobby_state is not None and lobby_state["game_code"] == game_code:
+            lobby_states.pop(player_id, None)
+            await outbound(context).send_message(
+                player_id,
+                "Вы были исключены из комнаты.",
+                reply_markup=build_lobby_keyboard(),
+                parse_mode="Markdown"
             )
-    
-    if player_id in lobby_states:
-        del lobby_states[player_id]
-        await context.bot.send_message(
-            player_id,
-            "Вы были исключены из комнаты.",
-            reply_markup=build_lobby_keyboard(),
-            parse_mode="Markdown"
-        )
 
 async def start_multiplayer_game(update, context, game_code, players):
-    game_state = {
-        "players": {
-            f"player{i+1}": {
-                "id": p["id"],
-                "mention": p["mention"],
-                "lives": 5,
-                "items": create_initial_items(),
-                "handcuffed": False
-            } for i, p in enumerate(players)
-        },
-        "cartridges": [],
-        "live": 0,
-        "blank": 0,
-        "current_turn": "player1",
-        "extra_turn": False,
-        "round_number": 1,
-        "game_active": True,
-        "mode": "multiplayer"
-    }
-    game_state["cartridges"], game_state["live"], game_state["blank"] = create_cartridges()
+    seed, rng = new_rng()
+    game_state = GameState(
+        game_id=game_code,
+        mode="multiplayer",
+        players=[create_player(p["id"], p["mention"], p["name"], rng) for p in players],
+        seed=seed,
+        rng=rng
+    )
+    game_state.magazine = create_cartridges(rng)
     
-    for i, player in enumerate(players, 1):
+    for player in players:
         game_states[player["id"]] = game_state
     
     room = multiplayer_games.pop(game_code)
+    room_players.observe(len(players))
+    log_event(game_state, "game_started", players=len(players), seed=seed)
     
-    status = (
-        f"=== Раунд {game_state['round_number']} ===\n"
-        f"Жизни: " + " | ".join(
-            f"{game_state['players'][f'player{i}']['mention']} "
-            f"({game_state['players'][f'player{i}']['lives'] if game_state['players'][f'player{i}']['lives'] > 2 else '???'} ⚡️)"
-            for i in range(1, len(players) + 1)
-        ) + "\n"
-        f"Патроны: Боевых: {game_state['live']}, Холостых: {game_state['blank']}\n"
-        f"Предметы: " + ", ".join(
-            f"{game_state['players'][f'player{i}']['mention']}: "
-            f"{format_items(game_state['players'][f'player{i}']['items'])}"
-            for i in range(1, len(players) + 1)
-        ) + "\n"
-        f"Ход: {game_state['players']['player1']['mention']}\n"
-    )
+    status = render_status(game_state, header=True)
     
-    for i, player in enumerate(players, 1):
-        pid = f"player{i}"
-        if pid == "player1":
-            await context.bot.send_message(
-                player["id"],
-                status + "Ваш ход!",
-                reply_markup=build_game_keyboard(game_state["players"][pid]["items"], mode="multiplayer", game_state=game_state, current_player=pid),
+    messages = []
+    for seat, p in enumerate(game_state.players):
+        if seat == game_state.current_turn:
+            messages.append((p.id, status + "Ваш ход!", dict(
+                reply_markup=build_game_keyboard(p.item_list(), mode="multiplayer", game_state=game_state, current_player=seat),
                 parse_mode="Markdown"
-            )
+            )))
         else:
-            await context.bot.send_message(
-                player["id"],
-                status,
-                reply_markup=ReplyKeyboardRemove(),
-                parse_mode="Markdown"
-            )
+            messages.append((p.id, status, dict(reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")))
+    await say_each(context, game_state, messages)
+    await flush_turn(context, game_state)
 
+@track
 async def handle_game_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     action = update.message.text
     
     if chat_id not in game_states:
-        await update.message.reply_text("Игра не начата! Используйте /start.", reply_markup=ReplyKeyboardRemove())
+        await reply(update, context, "Игра не начата! Используйте /start.", reply_markup=ReplyKeyboardRemove())
         return
     
     game_state = game_states[chat_id]
-    if not game_state["game_active"]:
-        await update.message.reply_text(
-            "Игра окончена! Начните новую с /start.",
-            reply_markup=ReplyKeyboardRemove()
-        )
-        return
-    
-    if game_state["mode"] == "single":
-        await process_singleplayer_action(update, context, chat_id, game_state, action)
-    else:
-        await process_multiplayer_action(update, context, chat_id, game_state, action)
-
-async def process_singleplayer_action(update, context, chat_id, game_state, action):
-    if game_state["current_turn"] != "player":
-        await update.message.reply_text("Сейчас ход дилера! Ожидайте.", parse_mode="Markdown")
-        return
-    
-    if game_state["player_handcuffed"]:
-        await update.message.reply_text(
-            f"{game_state['player_mention']} в наручниках и пропускает ход!",
-            parse_mode="Markdown"
-        )
-        game_state["player_handcuffed"] = False
-        game_state["current_turn"] = "dealer"
-        time.sleep(0.3)
-        await process_dealer_turn(update, context, chat_id, game_state)
-        return
-    
-    game_state["extra_turn"] = False
-    damage = context.user_data.get("pending_knife", 1)
-    if action in ["В Дилера", "В Себя"] and "pending_knife" in context.user_data:
-        action = "dealer" if action == "В Дилера" else "self"
-    elif action == "В Дилера":
-        action = "dealer"
-    elif action == "В Себя":
-        action = "self"
-    else:
-        for item_id, item in ITEMS.items():
-            if action == f"{item['emoji']} {ITEMS[item_id]['name']}":
-                action = item_id
-                break
-        else:
-            await update.message.reply_text("Неверное действие! Выберите действие из меню.")
-            return
-    
-    if action in ITEMS:
-        if action not in game_state["player_items"]:
-            await update.message.reply_text(
-                f"У вас нет {ITEMS[action]['emoji']} {ITEMS[action]['name']}!",
-                parse_mode="Markdown"
+    # Апдейты одной игры обрабатываются строго по очереди, разных игр — параллельно
+    async with game_locks(("game", game_state.game_id)):
+        if game_states.get(chat_id) is not game_state or not game_state.game_active:
+            await reply(
+                update, context,
+                "Игра окончена! Начните новую с /start.",
+                reply_markup=ReplyKeyboardRemove()
             )
             return
-        game_state["player_items"].remove(action)
         
-        if action == "magnifier":
-            await update.message.reply_text(
-                f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                f"Следующий патрон — {'боевой' if game_state['cartridges'][0] else 'холостой'}.",
-                parse_mode="Markdown"
-            )
-            game_state["extra_turn"] = True
-        elif action == "knife":
-            await update.message.reply_text(
-                f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                f"Следующий боевой патрон нанесёт 2 урона.",
-                parse_mode="Markdown"
-            )
-            damage = 2
-            context.user_data["pending_knife"] = damage
-            await update.message.reply_text(
-                "Теперь выберите:",
-                reply_markup=build_game_keyboard([], is_knife=True, mode="single"),
-                parse_mode="Markdown"
-            )
-            return
-        elif action == "cigarettes":
-            if game_state["player_lives"] < 5:
-                game_state["player_lives"] += 1
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: +1 жизнь ⚡️!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}, "
-                    f"но жизни максимум!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif action == "beer":
-            if game_state["cartridges"]:
-                shot = game_state["cartridges"].pop(0)
-                game_state["live"] -= 1 if shot else 0
-                game_state["blank"] -= 0 if shot else 1
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                    f"Выброшен {'боевой' if shot else 'холостой'} патрон!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}, "
-                    f"но патронов нет!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif action == "handcuffs":
-            game_state["dealer_handcuffed"] = True
-            await update.message.reply_text(
-                f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                f"Дилер пропустит следующий ход!",
-                parse_mode="Markdown"
-            )
-            game_state["extra_turn"] = True
-        elif action == "adrenaline":
-            if game_state["dealer_items"]:
-                stolen_item = random.choice(game_state["dealer_items"])
-                game_state["dealer_items"].remove(stolen_item)
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                    f"Украден предмет {ITEMS[stolen_item]['emoji']} {ITEMS[stolen_item]['name']} у дилера!",
-                    parse_mode="Markdown"
-                )
-                game_state["player_items"].append(stolen_item)
-                await process_singleplayer_action(update, context, chat_id, game_state, stolen_item)
-                return
-            else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}, "
-                    f"но у дилера нет предметов!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif action == "phone":
-            if len(game_state["cartridges"]) > 1:
-                index = random.randint(1, len(game_state["cartridges"]) - 1)
-                future_shot = game_state["cartridges"][index]
-                context.user_data["phone_cartridge"] = {"index": index + 1, "is_live": future_shot}
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: Патрон...",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("Посмотреть патрон", callback_data="view_cartridge")
-                    ]]),
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                    f"Не повезло, патронов недостаточно!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif action == "reverse":
-            if game_state["cartridges"]:
-                was_live = game_state["cartridges"][0]
-                game_state["cartridges"][0] = not was_live
-                game_state["live"] += -1 if was_live else 1
-                game_state["blank"] += 1 if was_live else -1
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                    f"Следующий патрон изменён на противоположный!",
-                    parse_mode="Markdown"
-                )
+        try:
+            if game_state.mode == "single":
+                await process_singleplayer_action(update, context, chat_id, game_state, action)
             else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}, "
-                    f"но патронов нет!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-    
-    time.sleep(0.3)
-    
-    if action in ["dealer", "self"]:
-        if not game_state["cartridges"]:
-            await start_new_round(update, context, chat_id, game_state, "single")
-            return
-        
-        shot = game_state["cartridges"].pop(0)
-        shot_type = "Боевой" if shot else "Холостой"
-        game_state["live"] -= 1 if shot else 0
-        game_state["blank"] -= 0 if shot else 1
-        
-        if action == "dealer":
-            await update.message.reply_text(
-                f"{game_state['player_mention']} стреляет в дилера... {shot_type} патрон!",
-                parse_mode="Markdown"
-            )
-            time.sleep(0.8)
-            if shot:
-                game_state["dealer_lives"] -= damage
-                await update.message.reply_text(
-                    f"Дилер теряет {damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!",
-                    parse_mode="Markdown"
-                )
+                await process_multiplayer_action(update, context, chat_id, game_state, action)
+        finally:
+            await flush_turn(context, game_state)
+            game_states.touch(chat_id)
+
+async def say_single_events(context, game_state, chat_id, events):
+    # Сообщения по событиям движка для одиночной игры
+    log_engine_events(game_state, events)
+    for event in events:
+        kind = event[0]
+        if kind == "shot":
+            pause(game_state, SHORT_PAUSE)
+        text = single_event_text(game_state, event)
+        if text is None:
+            continue
+        kwargs = dict(parse_mode="Markdown")
+        if kind == "item" and event[1] == PLAYER and event[2] == "phone" and event[3] is not None:
+            index, is_live = event[3]
+            context.user_data["phone_cartridge"] = {"index": index, "is_live": is_live}
+            kwargs["reply_markup"] = InlineKeyboardMarkup([[
+                InlineKeyboardButton("Посмотреть патрон", callback_data="view_cartridge")
+            ]])
+        await say(context, game_state, chat_id, text, **kwargs)
+        if kind == "shot":
+            pause(game_state, LONG_PAUSE)
+            text = single_damage_text(game_state, event)
+            if text:
+                await say(context, game_state, chat_id, text, parse_mode="Markdown")
+        elif kind == "handcuffed":
+            pause(game_state, SHORT_PAUSE)
+
+async def process_singleplayer_action(update, context, chat_id, game_state, action):
+    kind, value = game_state.parse_action(action) or (None, None)
+    events = player_action(game_state, value if kind == "item" else kind)
+    if events[0][0] == "invalid":
+        reason = events[0][1]
+        if reason == "not_your_turn":
+            await reply(update, context, "Сейчас ход дилера! Ожидайте.", parse_mode="Markdown")
+        elif reason == "no_item":
+            await reply(update, context, f"У вас нет {ITEM_LABELS[value]}!", parse_mode="Markdown")
         else:
-            await update.message.reply_text(
-                f"{game_state['player_mention']} стреляет в себя... {shot_type} патрон!",
-                parse_mode="Markdown"
-            )
-            time.sleep(0.8)
-            if shot:
-                game_state["player_lives"] -= damage
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} теряет {damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} получает дополнительный ход!",
-                    parse_mode="Markdown"
-                )
-                game_state["extra_turn"] = True
-        
-        if "pending_knife" in context.user_data:
-            del context.user_data["pending_knife"]
-    
-    if not game_state["cartridges"]:
-        await start_new_round(update, context, chat_id, game_state, "single")
+            await reply(update, context, "Неверное действие! Выберите действие из меню.")
         return
     
-    if game_state["player_lives"] <= 0 or game_state["dealer_lives"] <= 0:
+    await say_single_events(context, game_state, chat_id, events)
+    last = events[-1]
+    if last[0] == "game_over":
         await end_game(update, context, chat_id, game_state, "single")
-        return
-    
-    if game_state["extra_turn"]:
-        status = (
-            f"Жизни: {game_state['player_mention']} "
-            f"({game_state['player_lives'] if game_state['player_lives'] > 2 else '???'} ⚡️) | "
-            f"Дилер ({game_state['dealer_lives'] if game_state['dealer_lives'] > 2 else '???'} ⚡️)\n"
-            f"Предметы {game_state['player_mention']}: {format_items(game_state['player_items'])}\n"
-            f"Предметы дилера: {format_items(game_state['dealer_items'])}\n"
-            f"Ход: {game_state['player_mention']}\n"
-        )
-        await update.message.reply_text(
-            status + "Ваш ход!",
-            reply_markup=build_game_keyboard(game_state["player_items"], mode="single"),
+    elif last[0] == "new_round":
+        await announce_round(context, game_state, chat_id)
+    elif game_state.current_turn == DEALER:
+        await process_dealer_turn(update, context, chat_id, game_state)
+    elif last[0] == "item" and last[2] == "knife":
+        await say(
+            context, game_state, chat_id,
+            "Теперь выберите:",
+            reply_markup=build_game_keyboard([], is_knife=True, mode="single"),
             parse_mode="Markdown"
         )
     else:
-        game_state["current_turn"] = "dealer"
-        await process_dealer_turn(update, context, chat_id, game_state)
+        player = game_state.players[PLAYER]
+        await say(
+            context, game_state, chat_id,
+            render_status(game_state) + "Ваш ход!",
+            reply_markup=build_game_keyboard(player.item_list(), mode="single"),
+            parse_mode="Markdown"
+        )
 
 async def process_multiplayer_action(update, context, chat_id, game_state, action):
-    player_id = None
-    for pid, p in game_state["players"].items():
-        if p["id"] == chat_id:
-            player_id = pid
-            break
-    
-    if not player_id:
-        await update.message.reply_text("Вы не в игре!", reply_markup=ReplyKeyboardRemove())
+    seat = game_state.seat_of(chat_id)
+    if seat is None:
+        await reply(update, context, "Вы не в игре!", reply_markup=ReplyKeyboardRemove())
         return
     
-    if game_state["current_turn"] != player_id:
-        await update.message.reply_text("Сейчас не ваш ход! Ожидайте.", parse_mode="Markdown")
+    if game_state.current_turn != seat:
+        await reply(update, context, "Сейчас не ваш ход! Ожидайте.", parse_mode="Markdown")
         return
     
-    if game_state["players"][player_id]["handcuffed"]:
-        await update.message.reply_text(
-            f"{game_state['players'][player_id]['mention']} в наручниках и пропускает ход!",
+    player = game_state.players[seat]
+    
+    if player.handcuffed:
+        await say(
+            context, game_state, chat_id,
+            f"{player.mention} в наручниках и пропускает ход!",
             parse_mode="Markdown"
         )
-        game_state["players"][player_id]["handcuffed"] = False
-        game_state["current_turn"] = get_next_player(game_state, player_id)
-        time.sleep(0.3)
-        await update_multiplayer_status(update, context, game_state, game_state["current_turn"], player_id)
+        player.handcuffed = False
+        game_state.current_turn = get_next_player(game_state, seat)
+        pause(game_state, SHORT_PAUSE)
+        await update_multiplayer_status(update, context, game_state, game_state.current_turn, seat)
         return
     
-    game_state["extra_turn"] = False
+    game_state.extra_turn = False
     damage = context.user_data.get("pending_knife", 1)
     
-    # Проверяем, является ли действие выбором игрока для выстрела
-    target_pid = None
-    if "pending_knife" in context.user_data or action == "В Себя":
-        if action == "В Себя":
-            action = "self"
-        else:
-            # Проверяем, является ли action чистым именем игрока
-            for pid, p in game_state["players"].items():
-                user = type('obj', (object,), {'id': p['id'], 'username': p['mention'].split('[')[1].split(']')[0] if '[' in p['mention'] else None, 'first_name': p['mention'].split('[')[1].split(']')[0] if '[' in p['mention'] else p['mention'], 'last_name': None})
-                if action == get_user_mention(user, for_button=True) and pid != player_id and p["lives"] > 0:
-                    target_pid = pid
-                    action = f"shoot:{pid}"
-                    break
-            if not target_pid and action != "self":
-                await update.message.reply_text("Неверная цель! Выберите игрока из меню.", parse_mode="Markdown")
-                return
-    else:
-        for pid, p in game_state["players"].items():
-            user = type('obj', (object,), {'id': p['id'], 'username': p['mention'].split('[')[1].split(']')[0] if '[' in p['mention'] else None, 'first_name': p['mention'].split('[')[1].split(']')[0] if '[' in p['mention'] else p['mention'], 'last_name': None})
-            if action == get_user_mention(user, for_button=True) and pid != player_id and p["lives"] > 0:
-                target_pid = pid
-                action = f"shoot:{pid}"
-                break
-    
-    if action == "В Себя":
+    kind, value = game_state.parse_action(action, seat) or (None, None)
+    if kind == "target" and (value == seat or game_state.players[value].lives <= 0):
+        kind = None
+    if "pending_knife" in context.user_data and kind not in ("target", "self"):
+        # После ножа нужно выбрать, в кого стрелять
+        await reply(update, context, "Неверная цель! Выберите игрока из меню.", parse_mode="Markdown")
+        return
+    if kind == "target":
+        action = f"shoot:{value}"
+    elif kind == "self":
         action = "self"
+    elif kind == "item":
+        action = value
     else:
-        for item_id, item in ITEMS.items():
-            if action == f"{item['emoji']} {item['name']}":
-                action = item_id
-                break
+        await reply(update, context, "Неверное действие! Выберите действие из меню.")
+        return
     
     if action in ITEMS:
-        if action not in game_state["players"][player_id]["items"]:
-            await update.message.reply_text(
+        if not player.has_item(action):
+            await reply(
+                update, context,
                 f"У вас нет {ITEMS[action]['emoji']} {ITEMS[action]['name']}!",
                 parse_mode="Markdown"
             )
             return
-        game_state["players"][player_id]["items"].remove(action)
+        player.take_item(action)
+        log_event(game_state, "item", seat, item=action)
         
         if action == "magnifier":
             msg = (
-                f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
-                f"Следующий патрон — {'боевой' if game_state['cartridges'][0] else 'холостой'}."
+                f"{player.mention} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
+                f"Следующий патрон — {'боевой' if game_state.magazine.peek() else 'холостой'}."
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+            await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "knife":
             msg = (
-                f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
+                f"{player.mention} использует {ITEMS[action]['emoji']} {ITEMS[action]['name']}: "
                 f"Следующий боевой патрон нанесёт 2 урона."
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
+            await say_all(context, game_state, msg, parse_mode="Markdown")
             damage = 2
             context.user_data["pending_knife"] = damage
-            await update.message.reply_text(
+            await say(
+                context, game_state, chat_id,
                 "Теперь выберите:",
-                reply_markup=build_game_keyboard([], is_knife=True, mode="multiplayer", game_state=game_state, current_player=player_id),
+                reply_markup=build_game_keyboard([], is_knife=True, mode="multiplayer", game_state=game_state, current_player=seat),
                 parse_mode="Markdown"
             )
             return
         elif action == "cigarettes":
-            if game_state["players"][player_id]["lives"] < 5:
-                game_state["players"][player_id]["lives"] += 1
+            if player.lives < MAX_LIVES:
+                player.lives += 1
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: +1 жизнь ⚡️!"
                 )
             else:
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}, но жизни максимум!"
                 )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+            await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "beer":
-            if game_state["cartridges"]:
-                shot = game_state["cartridges"].pop(0)
-                game_state["live"] -= 1 if shot else 0
-                game_state["blank"] -= 0 if shot else 1
+            if game_state.magazine:
+                shot = game_state.magazine.eject()
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: Выброшен {'боевой' if shot else 'холостой'} патрон!"
                 )
             else:
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}, но патронов нет!"
                 )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+            await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "handcuffs":
-            next_player = get_next_player(game_state, player_id)
-            game_state["players"][next_player]["handcuffed"] = True
+            next_player = get_next_player(game_state, seat)
+            game_state.players[next_player].handcuffed = True
             msg = (
-                f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
-                f"{ITEMS[action]['name']}: {game_state['players'][next_player]['mention']} пропустит следующий ход!"
+                f"{player.mention} использует {ITEMS[action]['emoji']} "
+                f"{ITEMS[action]['name']}: {game_state.players[next_player].mention} пропустит следующий ход!"
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+            await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "adrenaline":
-            opponent_id = get_next_player(game_state, player_id)
-            if game_state["players"][opponent_id]["items"]:
-                stolen_item = random.choice(game_state["players"][opponent_id]["items"])
-                game_state["players"][opponent_id]["items"].remove(stolen_item)
+            opponent_id = get_next_player(game_state, seat)
+            if game_state.players[opponent_id].item_count():
+                stolen_item = game_state.rng.choice(game_state.players[opponent_id].item_list())
+                game_state.players[opponent_id].take_item(stolen_item)
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: Украден предмет {ITEMS[stolen_item]['emoji']} "
-                    f"{ITEMS[stolen_item]['name']} у {game_state['players'][opponent_id]['mention']}!"
+                    f"{ITEMS[stolen_item]['name']} у {game_state.players[opponent_id].mention}!"
                 )
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-                game_state["players"][player_id]["items"].append(stolen_item)
-                await process_multiplayer_action(update, context, chat_id, game_state, stolen_item)
+                await say_all(context, game_state, msg, parse_mode="Markdown")
+                player.give_item(stolen_item)
+                # Украденный предмет сразу применяется, как нажатие его кнопки
+                await process_multiplayer_action(update, context, chat_id, game_state, ITEM_LABELS[stolen_item])
                 return
             else:
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
-                    f"{ITEMS[action]['name']}, но у {game_state['players'][opponent_id]['mention']} нет предметов!"
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
+                    f"{ITEMS[action]['name']}, но у {game_state.players[opponent_id].mention} нет предметов!"
                 )
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+                await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "phone":
-            if len(game_state["cartridges"]) > 1:
-                index = random.randint(1, len(game_state["cartridges"]) - 1)
-                future_shot = game_state["cartridges"][index]
+            if len(game_state.magazine) > 1:
+                index = game_state.rng.randint(1, len(game_state.magazine) - 1)
+                future_shot = game_state.magazine.peek_at(index)
                 context.user_data["phone_cartridge"] = {"index": index + 1, "is_live": future_shot}
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: Патрон..."
                 )
-                for p in game_state["players"].values():
-                    if p["id"] == chat_id:
-                        await context.bot.send_message(
-                            p["id"],
-                            msg,
+                messages = []
+                for p in game_state.players:
+                    if p.id == chat_id:
+                        messages.append((p.id, msg, dict(
                             reply_markup=InlineKeyboardMarkup([[
                                 InlineKeyboardButton("Посмотреть патрон", callback_data="view_cartridge")
                             ]]),
                             parse_mode="Markdown"
-                        )
+                        )))
                     else:
-                        await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
+                        messages.append((p.id, msg, dict(parse_mode="Markdown")))
+                await say_each(context, game_state, messages)
             else:
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: Не повезло, патронов недостаточно!"
                 )
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+                await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
         elif action == "reverse":
-            if game_state["cartridges"]:
-                was_live = game_state["cartridges"][0]
-                game_state["cartridges"][0] = not was_live
-                game_state["live"] += -1 if was_live else 1
-                game_state["blank"] += 1 if was_live else -1
+            if game_state.magazine:
+                game_state.magazine.invert_next()
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}: Следующий патрон изменён на противоположный!"
                 )
             else:
                 msg = (
-                    f"{game_state['players'][player_id]['mention']} использует {ITEMS[action]['emoji']} "
+                    f"{player.mention} использует {ITEMS[action]['emoji']} "
                     f"{ITEMS[action]['name']}, но патронов нет!"
                 )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg, parse_mode="Markdown")
-            game_state["extra_turn"] = True
+            await say_all(context, game_state, msg, parse_mode="Markdown")
+            game_state.extra_turn = True
     
-    time.sleep(0.3)
+    pause(game_state, SHORT_PAUSE)
     
     if action.startswith("shoot:") or action == "self":
-        if not game_state["cartridges"]:
+        if not game_state.magazine:
             await start_new_round(update, context, chat_id, game_state, "multiplayer")
             return
         
-        shot = game_state["cartridges"].pop(0)
+        shot = game_state.magazine.draw()
         shot_type = "Боевой" if shot else "Холостой"
-        game_state["live"] -= 1 if shot else 0
-        game_state["blank"] -= 0 if shot else 1
         
         if action.startswith("shoot:"):
-            opponent_id = action.split(":")[1]
+            opponent_id = int(action.split(":")[1])
             msg1 = (
-                f"{game_state['players'][player_id]['mention']} стреляет в "
-                f"{game_state['players'][opponent_id]['mention']}... {shot_type} патрон!"
+                f"{player.mention} стреляет в "
+                f"{game_state.players[opponent_id].mention}... {shot_type} патрон!"
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg1, parse_mode="Markdown")
-            time.sleep(0.8)
+            await say_all(context, game_state, msg1, parse_mode="Markdown")
+            pause(game_state, LONG_PAUSE)
             if shot:
-                game_state["players"][opponent_id]["lives"] -= damage
+                game_state.players[opponent_id].lives -= damage
                 msg2 = (
-                    f"{game_state['players'][opponent_id]['mention']} теряет "
+                    f"{game_state.players[opponent_id].mention} теряет "
                     f"{damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!"
                 )
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg2, parse_mode="Markdown")
+                await say_all(context, game_state, msg2, parse_mode="Markdown")
         else:
             msg1 = (
-                f"{game_state['players'][player_id]['mention']} стреляет в себя... {shot_type} патрон!"
+                f"{player.mention} стреляет в себя... {shot_type} патрон!"
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(p["id"], msg1, parse_mode="Markdown")
-            time.sleep(0.8)
+            await say_all(context, game_state, msg1, parse_mode="Markdown")
+            pause(game_state, LONG_PAUSE)
             if shot:
-                game_state["players"][player_id]["lives"] -= damage
+                player.lives -= damage
                 msg2 = (
-                    f"{game_state['players'][player_id]['mention']} теряет "
+                    f"{player.mention} теряет "
                     f"{damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!"
                 )
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg2, parse_mode="Markdown")
+                await say_all(context, game_state, msg2, parse_mode="Markdown")
             else:
-                msg2 = f"{game_state['players'][player_id]['mention']} получает дополнительный ход!"
-                for p in game_state["players"].values():
-                    await context.bot.send_message(p["id"], msg2, parse_mode="Markdown")
-                game_state["extra_turn"] = True
+                msg2 = f"{player.mention} получает дополнительный ход!"
+                await say_all(context, game_state, msg2, parse_mode="Markdown")
+                game_state.extra_turn = True
+        target = int(action.split(":")[1]) if action.startswith("shoot:") else seat
+        log_event(game_state, "shot", seat, target=target, live=shot, damage=damage if shot else 0)
         
         if "pending_knife" in context.user_data:
             del context.user_data["pending_knife"]
     
-    if not game_state["cartridges"]:
+    if not game_state.magazine:
         await start_new_round(update, context, chat_id, game_state, "multiplayer")
         return
     
-    if any(p["lives"] <= 0 for p in game_state["players"].values()):
+    if any(p.lives <= 0 for p in game_state.players):
         await end_game(update, context, chat_id, game_state, "multiplayer")
         return
     
-    if not game_state["extra_turn"]:
-        game_state["current_turn"] = get_next_player(game_state, player_id)
+    if not game_state.extra_turn:
+        game_state.current_turn = get_next_player(game_state, seat)
     
-    await update_multiplayer_status(update, context, game_state, game_state["current_turn"], player_id)
+    await update_multiplayer_status(update, context, game_state, game_state.current_turn, seat)
 
+@track
 async def view_cartridge(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
     chat_id = query.from_user.id
-    if "phone_cartridge" not in context.user_data:
-        await query.message.reply_text("Данные о патроне отсутствуют!", parse_mode="Markdown")
+    # Забираем данные сразу: второе нажатие может прийти, пока ждём ответ
+    cartridge_data = context.user_data.pop("phone_cartridge", None)
+    if cartridge_data is None:
+        await reply(update, context, "Данные о патроне отсутствуют!", parse_mode="Markdown")
         return
     
-    cartridge_data = context.user_data["phone_cartridge"]
     index = cartridge_data["index"]
     is_live = cartridge_data["is_live"]
     
-    await query.message.reply_text(
+    await reply(
+        update, context,
         f"{index}-й патрон — {'боевой' if is_live else 'холостой'}.",
         parse_mode="Markdown"
     )
-    
-    # Удаляем данные после просмотра
-    del context.user_data["phone_cartridge"]
-
-def get_next_player(game_state, current_player):
-    player_ids = sorted([pid for pid in game_state["players"] if game_state["players"][pid]["lives"] > 0])
-    current_idx = player_ids.index(current_player)
-    next_idx = (current_idx + 1) % len(player_ids)
-    return player_ids[next_idx]
 
 async def update_multiplayer_status(update, context, game_state, current_turn, current_player_id):
-    status = (
-        f"Жизни: " + " | ".join(
-            f"{game_state['players'][f'player{i}']['mention']} "
-            f"({game_state['players'][f'player{i}']['lives'] if game_state['players'][f'player{i}']['lives'] > 2 else '???'} ⚡️)"
-            for i in range(1, len(game_state["players"]) + 1)
-        ) + "\n"
-        f"Предметы: " + ", ".join(
-            f"{game_state['players'][f'player{i}']['mention']}: "
-            f"{format_items(game_state['players'][f'player{i}']['items'])}"
-            for i in range(1, len(game_state["players"]) + 1)
-        ) + "\n"
-        f"Ход: {game_state['players'][current_turn]['mention']}\n"
-    )
+    status = render_status(game_state)
     
-    for pid, p in game_state["players"].items():
-        if pid == current_turn:
-            await context.bot.send_message(
-                p["id"],
-                status + "Ваш ход!",
-                reply_markup=build_game_keyboard(p["items"], mode="multiplayer", game_state=game_state, current_player=pid),
+    messages = []
+    for seat, p in enumerate(game_state.players):
+        if seat == current_turn:
+            messages.append((p.id, status + "Ваш ход!", dict(
+                reply_markup=build_game_keyboard(p.item_list(), mode="multiplayer", game_state=game_state, current_player=seat),
                 parse_mode="Markdown"
-            )
+            )))
         else:
-            await context.bot.send_message(
-                p["id"],
-                status,
-                reply_markup=ReplyKeyboardRemove(),
-                parse_mode="Markdown"
-            )
+            messages.append((p.id, status, dict(reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")))
+    await say_each(context, game_state, messages)
 
 async def start_new_round(update, context, chat_id, game_state, mode):
-    game_state["round_number"] += 1
-    game_state["cartridges"], game_state["live"], game_state["blank"] = create_cartridges()
-    
-    if mode == "single":
-        game_state["player_items"] = add_item(game_state["player_items"])
-        game_state["dealer_items"] = add_item(game_state["dealer_items"])
-        game_state["current_turn"] = "player"
-        status = (
-            f"=== Раунд {game_state['round_number']} ===\n"
-            f"Жизни: {game_state['player_mention']} "
-            f"({game_state['player_lives'] if game_state['player_lives'] > 2 else '???'} ⚡️) | "
-            f"Дилер ({game_state['dealer_lives'] if game_state['dealer_lives'] > 2 else '???'} ⚡️)\n"
-            f"Патроны: Боевых: {game_state['live']}, Холостых: {game_state['blank']}\n"
-            f"Предметы {game_state['player_mention']}: {format_items(game_state['player_items'])}\n"
-            f"Предметы дилера: {format_items(game_state['dealer_items'])}\n"
-            f"Ход: {game_state['player_mention']}\n"
-        )
-        await update.message.reply_text(
+    new_round(game_state)
+    log_event(game_state, "round_started")
+    await announce_round(context, game_state, chat_id)
+
+async def announce_round(context, game_state, chat_id):
+    status = render_status(game_state, header=True)
+    if game_state.mode == "single":
+        player = game_state.players[PLAYER]
+        await say(
+            context, game_state, chat_id,
             status + "Выберите действие:",
-            reply_markup=build_game_keyboard(game_state["player_items"], mode="single"),
+            reply_markup=build_game_keyboard(player.item_list(), mode="single"),
             parse_mode="Markdown"
         )
     else:
-        for pid in game_state["players"]:
-            game_state["players"][pid]["items"] = add_item(game_state["players"][pid]["items"])
-        game_state["current_turn"] = "player1"
-        status = (
-            f"=== Раунд {game_state['round_number']} ===\n"
-            f"Жизни: " + " | ".join(
-                f"{game_state['players'][f'player{i}']['mention']} "
-                f"({game_state['players'][f'player{i}']['lives'] if game_state['players'][f'player{i}']['lives'] > 2 else '???'} ⚡️)"
-                for i in range(1, len(game_state["players"]) + 1)
-            ) + "\n"
-            f"Патроны: Боевых: {game_state['live']}, Холостых: {game_state['blank']}\n"
-            f"Предметы: " + ", ".join(
-                f"{game_state['players'][f'player{i}']['mention']}: "
-                f"{format_items(game_state['players'][f'player{i}']['items'])}"
-                for i in range(1, len(game_state["players"]) + 1)
-            ) + "\n"
-            f"Ход: {game_state['players']['player1']['mention']}\n"
-        )
-        for pid, p in game_state["players"].items():
-            if pid == "player1":
-                await context.bot.send_message(
-                    p["id"],
-                    status + "Ваш ход!",
-                    reply_markup=build_game_keyboard(p["items"], mode="multiplayer", game_state=game_state, current_player=pid),
+        messages = []
+        for seat, p in enumerate(game_state.players):
+            if seat == game_state.current_turn:
+                messages.append((p.id, status + "Ваш ход!", dict(
+                    reply_markup=build_game_keyboard(p.item_list(), mode="multiplayer", game_state=game_state, current_player=seat),
                     parse_mode="Markdown"
-                )
+                )))
             else:
-                await context.bot.send_message(
-                    p["id"],
-                    status,
-                    reply_markup=ReplyKeyboardRemove(),
-                    parse_mode="Markdown"
-                )
+                messages.append((p.id, status, dict(reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")))
+        await say_each(context, game_state, messages)
 
 async def process_dealer_turn(update, context, chat_id, game_state):
-    if not game_state["cartridges"]:
-        await start_new_round(update, context, chat_id, game_state, "single")
-        return
-    
-    if game_state["dealer_handcuffed"]:
-        await update.message.reply_text(
-            "Дилер в наручниках и пропускает ход!",
-            parse_mode="Markdown"
-        )
-        game_state["dealer_handcuffed"] = False
-        game_state["current_turn"] = "player"
-        time.sleep(0.3)
-        status = (
-            f"Жизни: {game_state['player_mention']} "
-            f"({game_state['player_lives'] if game_state['player_lives'] > 2 else '???'} ⚡️) | "
-            f"Дилер ({game_state['dealer_lives'] if game_state['dealer_lives'] > 2 else '???'} ⚡️)\n"
-            f"Предметы {game_state['player_mention']}: {format_items(game_state['player_items'])}\n"
-            f"Предметы дилера: {format_items(game_state['dealer_items'])}\n"
-            f"Ход: {game_state['player_mention']}\n"
-        )
-        await update.message.reply_text(
-            status + "Выберите действие:",
-            reply_markup=build_game_keyboard(game_state["player_items"], mode="single"),
-            parse_mode="Markdown"
-        )
-        return
-    
-    game_state["extra_turn"] = False
-    action, used_item = dealer_decision(
-        game_state["live"], game_state["blank"], game_state["dealer_items"],
-        game_state["cartridges"][0] if game_state["cartridges"] else None,
-        game_state["player_handcuffed"], game_state["dealer_lives"]
-    )
-    time.sleep(0.3)
-    
-    if used_item:
-        game_state["dealer_items"].remove(used_item)
-        if used_item == "magnifier":
-            await update.message.reply_text(
-                f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                f"Следующий патрон — {'боевой' if game_state['cartridges'][0] else 'холостой'}.",
-                parse_mode="Markdown"
-            )
-            await update.message.reply_text(
-                f"Дилер выбирает: {'стрелять в игрока' if action == 'player' else 'стрелять в себя'}",
-                parse_mode="Markdown"
-            )
-            game_state["extra_turn"] = True
-        elif used_item == "knife":
-            await update.message.reply_text(
-                f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                f"Следующий боевой патрон нанесёт 2 урона.",
-                parse_mode="Markdown"
-            )
-            await update.message.reply_text(
-                "Дилер выбирает: стрелять в игрока",
-                parse_mode="Markdown"
-            )
-            action = "player"
-        elif used_item == "cigarettes":
-            if game_state["dealer_lives"] < 5:
-                game_state["dealer_lives"] += 1
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: +1 жизнь ⚡️!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}, "
-                    f"но жизни максимум!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif used_item == "beer":
-            if game_state["cartridges"]:
-                shot = game_state["cartridges"].pop(0)
-                game_state["live"] -= 1 if shot else 0
-                game_state["blank"] -= 0 if shot else 1
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                    f"Выброшен {'боевой' if shot else 'холостой'} патрон!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}, "
-                    f"но патронов нет!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif used_item == "handcuffs":
-            game_state["player_handcuffed"] = True
-            await update.message.reply_text(
-                f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                f"Игрок пропустит следующий ход!",
-                parse_mode="Markdown"
-            )
-            game_state["extra_turn"] = True
-        elif used_item == "adrenaline":
-            if game_state["player_items"]:
-                stolen_item = random.choice(game_state["player_items"])
-                game_state["player_items"].remove(stolen_item)
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                    f"Украден предмет {ITEMS[stolen_item]['emoji']} {ITEMS[stolen_item]['name']} "
-                    f"у {game_state['player_mention']}!",
-                    parse_mode="Markdown"
-                )
-                game_state["dealer_items"].append(stolen_item)
-            else:
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}, "
-                    f"но у {game_state['player_mention']} нет предметов!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif used_item == "phone":
-            if len(game_state["cartridges"]) > 1:
-                index = random.randint(1, len(game_state["cartridges"]) - 1)
-                future_shot = game_state["cartridges"][index]
-                context.user_data["phone_cartridge"] = {"index": index + 1, "is_live": future_shot}
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: Патрон...",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                    f"Не повезло, патронов недостаточно!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-        elif used_item == "reverse":
-            if game_state["cartridges"]:
-                was_live = game_state["cartridges"][0]
-                game_state["cartridges"][0] = not was_live
-                game_state["live"] += -1 if was_live else 1
-                game_state["blank"] += 1 if was_live else -1
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}: "
-                    f"Следующий патрон изменён на противоположный!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    f"Дилер использует {ITEMS[used_item]['emoji']} {ITEMS[used_item]['name']}, "
-                    f"но патронов нет!",
-                    parse_mode="Markdown"
-                )
-            game_state["extra_turn"] = True
-    
-    if not game_state["cartridges"]:
-        await start_new_round(update, context, chat_id, game_state, "single")
-        return
-    
-    damage = 2 if used_item == "knife" else 1
-    
-    if action in ["player", "self"]:
-        if not game_state["cartridges"]:
-            await start_new_round(update, context, chat_id, game_state, "single")
-            return
-        
-        shot = game_state["cartridges"].pop(0)
-        shot_type = "Боевой" if shot else "Холостой"
-        game_state["live"] -= 1 if shot else 0
-        game_state["blank"] -= 0 if shot else 1
-        
-        if action == "player":
-            await update.message.reply_text(
-                f"Дилер стреляет в {game_state['player_mention']}... {shot_type} патрон!",
-                parse_mode="Markdown"
-            )
-            time.sleep(0.8)
-            if shot:
-                game_state["player_lives"] -= damage
-                await update.message.reply_text(
-                    f"{game_state['player_mention']} теряет {damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!",
-                    parse_mode="Markdown"
-                )
-        else:
-            await update.message.reply_text(
-                f"Дилер стреляет в себя... {shot_type} патрон!",
-                parse_mode="Markdown"
-            )
-            time.sleep(0.8)
-            if shot:
-                game_state["dealer_lives"] -= damage
-                await update.message.reply_text(
-                    f"Дилер теряет {damage} {'жизни' if damage > 1 else 'жизнь'} ⚡️!",
-                    parse_mode="Markdown"
-                )
-            else:
-                await update.message.reply_text(
-                    "Дилер получает дополнительный ход!",
-                    parse_mode="Markdown"
-                )
-                game_state["extra_turn"] = True
-    
-    if not game_state["cartridges"]:
-        await start_new_round(update, context, chat_id, game_state, "single")
-        return
-    
-    if game_state["player_lives"] <= 0 or game_state["dealer_lives"] <= 0:
-        await end_game(update, context, chat_id, game_state, "single")
-        return
-    
-    if game_state["extra_turn"]:
-        await process_dealer_turn(update, context, chat_id, game_state)
+    # Ход дилера идёт отдельной задачей, чтобы его можно было прервать
+    # (cancel_dealer_turn), не трогая обработчик апдейта
+    task = asyncio.get_running_loop().create_task(charged(dealer_turn_loop(update, context, chat_id, game_state)))
+    dealer_turns[game_state.game_id] = task
+    try:
+        await asyncio.wait({task})
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        if dealer_turns.get(game_state.game_id) is task:
+            del dealer_turns[game_state.game_id]
+    if task.cancelled():
+        dealer_stats["cancelled"] += 1
     else:
-        game_state["current_turn"] = "player"
-        status = (
-            f"Жизни: {game_state['player_mention']} "
-            f"({game_state['player_lives'] if game_state['player_lives'] > 2 else '???'} ⚡️) | "
-            f"Дилер ({game_state['dealer_lives'] if game_state['dealer_lives'] > 2 else '???'} ⚡️)\n"
-            f"Предметы {game_state['player_mention']}: {format_items(game_state['player_items'])}\n"
-            f"Предметы дилера: {format_items(game_state['dealer_items'])}\n"
-            f"Ход: {game_state['player_mention']}\n"
-        )
-        await update.message.reply_text(
-            status + "Выберите действие:",
-            reply_markup=build_game_keyboard(game_state["player_items"], mode="single"),
+        task.result()
+
+async def dealer_turn_loop(update, context, chat_id, game_state):
+    # Шаги дилера по одному, пока ход у него, но не больше DEALER_MAX_STEPS.
+    # Между шагами отдаём управление циклу событий
+    started = time.perf_counter()
+    steps = 0
+    try:
+        while game_state.game_active and game_state.current_turn == DEALER:
+            if steps >= DEALER_MAX_STEPS:
+                logger.warning(f"Dealer turn in game {game_state.game_id} hit {DEALER_MAX_STEPS} steps, passing the turn")
+                dealer_stats["guard_hits"] += 1
+                await say_single_events(context, game_state, chat_id, force_pass(game_state))
+                break
+            pause(game_state, SHORT_PAUSE)
+            events = dealer_step(game_state)
+            steps += 1
+            await say_single_events(context, game_state, chat_id, events)
+            last = events[-1]
+            if last[0] == "game_over":
+                await end_game(update, context, chat_id, game_state, "single")
+                return
+            if last[0] == "new_round":
+                await announce_round(context, game_state, chat_id)
+                return
+            await asyncio.sleep(0)
+        if not game_state.game_active:
+            return
+        player = game_state.players[PLAYER]
+        await say(
+            context, game_state, chat_id,
+            render_status(game_state) + "Выберите действие:",
+            reply_markup=build_game_keyboard(player.item_list(), mode="single"),
             parse_mode="Markdown"
         )
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        dealer_stats["turns"] += 1
+        dealer_stats["steps"] += steps
+        dealer_stats["max_steps"] = max(dealer_stats["max_steps"], steps)
+        dealer_stats["total_ms"] += elapsed_ms
+        dealer_stats["max_ms"] = max(dealer_stats["max_ms"], elapsed_ms)
+        dealer_turn_steps.observe(steps)
+        dealer_turn_seconds.observe(elapsed_ms / 1000)
+
+def cancel_dealer_turn(game_id):
+    task = dealer_turns.pop(game_id, None)
+    if task:
+        task.cancel()
+    return task is not None
 
 async def end_game(update, context, chat_id, game_state, mode):
-    game_state["game_active"] = False
+    game_state.game_active = False
     if mode == "single":
-        if game_state["player_lives"] > 0:
-            await update.message.reply_text(
-                f"=== Игра окончена ===\nПоздравляю! {game_state['player_mention']} победил!",
+        if game_state.players[PLAYER].lives > 0:
+            await say(
+                context, game_state, chat_id,
+                f"=== Игра окончена ===\nПоздравляю! {game_state.players[PLAYER].mention} победил!",
                 reply_markup=ReplyKeyboardRemove(),
                 parse_mode="Markdown"
             )
         else:
-            await update.message.reply_text(
+            await say(
+                context, game_state, chat_id,
                 "=== Игра окончена ===\nДилер победил!",
                 reply_markup=ReplyKeyboardRemove(),
                 parse_mode="Markdown"
             )
+        if GAME_LOG_PATH:
+            # Файл пишется в потоке, чтобы не останавливать цикл событий
+            await asyncio.to_thread(record_game, GAME_LOG_PATH, game_state)
         del game_states[chat_id]
     else:
-        alive = [pid for pid, p in game_state["players"].items() if p["lives"] > 0]
+        alive = game_state.alive_seats()
         if len(alive) == 1:
             winner = alive[0]
             msg = (
                 f"=== Игра окончена ===\n"
-                f"Поздравляю! {game_state['players'][winner]['mention']} победил!"
+                f"Поздравляю! {game_state.players[winner].mention} победил!"
             )
-            for p in game_state["players"].values():
-                await context.bot.send_message(
-                    p["id"],
-                    msg,
-                    reply_markup=ReplyKeyboardRemove(),
-                    parse_mode="Markdown"
-                )
-            for p in game_state["players"].values():
-                if p["id"] in game_states:
-                    del game_states[p["id"]]
+            await say_all(context, game_state, msg, reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")
+            for p in game_state.players:
+                if p.id in game_states:
+                    del game_states[p.id]
         elif len(alive) == 0:
             msg = "=== Игра окончена ===\nВсе игроки проиграли!"
-            for p in game_state["players"].values():
-                await context.bot.send_message(
-                    p["id"],
-                    msg,
-                    reply_markup=ReplyKeyboardRemove(),
-                    parse_mode="Markdown"
-                )
-            for p in game_state["players"].values():
-                if p["id"] in game_states:
-                    del game_states[p["id"]]
+            await say_all(context, game_state, msg, reply_markup=ReplyKeyboardRemove(), parse_mode="Markdown")
+            for p in game_state.players:
+                if p.id in game_states:
+                    del game_states[p.id]
         else:
             # Продолжаем игру, если больше одного игрока живы
-            game_state["game_active"] = True
+            game_state.game_active = True
             await start_new_round(update, context, chat_id, game_state, "multiplayer")
+    if not game_state.game_active:
+        alive = game_state.alive_seats()
+        log_event(game_state, "game_ended", winner=alive[0] if len(alive) == 1 else None)
+        game_rounds.observe(game_state.round_number, game_state.mode)
+        forget_game(game_state.game_id, len(game_state.players))
 
-def dealer_decision(live, blank, dealer_items, next_cartridge, player_handcuffed, dealer_lives):
-    total = live + blank
-    if total == 0:
-        return "player", None
-    live_prob = live / total if total > 0 else 0
-    
-    used_item = None
-    if player_handcuffed:
-        return None, None
-    if "handcuffs" in dealer_items and live_prob > 0.5 and total > 2:
-        used_item = "handcuffs"
-        return None, used_item
-    if "beer" in dealer_items and total > 1 and live_prob > 0.5:
-        used_item = "beer"
-        return None, used_item
-    if "magnifier" in dealer_items and 0.3 < live_prob < 0.7 and total > 1:
-        used_item = "magnifier"
-        if next_cartridge:
-            return "player", used_item
-        return "self", used_item
-    if "knife" in dealer_items and live_prob > 0.3:
-        used_item = "knife"
-        return "player", used_item
-    if "cigarettes" in dealer_items and dealer_lives <= 2 and dealer_lives < 5:
-        used_item = "cigarettes"
-        return None, used_item
-    if "adrenaline" in dealer_items and live_prob > 0.5:
-        used_item = "adrenaline"
-        return None, used_item
-    if "phone" in dealer_items and total > 2:
-        used_item = "phone"
-        return None, used_item
-    if "reverse" in dealer_items and total > 1 and live_prob > 0.5:
-        used_item = "reverse"
-        return None, used_item
-    
-    if live == 0:
-        return "self", None
-    if blank == 0:
-        return "player", None
-    return "player" if random.random() < live_prob else "self", None
+def is_idle(state_map, key, ttl):
+    seen = state_map.last_access(key)
+    return seen is not None and time.monotonic() - seen >= ttl
+
+def game_chats(game_state):
+    return [p.id for p in game_state.players if game_states.peek(p.id) is game_state]
+
+def game_is_idle(chat_ids):
+    return bool(chat_ids) and all(is_idle(game_states, chat_id, GAME_IDLE_TTL) for chat_id in chat_ids)
+
+async def expire_game(context, game_state):
+    # Обработчик с ходом дилера держит замок игры, пока ход не кончится,
+    # поэтому зависший ход прерываем до того, как ждать замок
+    dealer_cancelled = game_is_idle(game_chats(game_state)) and cancel_dealer_turn(game_state.game_id)
+    async with game_locks(("game", game_state.game_id)):
+        chat_ids = game_chats(game_state)
+        # Пока ждали замок, кто-то мог сделать ход. Но прерванный ход дилера
+        # уже не продолжить, так что такую игру убираем всё равно
+        if not chat_ids or not (dealer_cancelled or game_is_idle(chat_ids)):
+            return False
+        game_state.game_active = False
+        cancel_dealer_turn(game_state.game_id)
+        for chat_id in chat_ids:
+            del game_states[chat_id]
+            user_data = context.application.user_data.get(chat_id)
+            if user_data:
+                user_data.pop("pending_knife", None)
+                user_data.pop("phone_cartridge", None)
+        pacer.cancel(game_state.game_id)
+        turn_buffers.pop(game_state.game_id, None)
+        forget_game(game_state.game_id, len(game_state.players))
+    await broadcast(outbound(context), [
+        (chat_id, "Игра завершена из-за бездействия. Начните новую с /start.", dict(reply_markup=ReplyKeyboardRemove()))
+        for chat_id in chat_ids
+    ])
+    return True
+
+async def expire_room(context, code):
+    async with game_locks(("room", code)):
+        if code not in multiplayer_games or not is_idle(multiplayer_games, code, ROOM_IDLE_TTL):
+            return False
+        room = multiplayer_games.peek(code)
+        del multiplayer_games[code]
+        chat_ids = []
+        for player in room["players"]:
+            if player["kicked"]:
+                continue
+            lobby_state = lobby_states.peek(player["id"])
+            if lobby_state and lobby_state["game_code"] == code:
+                del lobby_states[player["id"]]
+            chat_ids.append(player["id"])
+    await broadcast(outbound(context), [
+        (chat_id, f"Комната {code} закрыта из-за бездействия. Начните заново с /start.", dict(reply_markup=ReplyKeyboardRemove()))
+        for chat_id in chat_ids
+    ])
+    return True
+
+async def expire_lobby(chat_id):
+    async with game_locks(("chat", chat_id)):
+        lobby_state = lobby_states.peek(chat_id)
+        if lobby_state is None or not is_idle(lobby_states, chat_id, LOBBY_IDLE_TTL):
+            return False
+        # Лобби комнаты живёт, пока жива сама комната
+        if lobby_state["mode"] == "room" and lobby_state["game_code"] in multiplayer_games:
+            return False
+        del lobby_states[chat_id]
+        return True
+
+async def sweep_idle(context):
+    # Уборка брошенных игр, комнат и лобби (запускается из JobQueue)
+    started = time.perf_counter()
+    now = time.monotonic()
+    games = {}
+    for chat_id in game_states.idle_keys(GAME_IDLE_TTL, now):
+        game_state = game_states.peek(chat_id)
+        games[id(game_state)] = game_state
+    evicted_games = evicted_rooms = evicted_lobbies = 0
+    for game_state in games.values():
+        try:
+            evicted_games += await expire_game(context, game_state)
+        except Exception as e:
+            logger.error(f"Failed to expire game {game_state.game_id}: {e}", exc_info=True)
+    for code in multiplayer_games.idle_keys(ROOM_IDLE_TTL, now):
+        try:
+            evicted_rooms += await expire_room(context, code)
+        except Exception as e:
+            logger.error(f"Failed to expire room {code}: {e}", exc_info=True)
+    for chat_id in lobby_states.idle_keys(LOBBY_IDLE_TTL, now):
+        try:
+            evicted_lobbies += await expire_lobby(chat_id)
+        except Exception as e:
+            logger.error(f"Failed to expire lobby {chat_id}: {e}", exc_info=True)
+    sweep_stats["sweeps"] += 1
+    sweep_stats["games_evicted"] += evicted_games
+    sweep_stats["rooms_evicted"] += evicted_rooms
+    sweep_stats["lobbies_evicted"] += evicted_lobbies
+    if evicted_games or evicted_rooms or evicted_lobbies:
+        logger.info(
+            f"Idle sweep: evicted {evicted_games} games, {evicted_rooms} rooms, {evicted_lobbies} lobbies; "
+            f"live: {len(game_states)} game keys, {len(multiplayer_games)} rooms, {len(lobby_states)} lobbies "
+            f"({(time.perf_counter() - started) * 1000:.1f} ms)"
+        )
+
+async def on_startup(application):
+    if METRICS_PORT:
+        port = METRICS_PORT + (SHARD[0] if SHARD else 0)
+        application.bot_data["metrics_server"] = await metrics.serve(METRICS_HOST, port)
+
+async def on_shutdown(application):
+    server = application.bot_data.pop("metrics_server", None)
+    if server:
+        server.close()
+    for game_id in list(dealer_turns):
+        cancel_dealer_turn(game_id)
+    outbox = application.bot_data.pop("outbox", None)
+    if outbox:
+        logger.info(f"Outbound queue stats: {outbox.stats()}")
+        await outbox.close()
+    logger.info(f"Idle sweeper stats: {sweep_stats}")
+    logger.info(f"Dealer turn stats: {dealer_stats}")
+    logger.info(f"Broadcast fan-out stats: {fanout_stats.snapshot()}")
+    if profile_stats:
+        logger.info(f"Update profile stats: {profile_stats}")
+    store.close()
+    event_log.stop()
+
+def build_application(token=BOT_TOKEN, base_url=None):
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(True)
+        .request(metrics.metered_request(connection_pool_size=256))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    application.bot_data["outbox"] = OutboundQueue(application.bot)
+    event_path = shard_path(EVENT_LOG_PATH, SHARD[0]) if EVENT_LOG_PATH and SHARD else EVENT_LOG_PATH
+    event_log.start(event_path, EVENT_LOG_MAX_BYTES, EVENT_LOG_BACKUPS, EVENT_LOG_BATCH)
+    engine.DEALER_AI = DEALER_MODE
+    if DEALER_MODE == "table":
+        dealer_table.load_table(DEALER_TABLE_PATH)
+        logger.info(f"Dealer table loaded from {DEALER_TABLE_PATH}")
+    if application.job_queue:
+        application.job_queue.run_repeating(sweep_idle, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
+    else:
+        logger.warning("JobQueue is not available (pip install \"python-telegram-bot[job-queue]\"), idle sweeper is disabled")
+    
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, route_message))
+    application.add_handler(CallbackQueryHandler(kick_player, pattern="kick_.*"))
+    application.add_handler(CallbackQueryHandler(view_cartridge, pattern="view_cartridge"))
+    if PROFILE_UPDATES:
+        profile_handlers(application, PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_KEEP)
+    return application
 
 def main():
     try:
-        application = Application.builder().token("TokenTgBota").build()
-        
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND,
-            lambda u, c: handle_lobby_action(u, c) if u.effective_chat.id in lobby_states else handle_game_action(u, c)
-        ))
-        application.add_handler(CallbackQueryHandler(kick_player, pattern="kick_.*"))
-        application.add_handler(CallbackQueryHandler(view_cartridge, pattern="view_cartridge"))
-        
-        logger.info("Starting bot polling...")
-        application.run_polling()
+        application = build_application()
+        if RUN_MODE == "webhook":
+            # Нужен python-telegram-bot[webhooks]; Telegram шлёт апдейты на WEBHOOK_URL
+            logger.info(f"Starting bot webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET
+            )
+        elif RUN_MODE == "polling":
+            logger.info("Starting bot polling...")
+            application.run_polling()
+        else:
+            raise ValueError(f"Unknown run mode: {RUN_MODE}")
     except Exception as e:
         logger.error(f"Bot crashed: {e}", exc_info=True)
         raise
@@ -0,0 +1,300 @@
+# Шардирование: диспетчер получает апдейты и раздаёт их N процессам-воркерам,
+# в каждом — обычный бот из roulet.py со своим состоянием. Ключ — чат:
+# одиночная игра и лобби живут на воркере игрока, комната — на воркере
+# создателя (код комнаты сам указывает на воркер, см. generate_game_code).
+# Когда игрок вводит код чужой комнаты, его лобби переезжает к комнате,
+# и дальше все его апдейты идут туда. Закрепление снимается, когда у игрока
+# на том воркере не остаётся ни лобби, ни игры; закрепления хранятся в том же
+# хранилище, что и состояние (STORAGE_BACKEND), в отдельном файле диспетчера.
+#
+#   python shard.py --workers 4
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import zlib
+
+logger = logging.getLogger(__name__)
+
+ROOM_CODE = re.compile(r"^[A-Z0-9]{6}$")
+
+# Как часто воркер сообщает о гостях, у которых не осталось состояния (секунды)
+RELEASE_INTERVAL = 10
+# Сколько ждать остановки воркера, прежде чем завершить его принудительно
+STOP_TIMEOUT = 10
+
+
+def shard_of(key, count):
+    # Стабильно между процессами (hash() для строк в каждом процессе свой)
+    return zlib.crc32(str(key).encode()) % count
+
+
+def update_chat_id(data):
+    for field in ("message", "edited_message"):
+        if field in data:
+            return data[field]["chat"]["id"]
+    if "callback_query" in data:
+        query = data["callback_query"]
+        message = query.get("message")
+        return message["chat"]["id"] if message else query["from"]["id"]
+    return None
+
+
+def room_code(data):
+    # Текст, похожий на код комнаты
+    text = data.get("message", {}).get("text", "").strip().upper()
+    return text if ROOM_CODE.match(text) else None
+
+
+def shard_path(path, index):
+    base, ext = os.path.splitext(path)
+    return f"{base}-{index}{ext}"
+
+
+def run_worker(index, count, token, base_url, rate_limits, release_interval, log_level, inbox, replies, released):
+    # Ctrl+C получает вся группа процессов: воркер ждёт "stop" от диспетчера,
+    # чтобы доделать начатые апдейты, а не падать посреди них
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import roulet
+    if log_level is not None:
+        logging.getLogger().setLevel(log_level)
+    roulet.SHARD = (index, count)
+    if roulet.STORAGE_BACKEND == "sqlite":
+        roulet.store.close()
+        roulet.open_state(shard_path(roulet.STORAGE_PATH, index))
+    if roulet.GAME_LOG_PATH:
+        roulet.GAME_LOG_PATH = shard_path(roulet.GAME_LOG_PATH, index)
+    application = roulet.build_application(token, base_url)
+    if not rate_limits:
+        # Для бенчмарка: отправка сразу, без лимитов Telegram
+        application.bot_data.pop("outbox")
+    asyncio.run(worker_loop(roulet, application, index, count, release_interval, inbox, replies, released))
+
+
+async def worker_loop(roulet, application, index, count, release_interval, inbox, replies, released):
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    loop = asyncio.get_running_loop()
+    guests = {}  # чат с чужого воркера, переехавший сюда -> сколько его апдейтов обработано
+
+    async def count_guest_update(update, context):
+        # Группа 1 идёт после обработчиков бота: апдейт уже обработан
+        chat = update.effective_chat or update.effective_user
+        if chat is not None and chat.id in guests:
+            guests[chat.id] += 1
+
+    async def report_released():
+        # Гость без лобби и игры здесь может вернуться на свой воркер. Вместе
+        # с чатом отправляем число обработанных апдейтов: диспетчер снимет
+        # закрепление, только если с тех пор ничего нового гостю не отправил
+        while True:
+            await asyncio.sleep(release_interval)
+            for chat_id, done in guests.items():
+                if chat_id not in roulet.lobby_states and chat_id not in roulet.game_states:
+                    released.put((chat_id, index, done))
+
+    application.add_handler(TypeHandler(Update, count_guest_update), group=1)
+    # Тот же порядок, что у run_polling: post_init и post_shutdown сами не вызываются
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        reporter = asyncio.create_task(report_released())
+        logger.info(f"Shard worker {index} started")
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            kind = message[0]
+            if kind == "update":
+                await application.update_queue.put(Update.de_json(message[1], application.bot))
+            elif kind == "handover":
+                # Отдаём лобби игрока, только если он как раз вводит код комнаты
+                chat_id = message[1]
+                async with roulet.game_locks(("chat", chat_id)):
+                    lobby_state = roulet.lobby_states.get(chat_id)
+                    if lobby_state is not None and lobby_state["action"] == "join":
+                        del roulet.lobby_states[chat_id]
+                        guests.pop(chat_id, None)
+                    else:
+                        lobby_state = None
+                replies.put((chat_id, lobby_state))
+            elif kind == "adopt":
+                _, chat_id, lobby_state = message
+                roulet.lobby_states[chat_id] = lobby_state
+                if shard_of(chat_id, count) != index:
+                    guests[chat_id] = 0
+            elif kind == "guests":
+                # Закрепления, восстановленные диспетчером после перезапуска
+                guests.update(dict.fromkeys(message[1], 0))
+            elif kind == "forget":
+                guests.pop(message[1], None)
+            elif kind == "stop":
+                break
+        reporter.cancel()
+        # Дожидается апдейтов, уже переданных боту, потом отложенных сообщений
+        await application.stop()
+        try:
+            await asyncio.wait_for(roulet.pacer.join_all(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shard worker {index} dropped paced messages on shutdown")
+    await application.post_shutdown(application)
+    logger.info(f"Shard worker {index} stopped")
+
+
+class Dispatcher:
+    def __init__(self, count, token, base_url=None, rate_limits=True, storage_backend="memory", storage_path=None,
+                 release_interval=RELEASE_INTERVAL, log_level=None):
+        from storage import open_store
+        self.count = count
+        self.token = token
+        self.base_url = base_url
+        context = multiprocessing.get_context("spawn")
+        self.inboxes = [context.Queue() for _ in range(count)]
+        self.replies = context.Queue()
+        self.released = context.Queue()
+        self.processes = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    index, count, token, base_url, rate_limits, release_interval, log_level,
+                    self.inboxes[index], self.replies, self.released
+                ),
+                name=f"shard-{index}",
+                daemon=True
+            )
+            for index in range(count)
+        ]
+        self.store = open_store(storage_backend, storage_path)
+        self.pins = self.store.map("shard_pins")  # чат -> воркер, если игрок переехал в чужую комнату
+        for chat_id in list(self.pins):
+            # Воркеров стало меньше или чат теперь и так попадает на свой воркер
+            shard = self.pins.peek(chat_id)
+            if shard >= count or shard == shard_of(chat_id, count):
+                del self.pins[chat_id]
+        # Сколько апдейтов ушло закреплённому чату (с переезда или запуска)
+        self.pin_updates = dict.fromkeys(self.pins, 0)
+        self.stats = {"updates": [0] * count, "migrations": 0, "handovers_refused": 0, "pins_released": 0}
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        for index, inbox in enumerate(self.inboxes):
+            guests = [chat_id for chat_id in self.pins if self.pins.peek(chat_id) == index]
+            if guests:
+                inbox.put(("guests", guests))
+        return self
+
+    def join_workers(self):
+        for process in self.processes:
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Shard worker {process.name} did not stop in {STOP_TIMEOUT} s, terminating it")
+                process.terminate()
+
+    async def stop(self):
+        # Воркеры дописывают начатое и могут ещё слать запросы в Bot API
+        # (в бенчмарке — в заглушку в этом же цикле), так что ждём их в потоке
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+        await asyncio.get_running_loop().run_in_executor(None, self.join_workers)
+        self.collect_released()
+        self.store.close()
+        logger.info(f"Shard dispatcher stats: {self.stats}, pinned chats: {len(self.pins)}")
+
+    def shard_for(self, chat_id):
+        shard = self.pins.peek(chat_id)
+        return shard_of(chat_id, self.count) if shard is None else shard
+
+    def unpin(self, chat_id):
+        if chat_id in self.pins:
+            del self.pins[chat_id]
+        self.pin_updates.pop(chat_id, None)
+
+    def collect_released(self):
+        # Воркеры присылают гостей, у которых не осталось состояния. Если с тех
+        # пор гостю ничего не ушло, он возвращается на свой воркер
+        while True:
+            try:
+                chat_id, shard, done = self.released.get_nowait()
+            except queue.Empty:
+                return
+            if self.pins.peek(chat_id) == shard and self.pin_updates.get(chat_id) == done:
+                self.unpin(chat_id)
+                self.inboxes[shard].put(("forget", chat_id))
+                self.stats["pins_released"] += 1
+
+    async def migrate(self, chat_id, source, target):
+        # Забираем лобби у старого воркера и отдаём новому. Пока ждём ответ,
+        # диспетчер больше ничего не раздаёт, так что порядок апдейтов сохраняется
+        self.inboxes[source].put(("handover", chat_id))
+        _, lobby_state = await asyncio.get_running_loop().run_in_executor(None, self.replies.get)
+        if lobby_state is None:
+            self.stats["handovers_refused"] += 1
+            return False
+        self.inboxes[target].put(("adopt", chat_id, lobby_state))
+        if target == shard_of(chat_id, self.count):
+            self.unpin(chat_id)  # комната на своём воркере — закрепление больше не нужно
+        else:
+            self.pins[chat_id] = target
+            self.pin_updates[chat_id] = 0
+        self.stats["migrations"] += 1
+        return True
+
+    async def dispatch(self, data):
+        self.collect_released()
+        chat_id = update_chat_id(data)
+        shard = 0 if chat_id is None else self.shard_for(chat_id)
+        code = room_code(data) if chat_id is not None else None
+        if code:
+            target = shard_of(code, self.count)
+            if target != shard and await self.migrate(chat_id, shard, target):
+                shard = target
+        if chat_id in self.pin_updates:
+            self.pin_updates[chat_id] += 1
+        self.stats["updates"][shard] += 1
+        self.inboxes[shard].put(("update", data))
+
+
+async def poll(dispatcher):
+    # Источник апдейтов — getUpdates, как у run_polling, но без разбора апдейтов
+    from telegram import Bot
+    offset = None
+    bot = Bot(dispatcher.token, base_url=dispatcher.base_url) if dispatcher.base_url else Bot(dispatcher.token)
+    async with bot:
+        while True:
+            updates = await bot.get_updates(offset=offset, timeout=30)
+            for update in updates:
+                offset = update.update_id + 1
+                await dispatcher.dispatch(update.to_dict())
+            dispatcher.collect_released()
+
+
+async def serve(dispatcher):
+    try:
+        await poll(dispatcher)
+    finally:
+        await dispatcher.stop()
+
+
+def main():
+    import roulet
+    parser = argparse.ArgumentParser(description="Бот на нескольких процессах")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    dispatcher = Dispatcher(
+        args.workers, roulet.BOT_TOKEN,
+        storage_backend=roulet.STORAGE_BACKEND,
+        storage_path=shard_path(roulet.STORAGE_PATH, "pins")
+    ).start()
+    logger.info(f"Starting sharded bot polling with {args.workers} workers...")
+    try:
+        asyncio.run(serve(dispatcher))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Монте-Карло для балансировки: одиночные игры на engine.py между дилером
+# и выбранной стратегией игрока, пачками в пуле процессов.
+#
+#   python simulate.py --games 1000000 --policy cautious --workers 8
+#   python simulate.py --games 200000 --live-chance 0.5 --policy random
+#   python simulate.py --games 2000 --dealer hard
+import argparse
+import math
+import multiprocessing
+import random
+import time
+
+import engine
+import dealer_table
+from engine import new_single_game, player_action, dealer_step
+from model import ITEM_IDS, PLAYER, DEALER, MAX_LIVES
+
+
+def policy_random(game_state, known, rng):
+    items = game_state.players[PLAYER].item_list()
+    return rng.choice(["dealer", "self"] + items)
+
+
+def policy_aggressive(game_state, known, rng):
+    # Всегда стреляет в дилера, предметы не трогает
+    return "dealer"
+
+
+def policy_cautious(game_state, known, rng):
+    # Пользуется предметами и стреляет по вероятности
+    player = game_state.players[PLAYER]
+    dealer = game_state.players[DEALER]
+    magazine = game_state.magazine
+    if known is not None:
+        if known and game_state.damage == 1 and player.has_item("knife"):
+            return "knife"
+        return "dealer" if known else "self"
+    live_prob = magazine.live / len(magazine)
+    if player.has_item("cigarettes") and player.lives < MAX_LIVES:
+        return "cigarettes"
+    if player.has_item("magnifier") and 0 < live_prob < 1:
+        return "magnifier"
+    if player.has_item("handcuffs") and not dealer.handcuffed and len(magazine) > 1:
+        return "handcuffs"
+    if player.has_item("beer") and live_prob < 0.5 and len(magazine) > 1:
+        return "beer"
+    if live_prob >= 0.5:
+        if player.has_item("knife") and game_state.damage == 1:
+            return "knife"
+        return "dealer"
+    return "self"
+
+
+POLICIES = {
+    "random": policy_random,
+    "aggressive": policy_aggressive,
+    "cautious": policy_cautious,
+}
+
+
+def new_stats():
+    return {
+        "games": 0,
+        "wins": 0,
+        "steps": 0,
+        "steps_sq": 0,
+        "rounds": 0,
+        "items": {PLAYER: dict.fromkeys(ITEM_IDS, 0), DEALER: dict.fromkeys(ITEM_IDS, 0)},
+        "shots": {PLAYER: 0, DEALER: 0},
+        "live_shots": {PLAYER: 0, DEALER: 0},
+    }
+
+
+def merge_stats(total, part):
+    for key in ("games", "wins", "steps", "steps_sq", "rounds"):
+        total[key] += part[key]
+    for seat in (PLAYER, DEALER):
+        for item, count in part["items"][seat].items():
+            total["items"][seat][item] += count
+        total["shots"][seat] += part["shots"][seat]
+        total["live_shots"][seat] += part["live_shots"][seat]
+
+
+def play_game(policy, rng, stats):
+    game_state = new_single_game(1, "Игрок", "Игрок", rng)
+    known = None  # что игрок знает о следующем патроне (лупа)
+    steps = 0
+    while game_state.game_active:
+        if game_state.current_turn == PLAYER:
+            events = player_action(game_state, policy(game_state, known, rng), rng)
+        else:
+            events = dealer_step(game_state, rng)
+            known = None
+        steps += 1
+        for event in events:
+            kind = event[0]
+            if kind == "item":
+                stats["items"][event[1]][event[2]] += 1
+                if event[1] == PLAYER:
+                    if event[2] == "magnifier":
+                        known = event[3]
+                    elif event[2] == "reverse" and known is not None:
+                        known = not known
+                    elif event[2] == "beer":
+                        known = None
+            elif kind == "shot":
+                stats["shots"][event[1]] += 1
+                stats["live_shots"][event[1]] += event[3]
+                known = None
+            elif kind == "new_round":
+                known = None
+            elif kind == "invalid":
+                raise RuntimeError(f"Policy made an invalid move: {event}")
+    stats["games"] += 1
+    stats["wins"] += game_state.players[PLAYER].lives > 0
+    stats["steps"] += steps
+    stats["steps_sq"] += steps * steps
+    stats["rounds"] += game_state.round_number
+
+
+def run_batch(job):
+    policy_name, games, seed, live_chance, dealer, table_path = job
+    engine.LIVE_CHANCE = live_chance
+    engine.DEALER_AI = dealer
+    if dealer == "table" and dealer_table.table is None:
+        dealer_table.load_table(table_path)
+    rng = random.Random(seed)
+    policy = POLICIES[policy_name]
+    stats = new_stats()
+    for _ in range(games):
+        play_game(policy, rng, stats)
+    return stats
+
+
+def wilson_interval(successes, n, z=1.96):
+    if n == 0:
+        return 0.0, 0.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return center - margin, center + margin
+
+
+def report(stats, elapsed, args):
+    n = stats["games"]
+    win_rate = stats["wins"] / n
+    low, high = wilson_interval(stats["wins"], n)
+    mean_steps = stats["steps"] / n
+    var_steps = max(0.0, stats["steps_sq"] / n - mean_steps * mean_steps)
+    steps_margin = 1.96 * math.sqrt(var_steps / n)
+
+    print(f"Стратегия: {args.policy}, дилер: {args.dealer}, шанс боевого: {args.live_chance}, игр: {n} за {elapsed:.1f} с ({n / elapsed * 60:,.0f} в минуту)")
+    print(f"Победы игрока: {100 * win_rate:.2f}% (95% ДИ {100 * low:.2f}–{100 * high:.2f}%)")
+    print(f"Длина игры: {mean_steps:.2f} ± {steps_margin:.2f} ходов, {stats['rounds'] / n:.2f} раундов")
+    for seat, who in ((PLAYER, "игрок"), (DEALER, "дилер")):
+        shots = stats["shots"][seat]
+        live_share = 100 * stats["live_shots"][seat] / shots if shots else 0
+        print(f"Выстрелы ({who}): {shots / n:.2f} за игру, боевых {live_share:.1f}%")
+    print("Предметы за игру:   игрок   дилер")
+    for item in ITEM_IDS:
+        print(f"  {item:<12} {stats['items'][PLAYER][item] / n:9.3f} {stats['items'][DEALER][item] / n:7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Монте-Карло одиночных игр против дилера")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="cautious")
+    parser.add_argument("--live-chance", type=float, default=engine.LIVE_CHANCE)
+    parser.add_argument("--dealer", choices=["basic", "hard", "table"], default=engine.DEALER_AI)
+    parser.add_argument("--table", default=dealer_table.TABLE_PATH, help="таблица для --dealer table")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--batch", type=int, default=5000, help="игр в одной пачке")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.dealer == "table":
+        try:
+            dealer_table.load_table(args.table)
+        except FileNotFoundError:
+            parser.error(f"dealer table {args.table} not found, build it with: python dealer_table.py {args.table}")
+        except ValueError as e:
+            parser.error(str(e))
+
+    jobs = []
+    remaining = args.games
+    while remaining > 0:
+        size = min(args.batch, remaining)
+        jobs.append((args.policy, size, args.seed * 1000003 + len(jobs), args.live_chance, args.dealer, args.table))
+        remaining -= size
+
+    stats = new_stats()
+    started = time.perf_counter()
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            for part in pool.imap_unordered(run_batch, jobs):
+                merge_stats(stats, part)
+    else:
+        for job in jobs:
+            merge_stats(stats, run_batch(job))
+    report(stats, time.perf_counter() - started, args)
+
+
+if __name__ == "__main__":
+    main()
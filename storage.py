@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+import time
+from collections.abc import MutableMapping
+
+logger = logging.getLogger(__name__)
+
+# Как часто сбрасывать изменения на диск (миллисекунды)
+FLUSH_INTERVAL_MS = 200
+
+
+class MemoryBackend:
+    # Ничего не сохраняет: поведение как у обычных словарей
+    def load(self, namespace):
+        return {}
+
+    def write(self, batch):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.conn.commit()
+
+    def load(self, namespace):
+        rows = self.conn.execute("SELECT key, value FROM state WHERE namespace = ?", (namespace,))
+        return {json.loads(key): pickle.loads(value) for key, value in rows}
+
+    def write(self, batch):
+        # batch — список (namespace, key, value); value=None означает удаление
+        upserts = [(ns, json.dumps(key), value) for ns, key, value in batch if value is not None]
+        deletes = [(ns, json.dumps(key)) for ns, key, value in batch if value is None]
+        with self.conn:
+            if upserts:
+                self.conn.executemany(
+                    "INSERT INTO state (namespace, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+                    upserts
+                )
+            if deletes:
+                self.conn.executemany("DELETE FROM state WHERE namespace = ? AND key = ?", deletes)
+
+    def close(self):
+        self.conn.close()
+
+
+class StateMap(MutableMapping):
+    # Словарь, который помечает ключи изменёнными при каждом обращении (значения
+    # меняются на месте) и отдаёт их хранилищу при очередном сбросе.
+    # shared_key — для значений, на которые ссылаются несколько ключей (одна
+    # мультиплеерная игра у всех игроков): такое значение хранится один раз.
+    def __init__(self, store, namespace, shared_key=None):
+        self.store = store
+        self.namespace = namespace
+        self.shared_key = shared_key
+        self._data = {}
+        self._dirty = set()
+        self._deleted = set()
+        self._deleted_shared = set()
+        self._refs = {}
+        if shared_key:
+            shared = store.backend.load(f"{namespace}:shared")
+            for key, ref in store.backend.load(namespace).items():
+                if ref in shared:
+                    self._data[key] = shared[ref]
+                    self._refs.setdefault(ref, set()).add(key)
+        else:
+            self._data = store.backend.load(namespace)
+        # Время последнего обращения к ключу (для уборки брошенных игр)
+        self._seen = dict.fromkeys(self._data, time.monotonic())
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        self._seen[key] = time.monotonic()
+        if self.store.persistent:
+            self._dirty.add(key)
+            self.store.schedule_flush()
+        return value
+
+    def __setitem__(self, key, value):
+        if self.shared_key and key in self._data:
+            self._unref(key)
+        self._data[key] = value
+        self._seen[key] = time.monotonic()
+        if self.shared_key:
+            ref = self.shared_key(value)
+            self._refs.setdefault(ref, set()).add(key)
+            self._deleted_shared.discard(ref)
+        if self.store.persistent:
+            self._dirty.add(key)
+            self._deleted.discard(key)
+            self.store.schedule_flush()
+
+    def __delitem__(self, key):
+        if self.shared_key:
+            self._unref(key)
+        del self._data[key]
+        self._seen.pop(key, None)
+        if self.store.persistent:
+            self._dirty.discard(key)
+            self._deleted.add(key)
+            self.store.schedule_flush()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def touch(self, key):
+        if key in self._data:
+            self._seen[key] = time.monotonic()
+        if self.store.persistent and key in self._data:
+            self._dirty.add(key)
+            self.store.schedule_flush()
+
+    def peek(self, key, default=None):
+        # Чтение без отметки об обращении
+        return self._data.get(key, default)
+
+    def last_access(self, key):
+        return self._seen.get(key)
+
+    def idle_keys(self, ttl, now=None):
+        # Ключи, к которым не обращались дольше ttl секунд. Общее значение
+        # простаивает, только если простаивают все ссылающиеся на него ключи.
+        if now is None:
+            now = time.monotonic()
+        deadline = now - ttl
+        idle = [key for key, seen in self._seen.items() if seen <= deadline]
+        if self.shared_key:
+            idle = [
+                key for key in idle
+                if all(self._seen[other] <= deadline for other in self._refs.get(self.shared_key(self._data[key]), ()))
+            ]
+        return idle
+
+    def _unref(self, key):
+        ref = self.shared_key(self._data[key])
+        keys = self._refs.get(ref)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._refs[ref]
+                if self.store.persistent:
+                    self._deleted_shared.add(ref)
+
+    def collect(self):
+        # Снимок изменений для записи: сериализуем сразу, пока состояние согласовано
+        batch = []
+        shared_done = set()
+        for key in self._dirty:
+            value = self._data[key]
+            if self.shared_key:
+                ref = self.shared_key(value)
+                batch.append((self.namespace, key, pickle.dumps(ref)))
+                if ref not in shared_done:
+                    shared_done.add(ref)
+                    batch.append((f"{self.namespace}:shared", ref, pickle.dumps(value)))
+            else:
+                batch.append((self.namespace, key, pickle.dumps(value)))
+        for key in self._deleted:
+            batch.append((self.namespace, key, None))
+        for ref in self._deleted_shared:
+            batch.append((f"{self.namespace}:shared", ref, None))
+        self._dirty.clear()
+        self._deleted.clear()
+        self._deleted_shared.clear()
+        return batch
+
+    def has_changes(self):
+        return bool(self._dirty or self._deleted or self._deleted_shared)
+
+
+class StateStore:
+    def __init__(self, backend, flush_interval_ms=FLUSH_INTERVAL_MS):
+        self.backend = backend
+        self.persistent = not isinstance(backend, MemoryBackend)
+        self.flush_interval = flush_interval_ms / 1000
+        self.maps = []
+        self.flushes = 0
+        self.rows_written = 0
+        self._flush_task = None
+
+    def map(self, namespace, shared_key=None):
+        state_map = StateMap(self, namespace, shared_key)
+        self.maps.append(state_map)
+        return state_map
+
+    def schedule_flush(self):
+        if not self.persistent or self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+            batch = self._collect()
+            if batch:
+                # Запись на диск — в отдельном потоке, чтобы не блокировать бота
+                await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            logger.error(f"State flush failed: {e}", exc_info=True)
+        finally:
+            self._flush_task = None
+            if any(state_map.has_changes() for state_map in self.maps):
+                self.schedule_flush()
+
+    def _collect(self):
+        batch = []
+        for state_map in self.maps:
+            batch.extend(state_map.collect())
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        self.backend.write(batch)
+        self.flushes += 1
+        self.rows_written += len(batch)
+        logger.debug(f"Flushed {len(batch)} state rows in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def flush(self):
+        # Синхронный сброс всего накопленного (например, при остановке бота)
+        batch = self._collect()
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+        self.backend.close()
+
+
+def open_store(backend="memory", path="buckshot.db", flush_interval_ms=FLUSH_INTERVAL_MS):
+    if backend == "sqlite":
+        return StateStore(SQLiteBackend(path), flush_interval_ms)
+    if backend == "memory":
+        return StateStore(MemoryBackend(), flush_interval_ms)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture
+def bot_state(monkeypatch):
+    # Чистое состояние бота в памяти, без записи games.log
+    import roulet
+    monkeypatch.setattr(roulet, "STORAGE_BACKEND", "memory")
+    monkeypatch.setattr(roulet, "GAME_LOG_PATH", None)
+    roulet.open_state()
+    roulet.turn_buffers.clear()
+    yield roulet
+    roulet.store.close()
@@ -0,0 +1,79 @@
+# Заглушки апдейта и контекста python-telegram-bot для вызова обработчиков
+# roulet.py напрямую, без сети
+import asyncio
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f"player{user_id}"
+        self.first_name = f"Player {user_id}"
+        self.last_name = None
+
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeUpdate:
+    def __init__(self, user_id, text):
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = FakeChat(user_id)
+        self.message = FakeMessage(text)
+
+
+class FakeQuery:
+    def __init__(self, user_id, data):
+        self.from_user = FakeUser(user_id)
+        self.data = data
+        self.answered = 0
+
+    async def answer(self):
+        await asyncio.sleep(0)
+        self.answered += 1
+
+
+class FakeCallbackUpdate:
+    def __init__(self, user_id, data):
+        self.effective_user = FakeUser(user_id)
+        self.effective_chat = FakeChat(user_id)
+        self.callback_query = FakeQuery(user_id, data)
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []  # (chat_id, text, kwargs)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0)
+        self.sent.append((chat_id, text, kwargs))
+
+    def texts(self, chat_id=None):
+        return [text for sent_to, text, _ in self.sent if chat_id is None or sent_to == chat_id]
+
+
+class FakeApplication:
+    def __init__(self):
+        self.user_data = {}
+
+
+class FakeContext:
+    def __init__(self, bot, user_data):
+        self.bot = bot
+        self.bot_data = {}
+        self.user_data = user_data
+        self.application = FakeApplication()
+
+
+def room_players(table, seats):
+    return [
+        {"id": table * 100 + s + 1, "mention": f"[player{table * 100 + s + 1}](tg://user?id={table * 100 + s + 1})",
+         "name": f"player{table * 100 + s + 1}", "kicked": False}
+        for s in range(seats)
+    ]
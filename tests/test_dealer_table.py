@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+import dealer_table
+from engine import dealer_decision, dealer_step, new_single_game, player_action
+from model import DEALER, PLAYER
+
+
+@pytest.fixture(scope="module")
+def table_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("table") / "dealer_table.bin"
+    dealer_table.save_table(dealer_table.build(), path)
+    return path
+
+
+def test_table_matches_rules_in_played_games(table_file, monkeypatch):
+    monkeypatch.setattr(dealer_table, "table", None)
+    dealer_table.load_table(table_file)
+    rng = random.Random(1)
+    checked = 0
+    for _ in range(300):
+        game_state = new_single_game(1, "Игрок", "Игрок", rng)
+        while game_state.game_active:
+            if game_state.current_turn == PLAYER:
+                items = game_state.players[PLAYER].item_list()
+                player_action(game_state, rng.choice(["dealer", "self"] + items), rng)
+                continue
+            dealer = game_state.players[DEALER]
+            if game_state.magazine and not dealer.handcuffed:
+                expected = dealer_decision(game_state.magazine, dealer.item_list(), game_state.players[PLAYER].handcuffed, dealer.lives)
+                assert dealer_table.table_decision(game_state) == expected
+                checked += 1
+            dealer_step(game_state, rng)
+    assert checked > 1000
+
+
+def test_load_table_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_table.bin"
+    path.write_bytes(b"hello")
+    with pytest.raises(ValueError):
+        dealer_table.load_table(path)
@@ -0,0 +1,34 @@
+import asyncio
+
+from fakes import FakeBot, FakeContext, FakeUpdate
+
+
+def test_idle_game_does_not_wait_for_a_stuck_dealer_turn(bot_state, monkeypatch):
+    roulet = bot_state
+    bot = FakeBot()
+    context = FakeContext(bot, {})
+    game_state = roulet.new_single_game(5, "[p](tg://user?id=5)", "p", seed=1)
+    roulet.game_states[5] = game_state
+
+    async def stuck_dealer(update, context, chat_id, game_state):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(roulet, "dealer_turn_loop", stuck_dealer)
+    monkeypatch.setattr(roulet, "GAME_IDLE_TTL", 0)
+
+    async def dealer_turn():
+        # Как в handle_game_action: ход дилера идёт под замком игры
+        async with roulet.game_locks(("game", game_state.game_id)):
+            await roulet.process_dealer_turn(FakeUpdate(5, "В Дилера"), context, 5, game_state)
+
+    async def main():
+        turn = asyncio.create_task(dealer_turn())
+        await asyncio.sleep(0)
+        assert await asyncio.wait_for(roulet.expire_game(context, game_state), 1)
+        await asyncio.wait_for(turn, 1)
+
+    cancelled = roulet.dealer_stats["cancelled"]
+    asyncio.run(main())
+    assert 5 not in roulet.game_states
+    assert roulet.dealer_stats["cancelled"] == cancelled + 1
+    assert "Игра завершена из-за бездействия" in bot.texts(5)[-1]
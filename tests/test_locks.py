@@ -0,0 +1,125 @@
+import asyncio
+import random
+
+from engine import LOG_CODES
+from fakes import FakeBot, FakeCallbackUpdate, FakeContext, FakeUpdate, room_players
+from locks import KeyedLocks
+
+
+def test_same_key_is_serialized_and_lock_is_dropped():
+    locks = KeyedLocks()
+    inside = []
+    overlaps = []
+
+    async def worker(key):
+        async with locks(key):
+            inside.append(key)
+            if inside.count(key) > 1:
+                overlaps.append(key)
+            await asyncio.sleep(0)
+            inside.remove(key)
+
+    async def main():
+        await asyncio.gather(*(worker(i % 3) for i in range(30)))
+
+    asyncio.run(main())
+    assert overlaps == []
+    assert len(locks) == 0
+
+
+def test_different_keys_run_in_parallel():
+    locks = KeyedLocks()
+
+    async def main():
+        entered = asyncio.Event()
+
+        async def first():
+            async with locks("a"):
+                entered.set()
+                await asyncio.sleep(0.05)
+
+        async def second():
+            await entered.wait()
+            assert not locks.locked("b")
+            async with locks("b"):
+                return locks.locked("a")
+
+        results = await asyncio.gather(first(), second())
+        return results[1]
+
+    assert asyncio.run(main()) is True
+
+
+def test_burst_of_presses_is_one_turn_per_press(bot_state):
+    # Игроки десяти столов жмут "В Дилера" по три раза подряд, не дожидаясь
+    # ответа. Ход дилера идёт под замком игры, поэтому каждое следующее
+    # нажатие ждёт его конца и становится новым ходом игрока; без замка оно
+    # попало бы в ход дилера
+    roulet = bot_state
+    rng = random.Random(1)
+    bot = FakeBot()
+    games = {}
+    for chat_id in range(1, 11):
+        games[chat_id] = roulet.game_states[chat_id] = roulet.new_single_game(
+            chat_id, f"[p{chat_id}](tg://user?id={chat_id})", f"p{chat_id}", seed=chat_id
+        )
+
+    async def press(chat_id):
+        await asyncio.sleep(rng.random() * 0.001)
+        await roulet.handle_game_action(FakeUpdate(chat_id, "В Дилера"), FakeContext(bot, {}))
+
+    async def main():
+        presses = [press(chat_id) for chat_id in games for _ in range(3)]
+        rng.shuffle(presses)
+        await asyncio.gather(*presses)
+        for chat_id in games:
+            await roulet.pacer.join(chat_id)
+
+    asyncio.run(main())
+    assert not any(text.startswith("Сейчас ход дилера") for text in bot.texts())
+    for game_state in games.values():
+        assert game_state.game_active
+        assert list(game_state.log).count(LOG_CODES["dealer"]) == 3
+    assert len(roulet.game_locks) == 0
+
+
+def test_double_view_cartridge_press(bot_state):
+    # Второе нажатие приходит, пока первое ждёт ответа: патрон показывается один раз
+    roulet = bot_state
+    bot = FakeBot()
+    user_data = {"phone_cartridge": {"index": 3, "is_live": True}}
+
+    async def main():
+        await asyncio.gather(*(
+            roulet.view_cartridge(FakeCallbackUpdate(7, "view_cartridge"), FakeContext(bot, user_data))
+            for _ in range(2)
+        ))
+
+    asyncio.run(main())
+    assert sorted(bot.texts(7)) == ["3-й патрон — боевой.", "Данные о патроне отсутствуют!"]
+
+
+def test_leave_while_being_kicked(bot_state):
+    # Создатель исключает игрока, пока тот жмёт "Покинуть комнату"
+    roulet = bot_state
+    bot = FakeBot()
+    code = "K00001"
+    players = room_players(0, 2)
+    creator, guest = players[0]["id"], players[1]["id"]
+    roulet.multiplayer_games[code] = {"players": players, "creator_id": creator, "state": None}
+    for player in players:
+        roulet.lobby_states[player["id"]] = {"mode": "room", "action": None, "game_code": code}
+
+    async def main():
+        kick = asyncio.create_task(
+            roulet.kick_player(FakeCallbackUpdate(creator, f"kick_{guest}_{code}"), FakeContext(bot, {}))
+        )
+        while not roulet.game_locks.locked(("room", code)):
+            await asyncio.sleep(0)
+        await asyncio.gather(kick, roulet.route_message(FakeUpdate(guest, "Покинуть комнату"), FakeContext(bot, {})))
+
+    asyncio.run(main())
+    assert guest not in roulet.lobby_states
+    assert roulet.lobby_states[creator]["game_code"] == code
+    assert [p["id"] for p in roulet.multiplayer_games[code]["players"] if not p["kicked"]] == [creator]
+    assert len(roulet.game_locks) == 0
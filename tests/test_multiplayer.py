@@ -0,0 +1,67 @@
+import asyncio
+
+from fakes import FakeBot, FakeContext, FakeUpdate, room_players
+from model import ITEM_IDS, ITEM_LABELS, Magazine
+
+
+def start_game(roulet, bot, seats=2):
+    players = room_players(1, seats)
+    roulet.multiplayer_games["ADREN1"] = {"players": players, "creator_id": players[0]["id"], "state": None}
+    creator = players[0]["id"]
+    asyncio.run(roulet.start_multiplayer_game(FakeUpdate(creator, "Начать игру"), FakeContext(bot, {}), "ADREN1", players))
+    game_state = roulet.game_states[creator]
+    for player in game_state.players:
+        player.items[:] = bytes(len(ITEM_IDS))
+    return game_state
+
+
+def test_adrenaline_applies_the_stolen_item(bot_state):
+    roulet = bot_state
+    bot = FakeBot()
+    game_state = start_game(roulet, bot)
+    shooter, victim = game_state.players
+    game_state.current_turn = 0
+    game_state.magazine = Magazine.from_list([True, False, True])
+    shooter.give_item("adrenaline")
+    victim.give_item("beer")
+    bot.sent.clear()
+
+    async def main():
+        await roulet.handle_game_action(FakeUpdate(shooter.id, ITEM_LABELS["adrenaline"]), FakeContext(bot, {}))
+        await roulet.pacer.join(game_state.game_id)
+
+    asyncio.run(main())
+    # Пиво украдено и сразу выпито: патрон выброшен, ход остался у игрока
+    assert shooter.item_count() == 0
+    assert victim.item_count() == 0
+    assert game_state.magazine.to_list() == [False, True]
+    assert game_state.current_turn == 0
+    texts = bot.texts(shooter.id)
+    assert not any(text.startswith("Неверное действие") for text in texts)
+    assert any("Ваш ход!" in text for text in texts)
+
+
+def test_players_with_the_same_name_can_be_shot(bot_state):
+    roulet = bot_state
+    bot = FakeBot()
+    game_state = start_game(roulet, bot, seats=3)
+    for player in game_state.players[:2]:
+        player.name = "Alex"
+    game_state.actions = None
+    first, second, third = game_state.players
+    game_state.magazine = Magazine.from_list([True, True, True])
+    lives = first.lives
+
+    async def shoot(seat):
+        game_state.current_turn = seat
+        await roulet.handle_game_action(FakeUpdate(game_state.players[seat].id, "Alex"), FakeContext(bot, {}))
+        await roulet.pacer.join(game_state.game_id)
+
+    # Первый Alex стреляет во второго, а не в себя
+    asyncio.run(shoot(0))
+    assert (first.lives, second.lives) == (lives, lives - 1)
+    # Когда первый Alex выбыл, кнопка "Alex" достаётся второму
+    first.lives = 0
+    asyncio.run(shoot(2))
+    assert second.lives == lives - 2
+    assert not any(text.startswith("Неверн") for text in bot.texts())
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+import profiling
+from profiling import profile_stats, profiled, telegram_wait
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_update_time_is_split_into_compute_telegram_and_other(tmp_path):
+    async def neighbour():
+        # Параллельный апдейт считает, пока наш ждёт: в наши вычисления не идёт
+        for _ in range(10):
+            busy(0.01)
+            await asyncio.sleep(0)
+
+    async def dealer():
+        busy(0.02)
+
+    async def handler():
+        busy(0.02)
+        with telegram_wait():
+            await asyncio.sleep(0.05)
+        await asyncio.create_task(profiling.charged(dealer()))
+        await asyncio.sleep(0.03)
+
+    async def main():
+        await asyncio.gather(profiled(handler, 10000, str(tmp_path), 1)(), neighbour())
+
+    profile_stats.clear()
+    asyncio.run(main())
+    stats = profile_stats["handler"]
+    assert stats["updates"] == 1 and stats["slow"] == 0
+    assert 0.04 <= stats["compute"] < 0.07
+    assert 0.05 <= stats["telegram"] < 0.09 and stats["telegram_calls"] == 1
+    assert stats["wall"] - stats["compute"] - stats["telegram"] >= 0.03
+    profile_stats.clear()
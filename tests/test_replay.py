@@ -0,0 +1,36 @@
+import pytest
+
+import dealer_table
+import engine
+from engine import dealer_step, force_pass, new_single_game, player_action
+from model import PLAYER
+from replay import check_game, game_record, generate_games
+
+
+@pytest.mark.parametrize("dealer", ["basic", "hard", "table"])
+def test_recorded_games_replay_exactly(dealer, tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "DEALER_AI", dealer)
+    if dealer == "table":
+        monkeypatch.setattr(dealer_table, "table", dealer_table.build())
+    path = tmp_path / "games.log"
+    generate_games(path, 30 if dealer == "hard" else 300, seed=1)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == (30 if dealer == "hard" else 300)
+    for line in lines:
+        assert check_game(line) == [], line
+
+
+def test_forced_pass_is_replayed():
+    # Ход дилера, прерванный ограничителем в боте, должен повторяться так же
+    game_state = new_single_game(0, "Игрок", "Игрок", seed=7)
+    forced = 0
+    while game_state.game_active:
+        if game_state.current_turn == PLAYER:
+            player_action(game_state, "dealer")
+        elif forced < 3:
+            force_pass(game_state)
+            forced += 1
+        else:
+            dealer_step(game_state)
+    assert engine.FORCED_PASS in game_state.log
+    assert check_game(game_record(game_state)) == []
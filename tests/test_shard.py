@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from bench.fake_bot_api import message_update
+from shard import Dispatcher, shard_of
+
+
+def crossing_guest(creator, count):
+    guest = creator + 1
+    while shard_of(guest, count) == shard_of(creator, count):
+        guest += 1
+    return guest
+
+
+def room_code_on(shard, count):
+    code = 100000
+    while shard_of(str(code), count) != shard:
+        code += 1
+    return str(code)
+
+
+def drain(inbox):
+    messages = []
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        try:
+            messages.append(inbox.get(timeout=0.05))
+        except Exception:
+            if messages:
+                break
+    return messages
+
+
+def collect_until(dispatcher, done):
+    # Очередь multiprocessing отдаёт сообщение не сразу после put
+    deadline = time.monotonic() + 2
+    while not done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+        dispatcher.collect_released()
+
+
+async def join_room(dispatcher, guest, code):
+    # Воркер гостя отдаёт лобби — ответ кладём заранее вместо процесса
+    dispatcher.replies.put((guest, {"mode": "multiplayer", "action": "join", "game_code": None}))
+    await dispatcher.dispatch(message_update(1, guest, code))
+
+
+def test_guest_is_pinned_and_released_when_nothing_is_in_flight():
+    dispatcher = Dispatcher(2, "123456:TEST")
+    guest = crossing_guest(100000, 2)
+    home, target = shard_of(guest, 2), 1 - shard_of(guest, 2)
+    code = room_code_on(target, 2)
+
+    asyncio.run(join_room(dispatcher, guest, code))
+    assert dispatcher.shard_for(guest) == target
+    assert [message[0] for message in drain(dispatcher.inboxes[target])] == ["adopt", "update"]
+
+    async def press():
+        await dispatcher.dispatch(message_update(2, guest, "Покинуть комнату"))
+
+    asyncio.run(press())
+    # Воркер успел обработать только переезд: отпускать рано
+    dispatcher.released.put((guest, target, 1))
+    time.sleep(0.1)
+    dispatcher.collect_released()
+    assert dispatcher.shard_for(guest) == target
+
+    dispatcher.released.put((guest, target, 2))
+    collect_until(dispatcher, lambda: guest not in dispatcher.pins)
+    assert dispatcher.shard_for(guest) == home
+    assert dispatcher.stats["pins_released"] == 1
+    assert ("forget", guest) in drain(dispatcher.inboxes[target])
+    dispatcher.store.close()
+
+
+def test_pins_survive_restart(tmp_path):
+    path = str(tmp_path / "pins.db")
+    dispatcher = Dispatcher(2, "123456:TEST", storage_backend="sqlite", storage_path=path)
+    guest = crossing_guest(100000, 2)
+    target = 1 - shard_of(guest, 2)
+
+    async def first_run():
+        await join_room(dispatcher, guest, room_code_on(target, 2))
+        dispatcher.store.close()
+
+    asyncio.run(first_run())
+
+    restarted = Dispatcher(2, "123456:TEST", storage_backend="sqlite", storage_path=path)
+    assert restarted.shard_for(guest) == target
+    assert restarted.pin_updates == {guest: 0}
+    restarted.store.close()
+
+    # С одним воркером закрепление теряет смысл
+    single = Dispatcher(1, "123456:TEST", storage_backend="sqlite", storage_path=path)
+    assert len(single.pins) == 0
+    single.store.close()
@@ -0,0 +1,23 @@
+import asyncio
+
+from fakes import FakeBot, FakeContext
+
+
+def test_failed_lobby_does_not_stop_the_sweep(bot_state, monkeypatch):
+    roulet = bot_state
+    for chat_id in (1, 2):
+        roulet.lobby_states[chat_id] = {"mode": "main", "action": None, "game_code": None}
+    monkeypatch.setattr(roulet, "LOBBY_IDLE_TTL", 0)
+    expire_lobby = roulet.expire_lobby
+
+    async def failing_expire_lobby(chat_id):
+        # Например, Forbidden: пользователь заблокировал бота
+        if chat_id == 1:
+            raise RuntimeError("blocked")
+        return await expire_lobby(chat_id)
+
+    monkeypatch.setattr(roulet, "expire_lobby", failing_expire_lobby)
+    evicted = roulet.sweep_stats["lobbies_evicted"]
+    asyncio.run(roulet.sweep_idle(FakeContext(FakeBot(), {})))
+    assert 1 in roulet.lobby_states and 2 not in roulet.lobby_states
+    assert roulet.sweep_stats["lobbies_evicted"] == evicted + 1
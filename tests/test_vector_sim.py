@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+import engine
+import simulate
+import vector_sim
+from model import DEALER
+
+np = pytest.importorskip("numpy")
+
+GAMES = 20000
+
+
+def test_dealer_win_rate_matches_engine(monkeypatch):
+    # Тот же дилер и игрок, который всегда стреляет в дилера: доля побед
+    # дилера в пакетной симуляции должна совпадать с движком
+    monkeypatch.setattr(engine, "DEALER_AI", "basic")
+    stats = simulate.new_stats()
+    rng = random.Random(1)
+    for _ in range(GAMES):
+        simulate.play_game(simulate.policy_aggressive, rng, stats)
+    engine_rate = 1 - stats["wins"] / stats["games"]
+
+    params = {name: np.full(GAMES, value, dtype=float) for name, value in vector_sim.DEFAULT_PARAMS.items()}
+    games = vector_sim.run(params, "aggressive", engine.LIVE_CHANCE, 1)
+    assert not games["active"].any()
+    vector_rate = (games["lives"][:, DEALER] > 0).mean()
+
+    assert abs(engine_rate - vector_rate) < 0.02, (engine_rate, vector_rate)
@@ -0,0 +1,271 @@
+# Пакетная симуляция на NumPy для подбора порогов dealer_decision: тысячи игр
+# хранятся массивами (магазин — битовая маска, жизни, счётчики предметов)
+# и делают ход одновременно. Каждая игра получает свой набор порогов, так что
+# весь перебор вариантов — один прогон.
+#
+#   python vector_sim.py --games 20000
+#   python vector_sim.py --games 20000 --vary knife=0.2,0.3,0.5 --vary magnifier_low=0.2,0.3
+#
+# Игрок здесь предметами не пользуется (копит их, дилер может украсть
+# адреналином): "aggressive" стреляет в дилера, "odds" — по вероятности.
+import argparse
+import itertools
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import engine
+from model import ITEM_INDEX, PLAYER, DEALER, MAX_LIVES
+from simulate import wilson_interval
+
+# Пороги из dealer_decision; каждый можно перебирать через --vary
+DEFAULT_PARAMS = {
+    "handcuffs": 0.5,      # наручники, если шанс боевого выше
+    "beer": 0.5,           # пиво, если шанс боевого выше
+    "magnifier_low": 0.3,  # лупа, если шанс боевого в (low, high)
+    "magnifier_high": 0.7,
+    "knife": 0.3,          # нож, если шанс боевого выше
+    "cigarettes": 2,       # сигареты, если жизней не больше
+    "adrenaline": 0.5,     # адреналин, если шанс боевого выше
+    "reverse": 0.5,        # реверс, если шанс боевого выше
+}
+
+ITEM_COUNT = len(ITEM_INDEX)
+MAX_STEPS = 1000
+
+# Действия дилера в порядке проверки в dealer_decision
+PASS, HANDCUFFS, BEER, MAGNIFIER, KNIFE, CIGARETTES, ADRENALINE, PHONE, REVERSE, SHOOT = range(10)
+ACTION_ITEMS = {
+    HANDCUFFS: ITEM_INDEX["handcuffs"],
+    BEER: ITEM_INDEX["beer"],
+    MAGNIFIER: ITEM_INDEX["magnifier"],
+    KNIFE: ITEM_INDEX["knife"],
+    CIGARETTES: ITEM_INDEX["cigarettes"],
+    ADRENALINE: ITEM_INDEX["adrenaline"],
+    PHONE: ITEM_INDEX["phone"],
+    REVERSE: ITEM_INDEX["reverse"],
+}
+
+
+def new_magazines(rng, n, live_chance):
+    # Как create_cartridges: 4–8 патронов, хотя бы один холостой
+    size = rng.integers(4, 9, n)
+    slots = np.arange(8)
+    shells = (rng.random((n, 8)) < live_chance) & (slots < size[:, None])
+    no_blank = shells.sum(axis=1) == size
+    forced = (rng.random(n) * size).astype(np.int64)
+    shells[no_blank, forced[no_blank]] = False
+    bits = (shells.astype(np.int64) << slots).sum(axis=1)
+    return bits, size.astype(np.int64), shells.sum(axis=1).astype(np.int64)
+
+
+def give_random_item(rng, items, mask, seat):
+    idx = np.nonzero(mask)[0]
+    items[idx, seat, rng.integers(0, ITEM_COUNT, idx.size)] += 1
+
+
+def new_games(rng, n, live_chance):
+    games = {
+        "lives": np.full((n, 2), MAX_LIVES, dtype=np.int64),
+        "items": np.zeros((n, 2, ITEM_COUNT), dtype=np.int64),
+        "cuffed": np.zeros((n, 2), dtype=bool),
+        "turn": np.full(n, PLAYER, dtype=np.int64),
+        "active": np.ones(n, dtype=bool),
+        "steps": np.zeros(n, dtype=np.int64),
+    }
+    games["bits"], games["size"], games["live"] = new_magazines(rng, n, live_chance)
+    # Два разных стартовых предмета у каждого, как create_initial_items
+    for seat in (PLAYER, DEALER):
+        picks = np.argsort(rng.random((n, ITEM_COUNT)), axis=1)[:, :2]
+        np.put_along_axis(games["items"][:, seat, :], picks, 1, axis=1)
+    return games
+
+
+def draw(games, mask):
+    # Снимает следующий патрон в играх из mask, возвращает его (bool)
+    shell = (games["bits"] & 1).astype(bool) & mask
+    games["bits"] = np.where(mask, games["bits"] >> 1, games["bits"])
+    games["size"] -= mask
+    games["live"] -= shell
+    return shell
+
+
+def shoot(games, mask, shooter, target, damage):
+    # shooter/target — массивы мест; холостой в себя оставляет ход
+    shell = draw(games, mask)
+    rows = np.nonzero(mask)[0]
+    games["lives"][rows, target[rows]] -= damage[rows] * shell[rows]
+    keep = mask & ~shell & (target == shooter)
+    switch = mask & ~keep
+    games["turn"] = np.where(switch, 1 - games["turn"], games["turn"])
+
+
+def dealer_choice(games, params, mask, rng):
+    size = games["size"]
+    live_prob = games["live"] / np.maximum(size, 1)
+    has = games["items"][:, DEALER, :] > 0
+    lives = games["lives"][:, DEALER]
+    conditions = [
+        games["cuffed"][:, PLAYER],
+        has[:, ITEM_INDEX["handcuffs"]] & (live_prob > params["handcuffs"]) & (size > 2),
+        has[:, ITEM_INDEX["beer"]] & (size > 1) & (live_prob > params["beer"]),
+        has[:, ITEM_INDEX["magnifier"]] & (params["magnifier_low"] < live_prob) & (live_prob < params["magnifier_high"]) & (size > 1),
+        has[:, ITEM_INDEX["knife"]] & (live_prob > params["knife"]),
+        has[:, ITEM_INDEX["cigarettes"]] & (lives <= params["cigarettes"]) & (lives < MAX_LIVES),
+        has[:, ITEM_INDEX["adrenaline"]] & (live_prob > params["adrenaline"]),
+        has[:, ITEM_INDEX["phone"]] & (size > 2),
+        has[:, ITEM_INDEX["reverse"]] & (size > 1) & (live_prob > params["reverse"]),
+    ]
+    choice = np.select(conditions, range(SHOOT), default=SHOOT)
+    choice[~mask] = -1
+    # Без предметов: в себя, если боевых нет, иначе наугад по вероятности
+    at_player = (games["live"] > 0) & ((games["live"] == size) | (rng.random(len(size)) < live_prob))
+    return choice, at_player
+
+
+def dealer_step(games, params, mask, rng):
+    n = len(mask)
+    dealer = np.full(n, DEALER)
+    one = np.ones(n, dtype=np.int64)
+    choice, at_player = dealer_choice(games, params, mask, rng)
+
+    for action, index in ACTION_ITEMS.items():
+        games["items"][choice == action, DEALER, index] -= 1
+
+    # Предметы без выстрела оставляют ход у дилера
+    games["cuffed"][choice == HANDCUFFS, PLAYER] = True
+    draw(games, choice == BEER)
+    healing = choice == CIGARETTES
+    games["lives"][healing, DEALER] += 1
+    stealing = np.nonzero((choice == ADRENALINE) & (games["items"][:, PLAYER, :].sum(axis=1) > 0))[0]
+    if stealing.size:
+        # Случайный предмет игрока с учётом количества, как rng.choice(item_list())
+        counts = games["items"][stealing, PLAYER, :]
+        cumulative = counts.cumsum(axis=1)
+        pick = (rng.random(stealing.size) * cumulative[:, -1]).astype(np.int64)
+        stolen = (cumulative <= pick[:, None]).sum(axis=1)
+        games["items"][stealing, PLAYER, stolen] -= 1
+        games["items"][stealing, DEALER, stolen] += 1
+    flipping = choice == REVERSE
+    games["bits"] = np.where(flipping, games["bits"] ^ 1, games["bits"])
+    games["live"] += np.where(flipping, 2 * (games["bits"] & 1) - 1, 0)
+
+    # Лупа — стреляет по увиденному, нож — в игрока двойным уроном
+    next_live = (games["bits"] & 1).astype(bool)
+    magnifier = choice == MAGNIFIER
+    knife = choice == KNIFE
+    plain = choice == SHOOT
+    target = np.where(magnifier, np.where(next_live, PLAYER, DEALER), np.where(plain & ~at_player, DEALER, PLAYER))
+    shooting = (magnifier | knife | plain) & (games["size"] > 0)
+    shoot(games, shooting, dealer, target, np.where(knife, 2, one))
+
+    # Пас: ход переходит к игроку (а он в наручниках — и сразу обратно)
+    passing = choice == PASS
+    games["turn"][passing] = PLAYER
+
+
+def player_step(games, mask, policy):
+    n = len(mask)
+    if policy == "aggressive":
+        target = np.full(n, DEALER)
+    else:
+        live_prob = games["live"] / np.maximum(games["size"], 1)
+        target = np.where(live_prob >= 0.5, DEALER, PLAYER)
+    shoot(games, mask, np.full(n, PLAYER), target, np.ones(n, dtype=np.int64))
+
+
+def finish(games, mask, rng, live_chance):
+    # Конец игры, иначе новый раунд для опустевших магазинов
+    lives = games["lives"]
+    over = mask & ((lives[:, PLAYER] <= 0) | (lives[:, DEALER] <= 0))
+    games["active"] &= ~over
+    empty = mask & ~over & (games["size"] == 0)
+    if empty.any():
+        idx = np.nonzero(empty)[0]
+        bits, size, live = new_magazines(rng, idx.size, live_chance)
+        games["bits"][idx] = bits
+        games["size"][idx] = size
+        games["live"][idx] = live
+        for seat in (PLAYER, DEALER):
+            give_random_item(rng, games["items"], empty, seat)
+        games["turn"][idx] = PLAYER
+
+
+def run(params, policy, live_chance, seed):
+    # params: {имя: массив значений на каждую игру}
+    rng = np.random.default_rng(seed)
+    n = len(next(iter(params.values())))
+    games = new_games(rng, n, live_chance)
+    for _ in range(MAX_STEPS):
+        active = games["active"]
+        if not active.any():
+            break
+        games["steps"] += active
+        turn = games["turn"]
+        # Наручники: пропуск хода
+        skipping = active & games["cuffed"][np.arange(n), turn]
+        games["cuffed"][np.nonzero(skipping)[0], turn[skipping]] = False
+        games["turn"] = np.where(skipping, 1 - turn, turn)
+        players = active & ~skipping & (turn == PLAYER)
+        dealers = active & ~skipping & (turn == DEALER)
+        player_step(games, players, policy)
+        dealer_step(games, params, dealers, rng)
+        finish(games, active, rng, live_chance)
+    return games
+
+
+def parse_vary(values):
+    grid = {}
+    for value in values:
+        name, _, options = value.partition("=")
+        if name not in DEFAULT_PARAMS:
+            raise SystemExit(f"Unknown parameter {name!r}, choose from: {', '.join(DEFAULT_PARAMS)}")
+        grid[name] = [float(option) for option in options.split(",")]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный перебор порогов дилера на NumPy")
+    parser.add_argument("--games", type=int, default=20000, help="игр на каждый вариант")
+    parser.add_argument("--vary", action="append", default=[], help="порог=значение,значение,...")
+    parser.add_argument("--player", choices=["aggressive", "odds"], default="odds")
+    parser.add_argument("--live-chance", type=float, default=engine.LIVE_CHANCE)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("vector_sim.py needs NumPy: pip install numpy")
+
+    grid = parse_vary(args.vary)
+    names = list(grid)
+    variants = list(itertools.product(*grid.values())) or [()]
+    params = {}
+    for name, default in DEFAULT_PARAMS.items():
+        column = [dict(zip(names, variant)).get(name, default) for variant in variants]
+        params[name] = np.repeat(np.array(column, dtype=float), args.games)
+
+    started = time.perf_counter()
+    games = run(params, args.player, args.live_chance, args.seed)
+    elapsed = time.perf_counter() - started
+    total = len(variants) * args.games
+    print(f"Вариантов: {len(variants)}, игр: {total} за {elapsed:.1f} с ({total / elapsed * 60:,.0f} в минуту)")
+    if games["active"].any():
+        print(f"Не закончились за {MAX_STEPS} ходов: {int(games['active'].sum())}")
+
+    dealer_won = (games["lives"][:, DEALER] > 0).reshape(len(variants), args.games)
+    steps = games["steps"].reshape(len(variants), args.games)
+    results = []
+    for i, variant in enumerate(variants):
+        wins = int(dealer_won[i].sum())
+        results.append((wins, variant, steps[i].mean()))
+    for wins, variant, mean_steps in sorted(results, reverse=True):
+        low, high = wilson_interval(wins, args.games)
+        label = ", ".join(f"{name}={value:g}" for name, value in zip(names, variant)) or "по умолчанию"
+        print(f"  {label:<40} дилер {100 * wins / args.games:5.2f}% ({100 * low:.2f}–{100 * high:.2f}%), {mean_steps:.1f} ходов")
+
+
+if __name__ == "__main__":
+    main()